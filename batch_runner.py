@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+AIA Analytics - Batch Runner
+Runs many conversation analyses concurrently on a bounded thread pool
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, List, Optional
+
+# Parallel LLM requests per batch; override with AIA_LLM_CONCURRENCY
+DEFAULT_CONCURRENCY = 8
+
+
+def default_concurrency() -> int:
+    """Worker count from AIA_LLM_CONCURRENCY, falling back to DEFAULT_CONCURRENCY"""
+    try:
+        return max(1, int(os.getenv('AIA_LLM_CONCURRENCY', DEFAULT_CONCURRENCY)))
+    except ValueError:
+        return DEFAULT_CONCURRENCY
+
+
+@dataclass
+class BatchResult:
+    item: Any
+    value: Any = None
+    error: Optional[str] = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def run_batch(func: Callable[[Any], Any], items: Iterable[Any], max_workers: Optional[int] = None,
+              progress: Optional[Callable[[int, int, BatchResult], None]] = None) -> List[BatchResult]:
+    """Call func(item) for every item with at most max_workers calls in flight
+
+    Results come back in input order. An exception raised for one item is recorded on
+    its BatchResult and does not stop the rest of the batch. progress(done, total, result)
+    is called from the caller's thread as each item finishes.
+    """
+    items = list(items)
+    results: List[Optional[BatchResult]] = [None] * len(items)
+    if not items:
+        return []
+
+    max_workers = min(max_workers or default_concurrency(), len(items))
+
+    def run_one(item) -> BatchResult:
+        start = time.perf_counter()
+        try:
+            return BatchResult(item=item, value=func(item), elapsed=time.perf_counter() - start)
+        except Exception as e:
+            return BatchResult(item=item, error=str(e), elapsed=time.perf_counter() - start)
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='aia-batch') as executor:
+        futures = {executor.submit(run_one, item): i for i, item in enumerate(items)}
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            results[futures[future]] = result
+            if progress:
+                progress(done, len(items), result)
+
+    return results
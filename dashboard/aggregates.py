@@ -0,0 +1,192 @@
+"""
+AIA Analytics Dashboard - Population Aggregates
+Exact running statistics of every session score, so overview and recommendations read O(1) numbers
+"""
+
+import threading
+from collections import Counter
+from typing import Dict, List
+
+import numpy as np
+
+from session_store import SCORE_COLUMNS, STATUS_LABELS
+from scoring import IMPROVEMENT_THRESHOLD, STRENGTH_THRESHOLD
+
+# Scores are rounded to 0.1 on a 0-5 scale, so 51 bins hold them exactly
+HISTOGRAM_BINS = 51
+
+# Category columns and the labels get_session_summary uses for strengths / improvement areas.
+# Category averages are multiples of 1/4 or 1/6, so thresholds on the rounded scores match
+# get_session_summary's thresholds on the unrounded ones.
+CATEGORY_LABELS = {
+    'product_pitch_score': 'Product Pitch',
+    'objection_handling_score': 'Objection Handling',
+    'communication_skills_score': 'Communication Skills',
+}
+RANKED_SESSIONS = 3  # top performers / needs attention entries
+
+
+def score_bins(scores: np.ndarray) -> np.ndarray:
+    return np.clip(np.rint(np.asarray(scores, dtype=np.float64) * 10), 0, HISTOGRAM_BINS - 1).astype(np.int64)
+
+
+class PopulationAggregates:
+    """Sums, squared sums, histograms and status counts over every session in a summary table
+
+    Adding and removing rows keeps the statistics exact, so an appended transcript only
+    costs the touched sessions. Rankings and the improvement trend depend on row order and
+    are recomputed once per table version by rank().
+    """
+
+    def __init__(self):
+        self.count = 0
+        # Integer sums of scores in tenths, so adding and removing rows never drifts
+        self.sums = np.zeros(len(SCORE_COLUMNS), dtype=np.int64)
+        self.sumsq = np.zeros(len(SCORE_COLUMNS), dtype=np.int64)
+        self.histograms = np.zeros((len(SCORE_COLUMNS), HISTOGRAM_BINS), dtype=np.int64)
+        self.status_counts = np.zeros(len(STATUS_LABELS), dtype=np.int64)
+        self.strength_counts = np.zeros(len(CATEGORY_LABELS), dtype=np.int64)
+        self.improvement_counts = np.zeros(len(CATEGORY_LABELS), dtype=np.int64)
+        self.agent_sessions = Counter()
+        self.top_sessions: List[Dict] = []
+        self.bottom_sessions: List[Dict] = []
+        self.improvement_rate = 0.0
+
+    @classmethod
+    def from_table(cls, table) -> 'PopulationAggregates':
+        aggregates = cls()
+        aggregates._accumulate(table.columns, np.ones(len(table), dtype=bool), 1)
+        aggregates.rank(table)
+        return aggregates
+
+    def merged(self, old_table, delta, new_table) -> 'PopulationAggregates':
+        """Aggregates after delta's sessions replace their old rows (see SessionSummaryTable.merge)"""
+        aggregates = self.copy()
+        aggregates._accumulate(old_table.columns, np.isin(old_table.session_id, delta.session_id), -1)
+        aggregates._accumulate(delta.columns, np.ones(len(delta), dtype=bool), 1)
+        aggregates.rank(new_table)
+        return aggregates
+
+    def copy(self) -> 'PopulationAggregates':
+        aggregates = PopulationAggregates()
+        aggregates.count = self.count
+        for name in ('sums', 'sumsq', 'histograms', 'status_counts', 'strength_counts', 'improvement_counts'):
+            setattr(aggregates, name, getattr(self, name).copy())
+        aggregates.agent_sessions = Counter(self.agent_sessions)
+        return aggregates
+
+    def _accumulate(self, columns: Dict[str, np.ndarray], rows: np.ndarray, sign: int):
+        self.count += sign * int(rows.sum())
+        for i, col in enumerate(SCORE_COLUMNS):
+            tenths = score_bins(columns[col][rows])
+            self.sums[i] += sign * tenths.sum()
+            self.sumsq[i] += sign * np.square(tenths).sum()
+            self.histograms[i] += sign * np.bincount(tenths, minlength=HISTOGRAM_BINS)
+        self.status_counts += sign * np.bincount(columns['status_code'][rows], minlength=len(STATUS_LABELS))
+        for i, col in enumerate(CATEGORY_LABELS):
+            values = columns[col][rows]
+            self.strength_counts[i] += sign * int((values >= STRENGTH_THRESHOLD).sum())
+            self.improvement_counts[i] += sign * int((values < IMPROVEMENT_THRESHOLD).sum())
+        agents = Counter(columns['agent_id'][rows].tolist())
+        if sign > 0:
+            self.agent_sessions.update(agents)
+        else:
+            self.agent_sessions.subtract(agents)
+            self.agent_sessions = +self.agent_sessions  # drop agents with no sessions left
+
+    def rank(self, table):
+        """Top and bottom sessions plus the newer-vs-older trend, from the full (date-sorted) table"""
+        score = table.performance_score
+        k = min(RANKED_SESSIONS, len(table))
+        # lexsort keeps ties in table order (most recent first), like a stable sort of the sessions
+        self.top_sessions = [self._session_row(table, row) for row in np.lexsort((np.arange(len(table)), -score))[:k]]
+        self.bottom_sessions = [self._session_row(table, row) for row in np.lexsort((np.arange(len(table)), score))[:k]]
+
+        half = len(table) // 2
+        if half:
+            newer, older = score[:half].mean(), score[half:].mean()
+            self.improvement_rate = (newer - older) / older * 100 if older > 0 else 0.0
+        else:
+            self.improvement_rate = 0.0
+
+    @staticmethod
+    def _session_row(table, row: int) -> Dict:
+        category_scores = {label: float(table.columns[col][row]) for col, label in CATEGORY_LABELS.items()}
+        return {
+            'session_id': str(table.session_id[row]),
+            'agent_id': str(table.agent_id[row]),
+            'performance_score': float(table.performance_score[row]),
+            'category_scores': category_scores,
+            'improvement_areas': [label for label, value in category_scores.items() if value < IMPROVEMENT_THRESHOLD],
+        }
+
+    def mean(self, col: str) -> float:
+        return float(self.sums[SCORE_COLUMNS.index(col)] / self.count / 10) if self.count else 0.0
+
+    def std(self, col: str) -> float:
+        if not self.count:
+            return 0.0
+        i = SCORE_COLUMNS.index(col)
+        variance = (int(self.sumsq[i]) * self.count - int(self.sums[i]) ** 2) / self.count ** 2
+        return float(np.sqrt(max(variance, 0.0))) / 10
+
+    def percentile(self, col: str, q: float) -> float:
+        """Exact q-th percentile (nearest rank) read off the histogram"""
+        if not self.count:
+            return 0.0
+        cumulative = np.cumsum(self.histograms[SCORE_COLUMNS.index(col)])
+        rank = max(1, int(np.ceil(q / 100 * self.count)))
+        return float(np.searchsorted(cumulative, rank)) / 10
+
+    def count_between(self, col: str, low: float, high: float = None) -> int:
+        """Sessions with low <= score (< high)"""
+        histogram = self.histograms[SCORE_COLUMNS.index(col)]
+        return int(histogram[int(round(low * 10)):None if high is None else int(round(high * 10))].sum())
+
+    def improvement_count(self, label: str) -> int:
+        return int(self.improvement_counts[list(CATEGORY_LABELS.values()).index(label)])
+
+    def to_dict(self) -> Dict:
+        return {
+            'sessions': self.count,
+            'agents': len(self.agent_sessions),
+            'scores': {
+                col: {
+                    'mean': round(self.mean(col), 3),
+                    'std': round(self.std(col), 3),
+                    'p25': self.percentile(col, 25),
+                    'median': self.percentile(col, 50),
+                    'p75': self.percentile(col, 75),
+                }
+                for col in SCORE_COLUMNS
+            },
+            'status_counts': dict(zip(STATUS_LABELS, self.status_counts.tolist())),
+            'strengths': dict(zip(CATEGORY_LABELS.values(), self.strength_counts.tolist())),
+            'improvement_areas': dict(zip(CATEGORY_LABELS.values(), self.improvement_counts.tolist())),
+        }
+
+
+class PopulationStats:
+    """PopulationAggregates for the session store's current table, updated from its deltas
+
+    Built from the full table once, then advanced by each appended delta; reads between
+    transcript changes return the same object.
+    """
+
+    def __init__(self, session_store):
+        self.session_store = session_store
+        self.lock = threading.Lock()
+        self._table = None
+        self._aggregates = None
+
+    def current(self) -> PopulationAggregates:
+        table = self.session_store.table()
+        with self.lock:
+            if table is not self._table:
+                merge = self.session_store.last_merge
+                if self._aggregates is not None and merge and merge[0] is self._table and merge[2] is table:
+                    self._aggregates = self._aggregates.merged(merge[0], merge[1], table)
+                else:
+                    self._aggregates = PopulationAggregates.from_table(table)
+                self._table = table
+            return self._aggregates
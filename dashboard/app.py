@@ -1,7 +1,7 @@
 import os
 import pandas as pd
 import numpy as np
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, render_template, jsonify, request, stream_with_context
 from collections import defaultdict
 import json
 import re
@@ -12,16 +12,40 @@ import math
 # Add parent directory to path to import our AI analyzer
 sys.path.append('..')
 from simple_ai_analyzer import SimpleAIAAnalyzer
+from transcript_store import get_transcript_store
+from session_store import DETAIL_FIELDS, FACETS, SUMMARY_FIELDS, SessionSummaryStore, SUMMARY_FORMAT_VERSION, decode_cursor
+from scoring import analyze_agent_performance, get_session_summary
+from result_store import KIND_SESSION_SUMMARY, conversation_hash, get_result_store
+from jobs import JobManager, sse_events
+from aggregates import CATEGORY_LABELS, PopulationStats
+from rollups import GRANULARITIES, AgentRollupStore
+from search_index import SearchIndexStore
+from response_cache import ResponseCache
+from compression import compress_response
+from shared_state import get_shared_state
 
 app = Flask(__name__)
+app.after_request(compress_response)
 
 # Constants
 LOG_FILE_PATH = '../log/transcript.csv'
 ITEMS_PER_PAGE = 10  # Default items per page for lazy loading
+REFRESH_SESSION_LIMIT = 50  # Sessions analyzed by "Refresh AI Insights"
+SESSION_SUMMARY_VERSION = f"rules-v{SUMMARY_FORMAT_VERSION}"
+AI_INSIGHTS_KEY = 'ai_insights'  # shared record of the latest refresh by any worker
 
-# Cache for storing processed data
+# Cache for storing processed data; a refresh swaps in its results only once complete
 cache = {}
 
+# Refreshes and job progress published for every worker process to see
+shared_state = get_shared_state()
+
+# Long-running analyses run here instead of on the request thread; one per kind across workers
+job_manager = JobManager(shared=shared_state)
+
+# Parsed transcript shared by all routes, re-read only when the CSV changes
+transcript_store = get_transcript_store(LOG_FILE_PATH)
+
 # Initialize AI Analyzer
 try:
     ai_analyzer = SimpleAIAAnalyzer()
@@ -30,256 +54,154 @@ except Exception as e:
     print(f"⚠️ AI Analyzer initialization failed: {e}")
     ai_analyzer = None
 
-def analyze_agent_performance(conversation_text, conversation_id):
-    """Analyze agent performance based on conversation content"""
-    
-    # Extract agent responses for analysis
-    lines = conversation_text.split('\n')
-    agent_responses = [line.split(': ', 1)[1] for line in lines if line.startswith('Agent: ')]
-    customer_prompts = [line.split(': ', 1)[1] for line in lines if line.startswith('Customer: ')]
-    
-    # Initialize performance metrics
-    performance = {
-        'product_pitch': {
-            'explain_benefits': {'score': 0, 'explanation': 'Not demonstrated'},
-            'explain_details': {'score': 0, 'explanation': 'Not demonstrated'},  
-            'answer_questions': {'score': 0, 'explanation': 'Not demonstrated'},
-            'close_conversation': {'score': 0, 'explanation': 'Not demonstrated'}
-        },
-        'objection_handling': {
-            'listening': {'score': 0, 'explanation': 'Not demonstrated'},
-            'acknowledging': {'score': 0, 'explanation': 'Not demonstrated'},
-            'defusing': {'score': 0, 'explanation': 'Not demonstrated'},
-            'refocusing': {'score': 0, 'explanation': 'Not demonstrated'}
-        },
-        'communication_skills': {
-            'small_talk': {'score': 0, 'explanation': 'Not demonstrated'},
-            'content_organization': {'score': 0, 'explanation': 'Not demonstrated'},
-            'building_rapport': {'score': 0, 'explanation': 'Not demonstrated'},
-            'relevant_examples': {'score': 0, 'explanation': 'Not demonstrated'},
-            'active_listening': {'score': 0, 'explanation': 'Not demonstrated'},
-            'closing': {'score': 0, 'explanation': 'Not demonstrated'}
-        }
-    }
-    
-    # Analyze communication skills - Small talk
-    if any(keyword in ' '.join(agent_responses).lower() for keyword in ['football', 'match', 'arsenal', 'game']):
-        performance['communication_skills']['small_talk'] = {
-            'score': 4, 
-            'explanation': 'Engaged well in football discussion, showed personality'
-        }
-        performance['communication_skills']['building_rapport'] = {
-            'score': 4,
-            'explanation': 'Good rapport building through shared interests'
-        }
-    
-    # Check for insurance-related content
-    insurance_keywords = ['insurance', 'policy', 'coverage', 'premium', 'benefit', 'life insurance', 'protection']
-    insurance_discussion = any(keyword in ' '.join(agent_responses).lower() for keyword in insurance_keywords)
-    
-    if insurance_discussion:
-        performance['product_pitch']['explain_benefits']['score'] = 3
-        performance['product_pitch']['explain_benefits']['explanation'] = 'Mentioned insurance products'
-        performance['communication_skills']['content_organization']['score'] = 3
-        performance['communication_skills']['content_organization']['explanation'] = 'Transitioned to business discussion'
-    
-    # Analyze response quality
-    total_agent_words = sum(len(response.split()) for response in agent_responses)
-    avg_response_length = total_agent_words / len(agent_responses) if agent_responses else 0
-    
-    if avg_response_length > 10:
-        performance['communication_skills']['active_listening']['score'] = 3
-        performance['communication_skills']['active_listening']['explanation'] = 'Provided detailed responses'
-    elif avg_response_length < 3:
-        performance['communication_skills']['active_listening']['score'] = 2
-        performance['communication_skills']['active_listening']['explanation'] = 'Very brief responses, may indicate disengagement'
-    
-    # Check for professional language and courtesy
-    if any(word in ' '.join(agent_responses).lower() for word in ['please', 'thank', 'appreciate']):
-        performance['communication_skills']['building_rapport']['score'] = max(
-            performance['communication_skills']['building_rapport']['score'], 3
-        )
-    
-    return performance
+# Session summary table, rebuilt only when the transcript changes
+session_store = SessionSummaryStore(transcript_store, get_session_summary)
 
-def get_session_summary(conversation_id, conversation_data):
-    """Generate session summary for dashboard display"""
-    
-    # Calculate basic metrics
-    agent_messages = len(conversation_data[conversation_data['Message Role'] == 'Agent'])
-    customer_messages = len(conversation_data[conversation_data['Message Role'] == 'Customer'])
-    total_messages = len(conversation_data)
-    
-    # Analyze conversation content
-    conversation_text = ""
-    for _, row in conversation_data.iterrows():
-        role = row['Message Role']
-        text = row['Message Text']
-        conversation_text += f"{role}: {text}\n"
-    
-    # Get AI performance analysis
-    performance = analyze_agent_performance(conversation_text, conversation_id)
-    
-    # Calculate category averages
-    product_pitch_avg = np.mean([
-        performance['product_pitch']['explain_benefits']['score'],
-        performance['product_pitch']['explain_details']['score'],
-        performance['product_pitch']['answer_questions']['score'],
-        performance['product_pitch']['close_conversation']['score']
-    ])
-    
-    objection_handling_avg = np.mean([
-        performance['objection_handling']['listening']['score'],
-        performance['objection_handling']['acknowledging']['score'],
-        performance['objection_handling']['defusing']['score'],
-        performance['objection_handling']['refocusing']['score']
-    ])
-    
-    communication_skills_avg = np.mean([
-        performance['communication_skills']['small_talk']['score'],
-        performance['communication_skills']['content_organization']['score'],
-        performance['communication_skills']['building_rapport']['score'],
-        performance['communication_skills']['relevant_examples']['score'],
-        performance['communication_skills']['active_listening']['score'],
-        performance['communication_skills']['closing']['score']
-    ])
-    
-    overall_score = np.mean([product_pitch_avg, objection_handling_avg, communication_skills_avg])
-    
-    # Determine strengths and improvement areas
-    category_scores = {
-        'Product Pitch': product_pitch_avg,
-        'Objection Handling': objection_handling_avg,
-        'Communication Skills': communication_skills_avg
-    }
-    
-    strengths = [k for k, v in category_scores.items() if v >= 3.5]
-    improvement_areas = [k for k, v in category_scores.items() if v < 3.0]
-    
-    # Determine scenario type based on conversation content
-    scenario_type = "General Practice"
-    if "insurance" in conversation_text.lower():
-        scenario_type = "Product Pitch"
-    if any(word in conversation_text.lower() for word in ["objection", "expensive", "costly", "cheap"]):
-        scenario_type = "Objection Handling"
-    
-    # Generate AI feedback
-    if overall_score >= 4.0:
-        ai_feedback = "Excellent performance! Strong across all areas."
-        practice_status = "Completed - Excellent"
-    elif overall_score >= 3.0:
-        ai_feedback = f"Good foundation. Focus on: {', '.join(improvement_areas) if improvement_areas else 'maintaining consistency'}"
-        practice_status = "Completed - Good"
-    elif overall_score >= 2.0:
-        ai_feedback = f"Needs improvement in: {', '.join(improvement_areas)}. Consider additional practice."
-        practice_status = "Needs Review"
+# Exact population statistics, advanced from the summary table's deltas
+population_stats = PopulationStats(session_store)
+
+# Per-agent totals and day/week series, rebuilt once per transcript version
+agent_rollups = AgentRollupStore(session_store)
+
+# Trigram index over IDs and message text for /api/sessions search
+search_index = SearchIndexStore(session_store)
+
+# Serialized JSON responses, reused until the data behind them changes
+response_cache = ResponseCache()
+
+# Refreshed session analyses survive restarts here; `cache` only holds the in-memory copy
+result_store = get_result_store()
+
+def session_summary_from_store(**stored):
+    """get_session_summary dict from its stored JSON (timestamps come back as strings)"""
+    if stored.get('practice_date') is not None:
+        stored['practice_date'] = pd.Timestamp(stored['practice_date'])
+    return stored
+
+def restore_processed_sessions():
+    """Fill the cache from the result store after a restart, or after another worker's refresh
+
+    Analyzed sessions are read back from the result store rather than recomputed.
+    """
+    snapshot = transcript_store.snapshot()
+    published = shared_state.get(AI_INSIGHTS_KEY) or {}
+    refreshed_at = published.get('refreshed_at')
+    if cache.get('restore_checked') == (snapshot.version, refreshed_at):
+        return
+    cache['restore_checked'] = (snapshot.version, refreshed_at)
+
+    if refreshed_at is not None and refreshed_at != cache.get('refreshed_at'):
+        session_ids = published['session_ids']
+        last_refresh = datetime.fromisoformat(refreshed_at)
+    elif 'processed_sessions' not in cache:
+        session_ids = snapshot.index.ids[:REFRESH_SESSION_LIMIT]
+        last_refresh = None
     else:
-        ai_feedback = "Significant improvement needed. Recommend manager review."
-        practice_status = "Requires Attention"
-    
+        return
+
+    processed_sessions = []
+    for conv_id, conv_data in snapshot.conversations(session_ids):
+        stored = result_store.get(KIND_SESSION_SUMMARY, conv_id, conversation_hash(conv_data), SESSION_SUMMARY_VERSION)
+        if stored is None:
+            return  # Never refreshed, or the transcript changed since
+        processed_sessions.append(session_summary_from_store(**stored))
+    if processed_sessions:
+        if last_refresh is None:
+            last_refresh = datetime.fromtimestamp(result_store.last_updated(KIND_SESSION_SUMMARY, SESSION_SUMMARY_VERSION))
+        cache.update(processed_sessions=processed_sessions, last_refresh=last_refresh, refreshed_at=refreshed_at)
+        print(f"♻️ Restored {len(processed_sessions)} analyzed sessions from the result store")
+
+def transcript_version():
+    """Data version of views computed from the transcript alone"""
+    return transcript_store.version
+
+def analysis_version():
+    """Data version of views that also report the latest AI insights refresh"""
+    restore_processed_sessions()
+    return f"{transcript_store.version}:{cache.get('last_refresh', '')}"
+
+def skill_summary(score):
+    """Score and status badge for one skill category on the dashboard"""
     return {
-        'session_id': conversation_id,
-        'agent_id': conversation_data['Agent ID'].iloc[0] if 'Agent ID' in conversation_data.columns else 'Unknown',
-        'practice_date': conversation_data['Created At'].iloc[0] if 'Created At' in conversation_data.columns else None,
-        'total_messages': total_messages,
-        'agent_messages': agent_messages,
-        'customer_messages': customer_messages,
-        'scenario_type': scenario_type,
-        'performance_score': round(overall_score, 1),
-        'product_pitch_score': round(product_pitch_avg, 1),
-        'objection_handling_score': round(objection_handling_avg, 1),
-        'communication_skills_score': round(communication_skills_avg, 1),
-        'strengths': strengths,
-        'improvement_areas': improvement_areas,
-        'ai_feedback': ai_feedback,
-        'practice_status': practice_status,
-        'detailed_performance': performance
+        'score': round(score, 1),
+        'status': 'excellent' if score >= 4.0 else 'good' if score >= 3.5 else 'needs-improvement' if score >= 2.5 else 'poor'
     }
 
-def load_paginated_sessions(page=1, per_page=ITEMS_PER_PAGE, search=None, performance_filter=None, status_filter=None):
-    """Load practice sessions with pagination and filtering"""
+def partial_overview(sessions_analyzed, score_sums):
+    """Running overview scores streamed while a refresh is still in progress"""
+    averages = {col: score_sums[col] / sessions_analyzed if sessions_analyzed else 0.0 for col in score_sums}
+    return {
+        'sessions_analyzed': sessions_analyzed,
+        'avg_performance': round(averages['performance_score'], 1),
+        'product_pitch': skill_summary(averages['product_pitch_score']),
+        'objection_handling': skill_summary(averages['objection_handling_score']),
+        'communication': skill_summary(averages['communication_skills_score'])
+    }
+
+def load_paginated_sessions(page=1, per_page=ITEMS_PER_PAGE, search=None, filters=None, fields=None, cursor=None):
+    """Load practice sessions with pagination, filtering and facet counts
+
+    filters maps each facet ('performance', 'status', 'scenario', 'agent') to the values to keep;
+    fields limits each session to those keys (default: every summary field except detailed_performance).
+    cursor, a decode_cursor() tuple, pages by key instead of by page number.
+    """
+    filters = filters or {}
     try:
-        # Load full dataset
-        df = pd.read_csv(LOG_FILE_PATH)
-        df.columns = df.columns.str.strip()
-        
-        # Clean data
-        df = df[df['Message Role'] != 'N/A']
-        df = df[df['Message Text'].notna()]
-        df = df[df['Message Text'] != 'No transcript available']
-        
-        # Convert date column
-        df['Created At'] = pd.to_datetime(df['Created At'], format='%Y-%m-%d %H:%M:%S (GMT+7)', errors='coerce')
-        
-        # Group by conversation to get session data
-        session_summaries = []
-        unique_conversations = df['Conversation ID'].unique()
-        
-        for conv_id in unique_conversations:
-            conv_data = df[df['Conversation ID'] == conv_id]
-            session_summary = get_session_summary(conv_id, conv_data)
-            session_summaries.append(session_summary)
-        
-        # Sort by date (most recent first)
-        session_summaries.sort(key=lambda x: x['practice_date'] if pd.notna(x['practice_date']) else datetime.min, reverse=True)
-        
-        # Apply filters
-        if search:
-            search_lower = search.lower()
-            session_summaries = [
-                session for session in session_summaries 
-                if search_lower in session['session_id'].lower() or 
-                   search_lower in session['agent_id'].lower() or
-                   search_lower in session['scenario_type'].lower()
-            ]
-        
-        if performance_filter:
-            if performance_filter == 'excellent':
-                session_summaries = [s for s in session_summaries if s['performance_score'] >= 4.0]
-            elif performance_filter == 'good':
-                session_summaries = [s for s in session_summaries if 3.0 <= s['performance_score'] < 4.0]
-            elif performance_filter == 'needs_improvement':
-                session_summaries = [s for s in session_summaries if s['performance_score'] < 3.0]
-        
-        if status_filter:
-            session_summaries = [
-                session for session in session_summaries 
-                if session['practice_status'].lower().replace(' ', '_').replace('-', '_') == status_filter.lower()
-            ]
-        
-        # Calculate pagination
-        total_items = len(session_summaries)
+        # Precomputed per-conversation summaries, presorted by date (most recent first)
+        table = session_store.table()
+        
+        # Apply filters as vectorized masks over the summary's facet codes
+        search_mask = search_index.current(table).mask(search) if search else None
+        if search_mask is not None or any(filters.values()):
+            matching_rows = np.flatnonzero(table.filter_mask(filters, base=search_mask))
+            total_items = len(matching_rows)
+        else:
+            matching_rows = None  # every row, without materializing the index
+            total_items = len(table)
+        
+        if cursor:
+            # Keyset pagination: binary search for the cursor's key, so new sessions never shift pages
+            direction, date_key, position, _ = cursor
+            boundary = table.seek(date_key, position, after=direction == 'next')
+            boundary = boundary if matching_rows is None else int(np.searchsorted(matching_rows, boundary))
+            start_idx, end_idx = (boundary, boundary + per_page) if direction == 'next' else (max(0, boundary - per_page), boundary)
+        else:
+            start_idx = (page - 1) * per_page
+            end_idx = start_idx + per_page
+        end_idx = min(end_idx, total_items)
         total_pages = math.ceil(total_items / per_page)
-        start_idx = (page - 1) * per_page
-        end_idx = start_idx + per_page
         
-        paginated_data = session_summaries[start_idx:end_idx]
+        # Sessions on this page come straight from the summary columns; only detailed_performance needs a rescore
+        page_rows = np.arange(start_idx, max(start_idx, end_idx)) if matching_rows is None else matching_rows[start_idx:end_idx]
+        if fields and any(field in DETAIL_FIELDS for field in fields):
+            paginated_data = [{field: summary[field] for field in fields}
+                              for summary in session_store.summaries(table.session_id[page_rows].tolist())]
+        else:
+            paginated_data = table.compact_summaries(page_rows, fields)
+        
+        has_next = end_idx < total_items
+        has_prev = start_idx > 0
+        pagination = {
+            'per_page': per_page,
+            'total_items': total_items,
+            'has_next': has_next,
+            'has_prev': has_prev,
+            'next_cursor': table.cursor(page_rows[-1], 'next') if has_next and len(page_rows) else None,
+            'prev_cursor': table.cursor(page_rows[0], 'prev') if has_prev and len(page_rows) else None
+        }
+        if not cursor:
+            pagination.update({'current_page': page, 'total_pages': total_pages})
         
         return {
             'sessions': paginated_data,
-            'pagination': {
-                'current_page': page,
-                'per_page': per_page,
-                'total_items': total_items,
-                'total_pages': total_pages,
-                'has_next': page < total_pages,
-                'has_prev': page > 1
-            }
+            'facets': table.facet_counts(filters, base=search_mask),
+            'pagination': pagination
         }
         
     except Exception as e:
+        # Re-raised so callers answer with an error, which the response cache never stores
         print(f"Error loading paginated sessions: {e}")
-        return {
-            'sessions': [],
-            'pagination': {
-                'current_page': 1,
-                'per_page': per_page,
-                'total_items': 0,
-                'total_pages': 0,
-                'has_next': False,
-                'has_prev': False
-            }
-        }
+        raise
 
 # Routes
 @app.route('/')
@@ -294,43 +216,69 @@ def sessions():
 def conversations():
     return render_template('conversations_lazy.html')
 
+@app.route('/agents')
+def agents():
+    return render_template('agents.html')
+
+@app.route('/agent/<agent_id>')
+def agent_detail(agent_id):
+    return render_template('agent_detail.html', agent_id=agent_id)
+
 # API endpoints
 @app.route('/api/sessions')
 def api_sessions():
-    """API endpoint for paginated session data"""
+    """API endpoint for paginated session data
+
+    Query parameters are validated before the response cache lookup, so bad input is a 400
+    and only real load failures are a 500.
+    """
     try:
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', ITEMS_PER_PAGE))
-        search = request.args.get('search', '').strip()
-        performance_filter = request.args.get('performance', '').strip()
-        status_filter = request.args.get('status', '').strip()
-        
-        # Validate parameters
-        page = max(1, page)
-        per_page = min(50, max(5, per_page))
-        
-        result = load_paginated_sessions(
-            page=page,
-            per_page=per_page,
-            search=search if search else None,
-            performance_filter=performance_filter if performance_filter else None,
-            status_filter=status_filter if status_filter else None
-        )
-        
-        return jsonify(result)
+    except ValueError:
+        return jsonify({"error": "page and per_page must be integers"}), 400
+    search = request.args.get('search', '').strip()
+    # Each facet takes one value or a comma-separated list
+    filters = {
+        facet: [value.strip() for value in request.args.get(facet, '').split(',') if value.strip()]
+        for facet in FACETS
+    }
+    cursor = request.args.get('cursor', '').strip()
+    try:
+        cursor = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    fields = [field.strip() for field in request.args.get('fields', '').split(',') if field.strip()]
+    unknown = [field for field in fields if field not in SUMMARY_FIELDS + DETAIL_FIELDS]
+    if unknown:
+        return jsonify({"error": f"Unknown fields: {', '.join(unknown)}. Valid fields: {', '.join(SUMMARY_FIELDS + DETAIL_FIELDS)}"}), 400
+    
+    # Clamp parameters
+    page = max(1, page)
+    per_page = min(50, max(5, per_page))
+    
+    return sessions_page(
+        page=page,
+        per_page=per_page,
+        search=search if search else None,
+        filters=filters,
+        fields=fields or None,
+        cursor=cursor
+    )
+
+@response_cache.cached(transcript_version)
+def sessions_page(**params):
+    """One page of sessions for validated query parameters, cached per request query"""
+    try:
+        return jsonify(load_paginated_sessions(**params))
     except Exception as e:
-        return jsonify({"error": str(e)})
+        return jsonify({"error": str(e)}), 500
 
 @app.route('/api/session/<session_id>/details')
 def api_session_details(session_id):
     """API endpoint to get detailed session analysis"""
     try:
-        df = pd.read_csv(LOG_FILE_PATH)
-        df.columns = df.columns.str.strip()
-        df = df[df['Message Role'] != 'N/A']
-        df = df[df['Message Text'].notna()]
-        
-        conv_data = df[df['Conversation ID'] == session_id]
+        conv_data = transcript_store.conversation(session_id)
         if conv_data.empty:
             return jsonify({"error": "Session not found"})
         
@@ -340,92 +288,79 @@ def api_session_details(session_id):
     except Exception as e:
         return jsonify({"error": str(e)})
 
+@app.route('/api/agents')
+@response_cache.cached(transcript_version)
+def api_agents():
+    """API endpoint for every agent's session totals, read from the agent rollups"""
+    try:
+        return jsonify(agent_rollups.current().agents())
+    except Exception as e:
+        return jsonify({"error": str(e)})
+
+@app.route('/api/agent/<agent_id>/timeseries')
+@response_cache.cached(transcript_version)
+def api_agent_timeseries(agent_id):
+    """API endpoint for one agent's day or week buckets, optionally between start and end dates"""
+    try:
+        granularity = request.args.get('granularity', 'day').strip().lower()
+        if granularity not in GRANULARITIES:
+            return jsonify({"error": f"granularity must be one of: {', '.join(GRANULARITIES)}"}), 400
+        start = request.args.get('start', '').strip()
+        end = request.args.get('end', '').strip()
+        start_day = int(np.datetime64(start, 'D').astype(np.int64)) if start else None
+        end_day = int(np.datetime64(end, 'D').astype(np.int64)) if end else None
+        
+        rollups = agent_rollups.current()
+        code = rollups.agent_code(agent_id)
+        if code is None:
+            return jsonify({"error": "Agent not found"}), 404
+        
+        result = rollups.timeseries(code, granularity, start_day, end_day)
+        result['summary'] = rollups.agent_summary(code)
+        return jsonify(result)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid date: {e}"}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)})
+
 @app.route('/api/agent-performance-overview')
+@response_cache.cached(analysis_version)
 def api_agent_performance_overview():
     """API endpoint for agent performance overview on dashboard"""
     try:
-        # Load and process data
-        df = pd.read_csv(LOG_FILE_PATH)
-        df.columns = df.columns.str.strip()
-        df = df[df['Message Role'] != 'N/A']
-        df = df[df['Message Text'].notna()]
-        df = df[df['Message Text'] != 'No transcript available']
-        
-        total_sessions = df['Conversation ID'].nunique()
-        unique_agents = df['Agent ID'].nunique() if 'Agent ID' in df.columns else 1
-        
-        # Use cached processed sessions if available (from refresh), otherwise analyze sample
-        if 'processed_sessions' in cache:
-            sample_sessions = cache['processed_sessions']
-            print(f"📊 Using cached analysis for {len(sample_sessions)} sessions")
-            print(f"📅 Cache timestamp: {cache.get('last_refresh', 'Unknown')}")
-        else:
-            # Quick analysis of sample sessions
-            sample_sessions = []
-            for conv_id in df['Conversation ID'].unique()[:10]:  # Sample first 10
-                conv_data = df[df['Conversation ID'] == conv_id]
-                session_summary = get_session_summary(conv_id, conv_data)
-                sample_sessions.append(session_summary)
-            print(f"📊 Generated fresh analysis for {len(sample_sessions)} sessions")
+        # Exact statistics over every session, maintained as the transcript changes
+        population = population_stats.current()
+        restore_processed_sessions()
         
-        if sample_sessions:
-            avg_performance = np.mean([s['performance_score'] for s in sample_sessions])
-            avg_product_pitch = np.mean([s['product_pitch_score'] for s in sample_sessions])
-            avg_objection_handling = np.mean([s['objection_handling_score'] for s in sample_sessions])
-            avg_communication = np.mean([s['communication_skills_score'] for s in sample_sessions])
-            
-            # Count performance levels
-            excellent_count = len([s for s in sample_sessions if s['performance_score'] >= 4.0])
-            good_count = len([s for s in sample_sessions if 3.0 <= s['performance_score'] < 4.0])
-            needs_improvement_count = len([s for s in sample_sessions if s['performance_score'] < 3.0])
-            
-            # Calculate improvement rate based on session trend
-            if len(sample_sessions) > 5:
-                first_half = sample_sessions[:len(sample_sessions)//2]
-                second_half = sample_sessions[len(sample_sessions)//2:]
-                first_avg = np.mean([s['performance_score'] for s in first_half])
-                second_avg = np.mean([s['performance_score'] for s in second_half])
-                improvement = ((second_avg - first_avg) / first_avg) * 100 if first_avg > 0 else 0
-                improvement_rate = f"+{improvement:.1f}%" if improvement > 0 else f"{improvement:.1f}%"
-            else:
-                improvement_rate = "+0.0%"
-        else:
-            avg_performance = 0
-            avg_product_pitch = avg_objection_handling = avg_communication = 0
-            excellent_count = good_count = needs_improvement_count = 0
-            improvement_rate = "+0.0%"
+        avg_performance = population.mean('performance_score')
+        avg_product_pitch = population.mean('product_pitch_score')
+        avg_objection_handling = population.mean('objection_handling_score')
+        avg_communication = population.mean('communication_skills_score')
+        improvement = population.improvement_rate
         
         # Determine analysis status
-        has_analysis = len(sample_sessions) > 0
+        has_analysis = population.count > 0
+        analysis_status = f'📊 Population statistics over all {population.count} sessions.'
         if 'processed_sessions' in cache:
-            analysis_status = f'✅ AI Analysis Complete - {len(sample_sessions)} sessions analyzed with detailed insights'
+            analysis_status += f' Detailed insights refreshed {cache["last_refresh"]:%Y-%m-%d %H:%M}.'
         else:
-            analysis_status = f'📊 Sample analysis of {len(sample_sessions)} sessions. Click "Refresh AI Insights" for comprehensive analysis.'
+            analysis_status += ' Click "Refresh AI Insights" for detailed session analysis.'
         
         performance_data = {
-            'total_agents': unique_agents,
-            'total_sessions': total_sessions,
+            'total_agents': len(population.agent_sessions),
+            'total_sessions': population.count,
             'avg_performance': round(avg_performance, 1),
-            'improvement_rate': improvement_rate,
-            'sessions_analyzed': len(sample_sessions),
+            'improvement_rate': f"+{improvement:.1f}%" if improvement > 0 else f"{improvement:.1f}%",
+            'sessions_analyzed': population.count,
             'has_analysis': has_analysis,
             'analysis_status': analysis_status,
-            'product_pitch': {
-                'score': round(avg_product_pitch, 1),
-                'status': 'excellent' if avg_product_pitch >= 4.0 else 'good' if avg_product_pitch >= 3.5 else 'needs-improvement' if avg_product_pitch >= 2.5 else 'poor'
-            },
-            'objection_handling': {
-                'score': round(avg_objection_handling, 1),
-                'status': 'excellent' if avg_objection_handling >= 4.0 else 'good' if avg_objection_handling >= 3.5 else 'needs-improvement' if avg_objection_handling >= 2.5 else 'poor'
-            },
-            'communication': {
-                'score': round(avg_communication, 1),
-                'status': 'excellent' if avg_communication >= 4.0 else 'good' if avg_communication >= 3.5 else 'needs-improvement' if avg_communication >= 2.5 else 'poor'
-            },
+            'product_pitch': skill_summary(avg_product_pitch),
+            'objection_handling': skill_summary(avg_objection_handling),
+            'communication': skill_summary(avg_communication),
             'performance_distribution': {
-                'excellent': excellent_count,
-                'good': good_count,
-                'needs_improvement': needs_improvement_count
+                'excellent': population.count_between('performance_score', 4.0),
+                'good': population.count_between('performance_score', 3.0, 4.0),
+                'needs_improvement': population.count_between('performance_score', 0.0, 3.0)
             },
             'top_performers': [
                 {
@@ -434,7 +369,7 @@ def api_agent_performance_overview():
                     'session_id': session['session_id'],
                     'overall_score': session['performance_score']
                 }
-                for i, session in enumerate(sorted(sample_sessions, key=lambda x: x['performance_score'], reverse=True)[:3])
+                for i, session in enumerate(population.top_sessions)
             ],
             'needs_attention': [
                 {
@@ -442,52 +377,33 @@ def api_agent_performance_overview():
                     'session_id': session['session_id'],
                     'issue_type': 'low_performance',
                     'weakest_area': session['improvement_areas'][0] if session['improvement_areas'] else 'General',
-                    'weakest_score': min(session['product_pitch_score'], session['objection_handling_score'], session['communication_skills_score']),
+                    'weakest_score': min(session['category_scores'].values()),
                     'overall_score': session['performance_score']
                 }
-                for session in sorted(sample_sessions, key=lambda x: x['performance_score'])[:3]
+                for session in population.bottom_sessions
                 if session['performance_score'] < 3.0
-            ]
+            ],
+            'population': population.to_dict()
         }
         
-        print(f"🎯 Dashboard data summary:")
-        print(f"   Avg Performance: {performance_data['avg_performance']}")
-        print(f"   Sessions Analyzed: {performance_data['sessions_analyzed']}")
-        print(f"   Analysis Status: {performance_data['analysis_status']}")
-        print(f"   Has Cached Data: {'processed_sessions' in cache}")
-        
         return jsonify(performance_data)
         
     except Exception as e:
         return jsonify({"error": str(e)})
 
 @app.route('/api/training-recommendations')
+@response_cache.cached(transcript_version)
 def api_training_recommendations():
     """API endpoint for training recommendations"""
     try:
-        # Load sample data for recommendations
-        df = pd.read_csv(LOG_FILE_PATH)
-        df.columns = df.columns.str.strip()
-        df = df[df['Message Role'] != 'N/A']
-        df = df[df['Message Text'].notna()]
-        
-        sample_sessions = []
-        for conv_id in df['Conversation ID'].unique()[:20]:  # Analyze more for recommendations
-            conv_data = df[df['Conversation ID'] == conv_id]
-            session_summary = get_session_summary(conv_id, conv_data)
-            sample_sessions.append(session_summary)
-        
-        # Analyze common weaknesses
-        all_improvement_areas = []
-        for session in sample_sessions:
-            all_improvement_areas.extend(session['improvement_areas'])
-        
-        from collections import Counter
-        weakness_counts = Counter(all_improvement_areas)
+        # Weakness counts over every session, read from the population aggregates
+        population = population_stats.current()
+        total_sessions = population.count
+        weakness_counts = {label: population.improvement_count(label) for label in CATEGORY_LABELS.values()}
         
         recommendations_list = []
         
-        if weakness_counts.get('Objection Handling', 0) > len(sample_sessions) * 0.3:
+        if weakness_counts.get('Objection Handling', 0) > total_sessions * 0.3:
             recommendations_list.append({
                 "title": "Objection Handling Workshop",
                 "description": f"{weakness_counts['Objection Handling']} agents need improvement in handling customer objections and concerns",
@@ -495,7 +411,7 @@ def api_training_recommendations():
                 "affected_agents": weakness_counts['Objection Handling']
             })
         
-        if weakness_counts.get('Product Pitch', 0) > len(sample_sessions) * 0.2:
+        if weakness_counts.get('Product Pitch', 0) > total_sessions * 0.2:
             recommendations_list.append({
                 "title": "Product Knowledge Training",
                 "description": f"{weakness_counts['Product Pitch']} agents need better product knowledge and presentation skills",
@@ -503,7 +419,7 @@ def api_training_recommendations():
                 "affected_agents": weakness_counts['Product Pitch']
             })
         
-        if weakness_counts.get('Communication Skills', 0) > len(sample_sessions) * 0.2:
+        if weakness_counts.get('Communication Skills', 0) > total_sessions * 0.2:
             recommendations_list.append({
                 "title": "Communication Skills Enhancement",
                 "description": f"{weakness_counts['Communication Skills']} agents need improvement in communication and rapport building",
@@ -518,91 +434,147 @@ def api_training_recommendations():
                     "title": "Advanced Sales Techniques",
                     "description": "Continue building on strong foundation with advanced sales methodologies",
                     "priority": "leverage",
-                    "affected_agents": len(sample_sessions)
+                    "affected_agents": total_sessions
                 },
                 {
                     "title": "Role-Play Practice Sessions",
                     "description": "Regular practice sessions to maintain and improve current skill levels",
                     "priority": "medium",
-                    "affected_agents": len(sample_sessions)
+                    "affected_agents": total_sessions
                 }
             ]
         
         recommendations = {
-            "total_analyzed": len(sample_sessions),
+            "total_analyzed": total_sessions,
             "recommendations": recommendations_list
         }
         return jsonify(recommendations)
     except Exception as e:
         return jsonify({"error": str(e)})
 
+def refresh_ai_insights(job):
+    """Re-analyze the refresh sessions on a job thread, then swap them into the cache"""
+    print("🔄 Starting AI insights refresh...")
+    
+    # Bring the population statistics up to date here rather than in the next overview request
+    population_stats.current()
+    
+    # Force re-analysis of sessions by processing more data
+    snapshot = transcript_store.snapshot()
+    
+    print(f"📊 Processing data: {len(snapshot.frame)} rows, {len(snapshot.index)} unique conversations")
+    
+    # Process more sessions for better analysis
+    processed_sessions = []
+    conversation_ids = snapshot.index.ids[:REFRESH_SESSION_LIMIT]
+    job.start(len(conversation_ids), f"Analyzing {len(conversation_ids)} sessions")
+    
+    print(f"🔍 Analyzing {len(conversation_ids)} conversations...")
+    
+    # Checkpointed per session; unchanged sessions from an earlier run are read back
+    summarize = result_store.resumable(KIND_SESSION_SUMMARY, SESSION_SUMMARY_VERSION, snapshot,
+                                       lambda conv_id: get_session_summary(conv_id, snapshot.conversation(conv_id)),
+                                       session_summary_from_store)
+    score_sums = dict.fromkeys(['performance_score', 'product_pitch_score', 'objection_handling_score', 'communication_skills_score'], 0.0)
+    for i, conv_id in enumerate(conversation_ids):
+        session_summary = summarize(conv_id)
+        processed_sessions.append(session_summary)
+        for col in score_sums:
+            score_sums[col] += session_summary[col]
+        job.advance(message=f"Analyzed session {conv_id}", item=conv_id,
+                    partial=partial_overview(len(processed_sessions), score_sums))
+        if i % 10 == 0:
+            print(f"   Processed {i+1}/{len(conversation_ids)} sessions...")
+    
+    # Swap in the finished analysis; until now requests kept serving the previous one
+    last_refresh = datetime.now()
+    cache.update(processed_sessions=processed_sessions, last_refresh=last_refresh, refreshed_at=last_refresh.isoformat())
+    # Other workers read the same sessions back from the result store on their next request
+    shared_state.put(AI_INSIGHTS_KEY, {
+        'transcript_version': snapshot.version,
+        'session_ids': list(conversation_ids),
+        'refreshed_at': last_refresh.isoformat(),
+    })
+    
+    print(f"✅ Analysis complete! Cached {len(processed_sessions)} sessions")
+    print(f"📈 Sample session scores: {[s['performance_score'] for s in processed_sessions[:5]]}")
+    
+    return {
+        "message": f"Successfully refreshed AI insights for {len(processed_sessions)} sessions",
+        "sessions_processed": len(processed_sessions)
+    }
+
 @app.route('/api/refresh-ai-insights', methods=['POST'])
 def api_refresh_ai_insights():
-    """API endpoint to refresh AI insights"""
+    """API endpoint to start (or join) a background AI insights refresh"""
     try:
-        print("🔄 Starting AI insights refresh...")
-        
-        # Clear the cache to force re-analysis
-        global cache
-        cache.clear()
-        print("🗑️ Cache cleared")
-        
-        # Force re-analysis of sessions by processing more data
-        df = pd.read_csv(LOG_FILE_PATH)
-        df.columns = df.columns.str.strip()
-        df = df[df['Message Role'] != 'N/A']
-        df = df[df['Message Text'].notna()]
-        df = df[df['Message Text'] != 'No transcript available']
-        
-        print(f"📊 Processing data: {len(df)} rows, {df['Conversation ID'].nunique()} unique conversations")
-        
-        # Process more sessions for better analysis
-        processed_sessions = []
-        conversation_ids = df['Conversation ID'].unique()[:50]  # Process up to 50 sessions
-        
-        print(f"🔍 Analyzing {len(conversation_ids)} conversations...")
-        
-        for i, conv_id in enumerate(conversation_ids):
-            conv_data = df[df['Conversation ID'] == conv_id]
-            session_summary = get_session_summary(conv_id, conv_data)
-            processed_sessions.append(session_summary)
-            if i % 10 == 0:
-                print(f"   Processed {i+1}/{len(conversation_ids)} sessions...")
-        
-        # Store processed data in cache for faster dashboard loading
-        cache['processed_sessions'] = processed_sessions
-        cache['last_refresh'] = datetime.now()
-        
-        print(f"✅ Analysis complete! Cached {len(processed_sessions)} sessions")
-        print(f"📈 Sample session scores: {[s['performance_score'] for s in processed_sessions[:5]]}")
-        
+        job, created = job_manager.submit('refresh-ai-insights', refresh_ai_insights)
+        print(f"{'🆕 Queued' if created else '🔗 Joined running'} refresh job {job.id}")
         return jsonify({
-            "status": "success",
-            "message": f"Successfully refreshed AI insights for {len(processed_sessions)} sessions",
-            "sessions_processed": len(processed_sessions)
-        })
+            "status": job.status,
+            "job_id": job.id,
+            "coalesced": not created,
+            "status_url": f"/api/jobs/{job.id}",
+            "events_url": f"/api/jobs/{job.id}/events"
+        }), 202
         
     except Exception as e:
         print(f"❌ Error in refresh_ai_insights: {e}")
-        import traceback
-        traceback.print_exc()
         return jsonify({"error": str(e)})
 
+@app.route('/api/jobs/<job_id>')
+def api_job_status(job_id):
+    """API endpoint for background job progress"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/<job_id>/events')
+def api_job_events(job_id):
+    """Server-Sent Events stream of a job's progress, ending with a done or failed event"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return Response(stream_with_context(sse_events(job)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def generate_performance_report(job):
+    """Write the AI analysis report on a job thread, reporting each step and sample sentiment"""
+    # The analyzer pins a transcript version; report on the latest one
+    ai_analyzer.reload()
+    filename = f"performance_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md"
+    sentiments = defaultdict(int)
+    
+    def progress(done, total, step, insight):
+        if insight is not None:
+            sentiments[insight.sentiment] += 1
+        if not job.total:
+            job.start(total)
+        job.advance(message=f"Report step {done}/{total}: {step}", item=step,
+                    partial={'sample_sentiments': dict(sentiments)})
+    
+    result = ai_analyzer.generate_full_report(f"../{filename}", progress=progress)
+    return {
+        "message": result,
+        "filename": filename
+    }
+
 @app.route('/api/generate-performance-report')
 def api_generate_performance_report():
-    """API endpoint to generate performance report"""
+    """API endpoint to start (or join) a background performance report"""
     if not ai_analyzer:
         return jsonify({"error": "AI Analyzer not available"})
     
     try:
-        filename = f"performance_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md"
-        result = ai_analyzer.generate_full_report(f"../{filename}")
-        
+        job, created = job_manager.submit('generate-performance-report', generate_performance_report)
         return jsonify({
-            "status": "success",
-            "message": result,
-            "filename": filename
-        })
+            "status": job.status,
+            "job_id": job.id,
+            "coalesced": not created,
+            "status_url": f"/api/jobs/{job.id}",
+            "events_url": f"/api/jobs/{job.id}/events"
+        }), 202
     except Exception as e:
         return jsonify({"error": str(e)})
 
@@ -0,0 +1,57 @@
+"""
+AIA Analytics Dashboard - Response Compression
+gzip (or brotli, when installed) for text responses above a size threshold
+"""
+
+import os
+import gzip
+from typing import Optional
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip covers every browser
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv('AIA_COMPRESS_MIN_BYTES', 1024))
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/html', 'text/css', 'text/plain', 'text/javascript', 'application/javascript'}
+
+
+def choose_encoding(size: int) -> Optional[str]:
+    """'br', 'gzip' or None for a body of size bytes, from the request's Accept-Encoding"""
+    if size < COMPRESS_MIN_BYTES:
+        return None
+    if brotli is not None and request.accept_encodings['br']:
+        return 'br'
+    if request.accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def encode(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    # mtime=0 so the same body always compresses to the same bytes
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+def compress_response(response):
+    """after_request hook; streamed, passthrough and already-encoded responses are left alone"""
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    encoding = choose_encoding(len(body))
+    if encoding is None:
+        return response
+
+    response.set_data(encode(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        # A strong ETag names one representation, so the encoded body gets its own
+        response.set_etag(f"{etag}-{encoding}", weak)
+    return response
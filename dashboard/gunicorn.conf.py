@@ -0,0 +1,29 @@
+"""
+AIA Analytics Dashboard - gunicorn settings
+Run from the dashboard directory: gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+import os
+import multiprocessing
+
+chdir = os.path.dirname(os.path.abspath(__file__))
+bind = os.getenv('AIA_DASHBOARD_BIND', '0.0.0.0:5801')
+
+# Each worker process keeps its own transcript, summary table and indexes in memory; refreshes
+# and job progress reach the other workers through the shared state file, not recomputation
+workers = int(os.getenv('AIA_DASHBOARD_WORKERS', min(4, multiprocessing.cpu_count())))
+
+# Threaded workers, so open /api/jobs/<id>/events streams don't block other requests
+worker_class = 'gthread'
+threads = int(os.getenv('AIA_DASHBOARD_THREADS', 8))
+
+# Workers load the app after forking: SQLite connections and job threads must not be shared
+preload_app = False
+
+timeout = int(os.getenv('AIA_DASHBOARD_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.getenv('AIA_DASHBOARD_LOG_LEVEL', 'info')
@@ -0,0 +1,279 @@
+"""
+AIA Analytics Dashboard - Background Jobs
+Runs long analyses off the request thread; /api/jobs/<id> reports their progress and
+/api/jobs/<id>/events streams it as Server-Sent Events. With shared state, jobs are
+mirrored so any worker process can report them and a kind runs once across workers.
+"""
+
+import json
+import time
+import uuid
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+MAX_FINISHED_JOBS = 50  # finished jobs kept for status lookups
+MAX_ITEM_EVENTS = 1000  # per-item completions kept for event streams that fall behind
+SSE_HEARTBEAT_SECONDS = 15
+MAX_PUBLISHED_ITEMS = 200  # per-item completions mirrored for event streams on other workers
+ACTIVE_LEASE_SECONDS = 600  # a job kind's claim lapses if its worker stops publishing this long
+PUBLISHED_JOB_TTL_SECONDS = 24 * 3600
+REMOTE_POLL_SECONDS = 0.5
+
+
+class Job:
+    """Progress and outcome of one background job, updated by its worker thread"""
+
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.status = 'queued'
+        self.total = 0
+        self.completed = 0
+        self.message = 'Queued'
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.partial: Dict = {}  # running aggregates over the items completed so far
+        self.revision = 0  # bumped on every change, so event streams know what they have sent
+        self.items = deque(maxlen=MAX_ITEM_EVENTS)  # (revision, item) per completed item
+        self.publish: Optional[Callable[['Job', Dict], None]] = None  # mirrors each change to shared state
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+
+    @property
+    def active(self) -> bool:
+        return self.status in ('queued', 'running')
+
+    def _touch(self):
+        # Caller holds the lock
+        self.revision += 1
+        self.changed.notify_all()
+        if self.publish is not None:
+            self.publish(self, self._published_state())
+
+    def _published_state(self) -> Dict:
+        return dict(self._state(), revision=self.revision, items=list(self.items)[-MAX_PUBLISHED_ITEMS:])
+
+    def start(self, total: int, message: str = 'Running'):
+        with self.lock:
+            self.total = total
+            self.message = message
+            self._touch()
+
+    def advance(self, count: int = 1, message: Optional[str] = None, item: Optional[str] = None,
+                partial: Optional[Dict] = None):
+        """Record completed work; item names the conversation (or step) just finished"""
+        with self.lock:
+            self.completed += count
+            if message:
+                self.message = message
+            if partial is not None:
+                self.partial = partial
+            if item is not None:
+                self.items.append((self.revision + 1, item))
+            self._touch()
+
+    def wait_for_change(self, revision: int, timeout: float) -> int:
+        """Block until the job changes past revision (or timeout); returns the current revision"""
+        with self.lock:
+            self.changed.wait_for(lambda: self.revision != revision, timeout)
+            return self.revision
+
+    def items_since(self, revision: int):
+        with self.lock:
+            return [item for item_revision, item in self.items if item_revision > revision]
+
+    def to_dict(self) -> Dict:
+        """JSON-ready status, including throughput and ETA while running"""
+        with self.lock:
+            return self._state()
+
+    def _state(self) -> Dict:
+        # Caller holds the lock
+        now = self.finished_at or time.time()
+        elapsed = now - self.started_at if self.started_at else 0.0
+        rate = self.completed / elapsed if elapsed > 0 else 0.0
+        remaining = max(0, self.total - self.completed)
+        return {
+            'job_id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'message': self.message,
+            'completed': self.completed,
+            'total': self.total,
+            'percent': round(100.0 * self.completed / self.total, 1) if self.total else 0.0,
+            'elapsed_seconds': round(elapsed, 2),
+            'rate_per_second': round(rate, 2),
+            'eta_seconds': round(remaining / rate, 1) if rate > 0 and self.status == 'running' else None,
+            'partial': self.partial,
+            'result': self.result,
+            'error': self.error,
+        }
+
+
+class RemoteJob:
+    """Read-only view of a job running in another worker process, polled from shared state
+
+    Offers the parts of Job that /api/jobs and sse_events use.
+    """
+
+    def __init__(self, shared, job_id: str, state: Dict):
+        self.shared = shared
+        self.id = job_id
+        self.state = state
+
+    @property
+    def kind(self) -> str:
+        return self.state['kind']
+
+    @property
+    def status(self) -> str:
+        return self.state['status']
+
+    @property
+    def active(self) -> bool:
+        return self.status in ('queued', 'running')
+
+    def _refresh(self):
+        state = self.shared.get(f"job:{self.id}")
+        if state is not None:
+            self.state = state
+
+    def wait_for_change(self, revision: int, timeout: float) -> int:
+        deadline = time.time() + timeout
+        while True:
+            self._refresh()
+            if self.state['revision'] != revision or time.time() >= deadline:
+                return self.state['revision']
+            time.sleep(min(REMOTE_POLL_SECONDS, max(0.0, deadline - time.time())))
+
+    def items_since(self, revision: int):
+        return [item for item_revision, item in self.state['items'] if item_revision > revision]
+
+    def to_dict(self) -> Dict:
+        self._refresh()
+        return {key: value for key, value in self.state.items() if key not in ('revision', 'items')}
+
+
+def sse_events(job: Job, heartbeat: float = SSE_HEARTBEAT_SECONDS) -> Iterator[str]:
+    """Server-Sent Events for a job: a progress event per change, then one final done/failed event
+
+    Each progress event lists the items completed since the previous one, so a client that
+    connects late or falls behind still sees every conversation (up to MAX_ITEM_EVENTS).
+    """
+    sent = 0
+    while True:
+        revision = job.wait_for_change(sent, heartbeat)
+        if revision == sent and job.active:
+            yield ': keep-alive\n\n'
+            continue
+
+        state = job.to_dict()
+        state['items'] = job.items_since(sent)
+        sent = revision
+        event = 'progress' if state['status'] in ('queued', 'running') else ('done' if state['status'] == 'succeeded' else 'failed')
+        yield f"id: {revision}\nevent: {event}\ndata: {json.dumps(state, default=str)}\n\n"
+        if event != 'progress':
+            return
+
+
+class JobManager:
+    """Thread-pool job runner; submitting a kind that is already queued or running joins that job
+
+    Given a SharedState, jobs are published there as they change and each kind is claimed
+    across worker processes, so a second worker joins the running job instead of starting one.
+    """
+
+    def __init__(self, max_workers: int = 2, shared=None):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='dashboard-job')
+        self.shared = shared
+        self.lock = threading.Lock()
+        self.jobs: 'OrderedDict[str, Job]' = OrderedDict()
+
+    def submit(self, kind: str, run: Callable[[Job], Any]) -> Tuple[Job, bool]:
+        """(job, created); run(job) executes on a worker thread and its return value becomes job.result"""
+        with self.lock:
+            for job in self.jobs.values():
+                if job.kind == kind and job.active:
+                    return job, False
+
+            job = Job(kind)
+            if self.shared is not None:
+                # The job document is written with the claim, so every live holder has one
+                key, mine = f"active:{kind}", {'job_id': job.id}
+                documents = {f"job:{job.id}": job._published_state()}
+                holder = self.shared.claim(key, mine, ACTIVE_LEASE_SECONDS, documents)
+                while holder is not None:
+                    remote = self._remote(holder['job_id'])
+                    if remote is not None:
+                        return remote, False
+                    # The holder's job document is gone, so nothing will renew or release its
+                    # lease: take over that exact holder, never a claim another worker just made
+                    holder = self.shared.claim(key, mine, ACTIVE_LEASE_SECONDS, documents, orphan=holder)
+                self.shared.prune('job:', PUBLISHED_JOB_TTL_SECONDS)
+                job.publish = self._publish
+
+            self.jobs[job.id] = job
+            self._prune()
+        self.executor.submit(self._run, job, run)
+        return job, True
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """A job of this worker, or (with shared state) a RemoteJob view of another worker's"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is None and self.shared is not None:
+            return self._remote(job_id)
+        return job
+
+    def _remote(self, job_id: str) -> Optional[RemoteJob]:
+        state = self.shared.get(f"job:{job_id}")
+        return RemoteJob(self.shared, job_id, state) if state is not None else None
+
+    def _publish(self, job: Job, state: Dict):
+        if job.active:
+            # Publishing also renews this worker's claim on the job kind
+            self.shared.put_many({f"job:{job.id}": state, f"active:{job.kind}": {'job_id': job.id}})
+        else:
+            self.shared.put(f"job:{job.id}", state)
+            self.shared.release(f"active:{job.kind}", {'job_id': job.id})
+
+    def latest(self, kind: str) -> Optional[Job]:
+        """Most recently submitted job of a kind"""
+        with self.lock:
+            for job in reversed(self.jobs.values()):
+                if job.kind == kind:
+                    return job
+        return None
+
+    def _run(self, job: Job, run: Callable[[Job], Any]):
+        with job.lock:
+            job.status = 'running'
+            job.started_at = time.time()
+            job.message = 'Running'
+            job._touch()
+        try:
+            result = run(job)
+            with job.lock:
+                job.result = result
+                job.status = 'succeeded'
+                job.message = 'Complete'
+                job.finished_at = time.time()
+                job._touch()
+        except Exception as e:
+            print(f"❌ Job {job.kind} {job.id} failed: {e}")
+            with job.lock:
+                job.error = str(e)
+                job.status = 'failed'
+                job.message = 'Failed'
+                job.finished_at = time.time()
+                job._touch()
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self.jobs.items() if not job.active]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
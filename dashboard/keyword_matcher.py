@@ -0,0 +1,130 @@
+"""
+AIA Analytics Dashboard - Keyword Matcher
+Aho-Corasick automaton that finds every rule group in a conversation with one pass over its text
+"""
+
+import json
+import threading
+from pathlib import Path
+from typing import Dict, FrozenSet, List, Optional
+
+RULES_PATH = Path(__file__).with_name('keyword_rules.json')
+
+AGENT_PREFIX = 'Agent: '
+SCOPES = ('agent', 'conversation')
+
+# Thai sara am (U+0E33) is often typed as nikhahit + sara aa in the transcripts
+_KEYWORD_VARIANTS = [('ำ', 'ํา')]
+
+
+def _keyword_variants(keyword: str) -> List[str]:
+    """Lowercased keyword plus its alternate Thai spellings"""
+    variants = [keyword.lower()]
+    for composed, decomposed in _KEYWORD_VARIANTS:
+        if composed in variants[0]:
+            variants.append(variants[0].replace(composed, decomposed))
+    return variants
+
+
+class KeywordMatcher:
+    """Multi-pattern substring matcher over 'Role: text' conversation lines
+
+    Each rule group has a scope: 'agent' groups only count matches inside the text of
+    lines starting with 'Agent: ', 'conversation' groups count matches anywhere.
+    Matching is case-insensitive and works on any Unicode text (English and Thai).
+    """
+
+    def __init__(self, groups: Dict[str, Dict]):
+        self.groups = list(groups)
+        self.bits = {name: 1 << i for i, name in enumerate(self.groups)}
+        self.all_bits = (1 << len(self.groups)) - 1
+        self.agent_bits = 0
+        for name, rule in groups.items():
+            scope = rule.get('scope', 'conversation')
+            if scope not in SCOPES:
+                raise ValueError(f"Unknown scope '{scope}' for keyword group '{name}'")
+            if scope == 'agent':
+                self.agent_bits |= self.bits[name]
+
+        # Trie of all keywords; outputs hold (keyword length, group bits) per terminal state
+        goto = [{}]
+        outputs = [{}]
+        for name, rule in groups.items():
+            for keyword in rule.get('keywords', []):
+                for variant in _keyword_variants(keyword):
+                    if not variant:
+                        continue
+                    state = 0
+                    for ch in variant:
+                        if ch not in goto[state]:
+                            goto.append({})
+                            outputs.append({})
+                            goto[state][ch] = len(goto) - 1
+                        state = goto[state][ch]
+                    outputs[state][len(variant)] = outputs[state].get(len(variant), 0) | self.bits[name]
+
+        # Breadth-first failure links, folded into a full transition table so scanning
+        # never follows failure links at run time
+        fail = [0] * len(goto)
+        delta: List[Optional[Dict[str, int]]] = [None] * len(goto)
+        delta[0] = dict(goto[0])
+        queue = list(goto[0].values())
+        for state in queue:
+            for ch, child in goto[state].items():
+                queue.append(child)
+        for state in queue:
+            for ch, child in goto[state].items():
+                fail[child] = delta[fail[state]].get(ch, 0) if state else 0
+            inherited = outputs[fail[state]]
+            for length, bits in inherited.items():
+                outputs[state][length] = outputs[state].get(length, 0) | bits
+            delta[state] = {**delta[fail[state]], **goto[state]}
+
+        self._delta = delta
+        self._outputs = [tuple(out.items()) for out in outputs]
+
+    @classmethod
+    def from_file(cls, path=RULES_PATH) -> 'KeywordMatcher':
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f)['groups'])
+
+    def scan(self, conversation_text: str) -> int:
+        """Bitmask of the rule groups found in a conversation ('Role: text' lines)"""
+        delta, outputs = self._delta, self._outputs
+        agent_bits, all_bits = self.agent_bits, self.all_bits
+        found = 0
+        for line in conversation_text.split('\n'):
+            # Agent-scoped hits must start after the "Agent: " prefix
+            content_start = len(AGENT_PREFIX) if line.startswith(AGENT_PREFIX) else None
+            state = 0
+            for end, ch in enumerate(line.lower(), 1):
+                state = delta[state].get(ch, 0)
+                if outputs[state]:
+                    for length, bits in outputs[state]:
+                        if content_start is None or end - length < content_start:
+                            bits &= ~agent_bits
+                        found |= bits
+                    if found == all_bits:
+                        return found
+        return found
+
+    def groups_in(self, mask: int) -> FrozenSet[str]:
+        """Group names set in a scan() bitmask"""
+        return frozenset(name for name, bit in self.bits.items() if mask & bit)
+
+    def find_groups(self, conversation_text: str) -> FrozenSet[str]:
+        """Names of the rule groups found in a conversation"""
+        return self.groups_in(self.scan(conversation_text))
+
+
+_matcher = None
+_matcher_lock = threading.Lock()
+
+
+def get_keyword_matcher() -> KeywordMatcher:
+    """Shared matcher compiled once from keyword_rules.json"""
+    global _matcher
+    with _matcher_lock:
+        if _matcher is None:
+            _matcher = KeywordMatcher.from_file()
+        return _matcher
@@ -0,0 +1,124 @@
+"""
+AIA Analytics Dashboard - Response Cache
+Serialized JSON responses keyed by route, query parameters and data version, with strong ETags
+"""
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+from typing import Callable, Dict, Optional, Tuple
+
+from flask import Response, request
+
+from compression import choose_encoding, encode
+
+DEFAULT_MAX_ENTRIES = 256
+
+
+class CachedResponse:
+    """One serialized response body, its strong ETag and its compressed variants"""
+
+    def __init__(self, body: bytes, status: int = 200):
+        self.body = body
+        self.status = status
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self._encoded: Dict[str, bytes] = {}
+
+    def encoded(self, encoding: Optional[str]) -> bytes:
+        """Body in a content encoding, compressed on first use"""
+        if encoding is None:
+            return self.body
+        if encoding not in self._encoded:
+            self._encoded[encoding] = encode(self.body, encoding)
+        return self._encoded[encoding]
+
+
+class ResponseCache:
+    """LRU of JSON responses; a new data version simply stops matching old entries
+
+    Set AIA_RESPONSE_CACHE_SIZE to change how many responses are kept.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or int(os.getenv('AIA_RESPONSE_CACHE_SIZE', DEFAULT_MAX_ENTRIES))
+        self.lock = threading.Lock()
+        self.entries: 'OrderedDict[Tuple, CachedResponse]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    @staticmethod
+    def request_key(version: str) -> Tuple:
+        """Route plus query parameters in a canonical order, so ?a=1&b=2 and ?b=2&a=1 share an entry"""
+        params = tuple(sorted((name, tuple(values)) for name, values in request.args.lists()))
+        return request.path, params, version
+
+    def get(self, key: Tuple) -> Optional[CachedResponse]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Tuple, entry: CachedResponse):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses,
+                    'not_modified': self.not_modified}
+
+    def respond(self, entry: CachedResponse) -> Response:
+        """200 with the stored body (compressed if accepted), or 304 if the client already has this ETag"""
+        encoding = choose_encoding(len(entry.body))
+        # Each encoding is its own representation with its own strong ETag
+        etag = f"{entry.etag}-{encoding}" if encoding else entry.etag
+        if request.if_none_match.contains(etag):
+            with self.lock:
+                self.not_modified += 1
+            response = Response(status=304)
+        else:
+            response = Response(entry.encoded(encoding), status=entry.status, mimetype='application/json')
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        response.vary.add('Accept-Encoding')
+        # Clients may keep the body but must revalidate, which costs a 304 at most
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    def cached(self, version: Callable[[], str]):
+        """Decorator for JSON views whose output depends only on the query and version()
+
+        Error payloads ({"error": ...}) are passed through uncached.
+        """
+        def decorate(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                key = self.request_key(version())
+                entry = self.get(key)
+                if entry is None:
+                    response = view(*args, **kwargs)
+                    if isinstance(response, tuple) or not response.is_json or response.status_code != 200:
+                        return response
+                    payload = response.get_json(silent=True)
+                    if isinstance(payload, dict) and 'error' in payload:
+                        return response
+                    entry = CachedResponse(response.get_data())
+                    self.put(key, entry)
+                return self.respond(entry)
+            return wrapper
+        return decorate
@@ -0,0 +1,184 @@
+"""
+AIA Analytics Dashboard - Agent Rollups
+Per-agent totals and day/week time buckets of session scores, stored as compact column arrays
+"""
+
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from session_store import SCORE_COLUMNS, STATUS_LABELS
+from aggregates import CATEGORY_LABELS
+
+GRANULARITIES = ('day', 'week')
+PERCENTILES = {'p25': 0.25, 'median': 0.5, 'p75': 0.75}
+
+
+def _epoch_days(dates: np.ndarray) -> np.ndarray:
+    return dates.astype('datetime64[D]').astype(np.int64)
+
+
+def _bucket_start(days: np.ndarray, granularity: str) -> np.ndarray:
+    """First day of each day's bucket; weeks start on Monday (1970-01-01 was a Thursday)"""
+    if granularity == 'week':
+        return (days + 3) // 7 * 7 - 3
+    return days
+
+
+def _group_stats(group: np.ndarray, n_groups: int, columns: Dict[str, np.ndarray], rows: np.ndarray) -> Dict[str, np.ndarray]:
+    """Session count, mean and nearest-rank percentiles of every score, and status counts per group"""
+    counts = np.bincount(group, minlength=n_groups)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    stats = {
+        'count': counts.astype(np.int32),
+        'status_counts': np.bincount(group * len(STATUS_LABELS) + columns['status_code'][rows],
+                                     minlength=n_groups * len(STATUS_LABELS)).reshape(n_groups, len(STATUS_LABELS)).astype(np.int32),
+    }
+    for name in ('mean', *PERCENTILES):
+        stats[name] = np.empty((n_groups, len(SCORE_COLUMNS)), dtype=np.float32)
+
+    for i, col in enumerate(SCORE_COLUMNS):
+        values = columns[col][rows]
+        stats['mean'][:, i] = np.bincount(group, weights=values, minlength=n_groups) / np.maximum(counts, 1)
+        ordered = values[np.lexsort((values, group))]
+        for name, q in PERCENTILES.items():
+            stats[name][:, i] = ordered[starts + np.maximum(np.ceil(q * counts).astype(np.int64) - 1, 0)]
+    return stats
+
+
+class RollupSeries:
+    """One row per (agent, bucket) with sessions, sorted by agent then bucket start
+
+    offsets[a]:offsets[a + 1] are agent a's rows, so a timeseries lookup is a slice.
+    """
+
+    def __init__(self, granularity: str, agent_code: np.ndarray, bucket: np.ndarray, stats: Dict[str, np.ndarray], n_agents: int):
+        self.granularity = granularity
+        self.agent_code = agent_code
+        self.bucket = bucket  # bucket start, in days since 1970-01-01
+        self.stats = stats
+        self.offsets = np.searchsorted(agent_code, np.arange(n_agents + 1))
+
+    def __len__(self) -> int:
+        return len(self.bucket)
+
+    @classmethod
+    def build(cls, granularity: str, table, agent_code: np.ndarray, n_agents: int) -> 'RollupSeries':
+        rows = np.flatnonzero(~np.isnat(table.practice_date))
+        buckets = _bucket_start(_epoch_days(table.practice_date[rows]), granularity)
+        if not len(rows):
+            return cls(granularity, np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32),
+                       _group_stats(np.zeros(0, dtype=np.int64), 0, table.columns, rows), n_agents)
+
+        # (agent, bucket) as one sortable key; np.unique's order is agent-major
+        span = int(buckets.max() - buckets.min()) + 1
+        keys, group = np.unique(agent_code[rows].astype(np.int64) * span + (buckets - buckets.min()), return_inverse=True)
+        return cls(granularity, (keys // span).astype(np.int32), (keys % span + buckets.min()).astype(np.int32),
+                   _group_stats(group, len(keys), table.columns, rows), n_agents)
+
+    def rows_for(self, code: int, start_day: Optional[int] = None, end_day: Optional[int] = None) -> slice:
+        """Slice of an agent's rows, optionally limited to buckets starting in [start_day, end_day]"""
+        low, high = int(self.offsets[code]), int(self.offsets[code + 1])
+        buckets = self.bucket[low:high]
+        if start_day is not None:
+            low += int(np.searchsorted(buckets, _bucket_start(np.int64(start_day), self.granularity)))
+        if end_day is not None:
+            high = int(self.offsets[code]) + int(np.searchsorted(buckets, end_day, side='right'))
+        return slice(low, max(low, high))
+
+
+class AgentRollups:
+    """Per-agent totals plus day and week series over one session summary table"""
+
+    def __init__(self, table):
+        # Sorted agent ids, so lookups are a binary search
+        self.agent_ids, agent_code = np.unique(table.agent_id, return_inverse=True)
+        n_agents = len(self.agent_ids)
+        all_rows = np.arange(len(table))
+
+        self.totals = _group_stats(agent_code, n_agents, table.columns, all_rows)
+        self.messages = np.bincount(agent_code, weights=table.columns['total_messages'], minlength=n_agents).astype(np.int64)
+        days = np.where(np.isnat(table.practice_date), np.iinfo(np.int64).min, _epoch_days(table.practice_date))
+        self.last_day = np.full(n_agents, np.iinfo(np.int64).min, dtype=np.int64)
+        np.maximum.at(self.last_day, agent_code, days)
+        self.first_day = np.full(n_agents, np.iinfo(np.int64).max, dtype=np.int64)
+        np.minimum.at(self.first_day, agent_code, np.where(np.isnat(table.practice_date), np.iinfo(np.int64).max, days))
+
+        self.series = {granularity: RollupSeries.build(granularity, table, agent_code, n_agents) for granularity in GRANULARITIES}
+        self._agent_list = None
+
+    def __len__(self) -> int:
+        return len(self.agent_ids)
+
+    def agent_code(self, agent_id: str) -> Optional[int]:
+        code = int(np.searchsorted(self.agent_ids, agent_id))
+        return code if code < len(self.agent_ids) and self.agent_ids[code] == agent_id else None
+
+    @staticmethod
+    def _day_label(day: int) -> Optional[str]:
+        if day in (np.iinfo(np.int64).min, np.iinfo(np.int64).max):
+            return None
+        return str(np.datetime64(int(day), 'D'))
+
+    def _score_summary(self, code: int, i: int) -> Dict:
+        return {
+            'Score': round(float(self.totals['mean'][code, i]), 2),
+            'P25': round(float(self.totals['p25'][code, i]), 2),
+            'Median': round(float(self.totals['median'][code, i]), 2),
+            'P75': round(float(self.totals['p75'][code, i]), 2),
+        }
+
+    def agent_summary(self, code: int) -> Dict:
+        """Totals for one agent in the shape the agent templates read"""
+        return {
+            'Agent ID': str(self.agent_ids[code]),
+            'Conversations': int(self.totals['count'][code]),
+            'Messages': int(self.messages[code]),
+            'Performance': self._score_summary(code, SCORE_COLUMNS.index('performance_score')),
+            'Categories': {label: self._score_summary(code, SCORE_COLUMNS.index(col)) for col, label in CATEGORY_LABELS.items()},
+            'Status': dict(zip(STATUS_LABELS, self.totals['status_counts'][code].tolist())),
+            'First Session': self._day_label(self.first_day[code]),
+            'Last Session': self._day_label(self.last_day[code]),
+        }
+
+    def agents(self) -> List[Dict]:
+        """Every agent's totals, built once per rollup version"""
+        if self._agent_list is None:
+            self._agent_list = [self.agent_summary(code) for code in range(len(self.agent_ids))]
+        return self._agent_list
+
+    def timeseries(self, code: int, granularity: str = 'day', start_day: Optional[int] = None, end_day: Optional[int] = None) -> Dict:
+        """Column-oriented bucket arrays for one agent"""
+        series = self.series[granularity]
+        rows = series.rows_for(code, start_day, end_day)
+        return {
+            'agent_id': str(self.agent_ids[code]),
+            'granularity': granularity,
+            'buckets': np.datetime_as_string(series.bucket[rows].astype('datetime64[D]')).tolist(),
+            'sessions': series.stats['count'][rows].tolist(),
+            'scores': {
+                col: {name: np.round(series.stats[name][rows, i].astype(np.float64), 2).tolist() for name in ('mean', *PERCENTILES)}
+                for i, col in enumerate(SCORE_COLUMNS)
+            },
+            'status_counts': {label: series.stats['status_counts'][rows, i].tolist() for i, label in enumerate(STATUS_LABELS)},
+        }
+
+
+class AgentRollupStore:
+    """AgentRollups for the session store's current table, rebuilt once per transcript version"""
+
+    def __init__(self, session_store):
+        self.session_store = session_store
+        self.lock = threading.Lock()
+        self._table = None
+        self._rollups = None
+
+    def current(self) -> AgentRollups:
+        table = self.session_store.table()
+        with self.lock:
+            if table is not self._table:
+                print(f"🧮 Building agent rollups for {len(table)} sessions...")
+                self._rollups = AgentRollups(table)
+                self._table = table
+            return self._rollups
@@ -0,0 +1,287 @@
+"""
+AIA Analytics Dashboard - Rule-Based Session Scoring
+Per-conversation scoring used for session details, plus a batch scorer for the whole transcript
+"""
+
+import numpy as np
+import pandas as pd
+
+from keyword_matcher import get_keyword_matcher
+
+METRICS = {
+    'product_pitch': ['explain_benefits', 'explain_details', 'answer_questions', 'close_conversation'],
+    'objection_handling': ['listening', 'acknowledging', 'defusing', 'refocusing'],
+    'communication_skills': ['small_talk', 'content_organization', 'building_rapport', 'relevant_examples',
+                             'active_listening', 'closing'],
+}
+
+
+def build_performance(small_talk, insurance_discussion, courtesy, avg_response_length):
+    """Performance dict for one conversation from its rule signals"""
+    performance = {
+        category: {metric: {'score': 0, 'explanation': 'Not demonstrated'} for metric in metrics}
+        for category, metrics in METRICS.items()
+    }
+
+    # Analyze communication skills - Small talk
+    if small_talk:
+        performance['communication_skills']['small_talk'] = {
+            'score': 4,
+            'explanation': 'Engaged well in football discussion, showed personality'
+        }
+        performance['communication_skills']['building_rapport'] = {
+            'score': 4,
+            'explanation': 'Good rapport building through shared interests'
+        }
+
+    # Check for insurance-related content
+    if insurance_discussion:
+        performance['product_pitch']['explain_benefits']['score'] = 3
+        performance['product_pitch']['explain_benefits']['explanation'] = 'Mentioned insurance products'
+        performance['communication_skills']['content_organization']['score'] = 3
+        performance['communication_skills']['content_organization']['explanation'] = 'Transitioned to business discussion'
+
+    # Analyze response quality
+    if avg_response_length > 10:
+        performance['communication_skills']['active_listening']['score'] = 3
+        performance['communication_skills']['active_listening']['explanation'] = 'Provided detailed responses'
+    elif avg_response_length < 3:
+        performance['communication_skills']['active_listening']['score'] = 2
+        performance['communication_skills']['active_listening']['explanation'] = 'Very brief responses, may indicate disengagement'
+
+    # Check for professional language and courtesy
+    if courtesy:
+        performance['communication_skills']['building_rapport']['score'] = max(
+            performance['communication_skills']['building_rapport']['score'], 3
+        )
+
+    return performance
+
+def analyze_agent_performance(conversation_text, conversation_id, groups=None):
+    """Analyze agent performance based on conversation content
+
+    groups are the keyword rule groups found in the conversation; scanned here if not given.
+    """
+    if groups is None:
+        groups = get_keyword_matcher().find_groups(conversation_text)
+
+    # Extract agent responses for analysis
+    lines = conversation_text.split('\n')
+    agent_responses = [line.split(': ', 1)[1] for line in lines if line.startswith('Agent: ')]
+
+    total_agent_words = sum(len(response.split()) for response in agent_responses)
+    avg_response_length = total_agent_words / len(agent_responses) if agent_responses else 0
+
+    return build_performance(
+        small_talk='small_talk' in groups,
+        insurance_discussion='insurance_discussion' in groups,
+        courtesy='courtesy' in groups,
+        avg_response_length=avg_response_length
+    )
+
+def detect_scenario_type(conversation_text, groups=None):
+    """Classify the practice scenario from the full conversation text"""
+    if groups is None:
+        groups = get_keyword_matcher().find_groups(conversation_text)
+    scenario_type = "General Practice"
+    if 'product_pitch_scenario' in groups:
+        scenario_type = "Product Pitch"
+    if 'objection_scenario' in groups:
+        scenario_type = "Objection Handling"
+    return scenario_type
+
+# Category averages at or above / below these are listed as strengths / improvement areas
+STRENGTH_THRESHOLD = 3.5
+IMPROVEMENT_THRESHOLD = 3.0
+
+def practice_status_for(overall_score):
+    """Practice status label for an (unrounded) overall score"""
+    if overall_score >= 4.0:
+        return "Completed - Excellent"
+    elif overall_score >= 3.0:
+        return "Completed - Good"
+    elif overall_score >= 2.0:
+        return "Needs Review"
+    return "Requires Attention"
+
+def feedback_for(practice_status, improvement_areas):
+    """AI feedback line for a practice status and the session's improvement areas"""
+    if practice_status == "Completed - Excellent":
+        return "Excellent performance! Strong across all areas."
+    elif practice_status == "Completed - Good":
+        return f"Good foundation. Focus on: {', '.join(improvement_areas) if improvement_areas else 'maintaining consistency'}"
+    elif practice_status == "Needs Review":
+        return f"Needs improvement in: {', '.join(improvement_areas)}. Consider additional practice."
+    return "Significant improvement needed. Recommend manager review."
+
+def get_session_summary(conversation_id, conversation_data):
+    """Generate session summary for dashboard display"""
+
+    # Calculate basic metrics
+    agent_messages = len(conversation_data[conversation_data['Message Role'] == 'Agent'])
+    customer_messages = len(conversation_data[conversation_data['Message Role'] == 'Customer'])
+    total_messages = len(conversation_data)
+
+    # Analyze conversation content
+    conversation_text = ""
+    for _, row in conversation_data.iterrows():
+        role = row['Message Role']
+        text = row['Message Text']
+        conversation_text += f"{role}: {text}\n"
+
+    # One keyword pass serves both the performance rules and scenario detection
+    groups = get_keyword_matcher().find_groups(conversation_text)
+
+    # Get AI performance analysis
+    performance = analyze_agent_performance(conversation_text, conversation_id, groups)
+
+    # Calculate category averages
+    product_pitch_avg = np.mean([
+        performance['product_pitch']['explain_benefits']['score'],
+        performance['product_pitch']['explain_details']['score'],
+        performance['product_pitch']['answer_questions']['score'],
+        performance['product_pitch']['close_conversation']['score']
+    ])
+
+    objection_handling_avg = np.mean([
+        performance['objection_handling']['listening']['score'],
+        performance['objection_handling']['acknowledging']['score'],
+        performance['objection_handling']['defusing']['score'],
+        performance['objection_handling']['refocusing']['score']
+    ])
+
+    communication_skills_avg = np.mean([
+        performance['communication_skills']['small_talk']['score'],
+        performance['communication_skills']['content_organization']['score'],
+        performance['communication_skills']['building_rapport']['score'],
+        performance['communication_skills']['relevant_examples']['score'],
+        performance['communication_skills']['active_listening']['score'],
+        performance['communication_skills']['closing']['score']
+    ])
+
+    overall_score = np.mean([product_pitch_avg, objection_handling_avg, communication_skills_avg])
+
+    # Determine strengths and improvement areas
+    category_scores = {
+        'Product Pitch': product_pitch_avg,
+        'Objection Handling': objection_handling_avg,
+        'Communication Skills': communication_skills_avg
+    }
+
+    strengths = [k for k, v in category_scores.items() if v >= STRENGTH_THRESHOLD]
+    improvement_areas = [k for k, v in category_scores.items() if v < IMPROVEMENT_THRESHOLD]
+
+    # Determine scenario type based on conversation content
+    scenario_type = detect_scenario_type(conversation_text, groups)
+
+    # Generate AI feedback
+    practice_status = practice_status_for(overall_score)
+    ai_feedback = feedback_for(practice_status, improvement_areas)
+
+    return {
+        'session_id': conversation_id,
+        'agent_id': conversation_data['Agent ID'].iloc[0] if 'Agent ID' in conversation_data.columns else 'Unknown',
+        'practice_date': conversation_data['Created At'].iloc[0] if 'Created At' in conversation_data.columns else None,
+        'total_messages': total_messages,
+        'agent_messages': agent_messages,
+        'customer_messages': customer_messages,
+        'scenario_type': scenario_type,
+        'performance_score': round(overall_score, 1),
+        'product_pitch_score': round(product_pitch_avg, 1),
+        'objection_handling_score': round(objection_handling_avg, 1),
+        'communication_skills_score': round(communication_skills_avg, 1),
+        'strengths': strengths,
+        'improvement_areas': improvement_areas,
+        'ai_feedback': ai_feedback,
+        'practice_status': practice_status,
+        'detailed_performance': performance
+    }
+
+def score_conversations(df):
+    """Score every conversation in a cleaned transcript at once
+
+    Returns one row per Conversation ID (first-appearance order) with the 14 metric
+    scores, category averages, scenario_type, practice_status, message counts, agent_id
+    and practice_date -- the same values get_session_summary produces per conversation.
+    """
+    conv_codes, conv_ids = pd.factorize(df['Conversation ID'])
+    n = len(conv_ids)
+    roles = df['Message Role'].to_numpy(dtype=object)
+
+    # Rebuild each row's "Role: text" line exactly as the per-conversation path does
+    row_text = pd.Series([f"{role}: {text}" for role, text in zip(roles, df['Message Text'].to_numpy(dtype=object))])
+    conversation_text = (row_text + '\n').groupby(conv_codes, sort=False).agg(''.join)
+
+    # Split messages into lines and keep the text of lines starting with "Agent: "
+    lines = row_text.str.split('\n')
+    line_codes = np.repeat(conv_codes, lines.str.len().to_numpy())
+    lines = pd.Series(np.concatenate(lines.to_numpy()) if len(lines) else [], dtype=object)
+    is_agent = lines.str.startswith('Agent: ').to_numpy(dtype=bool)
+    responses = lines[is_agent].str.slice(7).reset_index(drop=True)
+    response_codes = line_codes[is_agent]
+
+    response_counts = np.bincount(response_codes, minlength=n)
+    word_counts = responses.str.split().str.len().to_numpy(dtype=np.int64)
+    total_words = np.bincount(response_codes, weights=word_counts, minlength=n)
+    avg_response_length = np.divide(total_words, response_counts, out=np.zeros(n), where=response_counts > 0)
+
+    # One keyword pass per conversation finds every rule group
+    matcher = get_keyword_matcher()
+    group_masks = np.fromiter((matcher.scan(text) for text in conversation_text), dtype=np.int64, count=n)
+
+    def has_group(name):
+        return (group_masks & matcher.bits[name]) != 0
+
+    small_talk = has_group('small_talk')
+    insurance = has_group('insurance_discussion')
+    courtesy = has_group('courtesy')
+
+    # Score matrix mirroring build_performance
+    scores = {f"{category}.{metric}": np.zeros(n, dtype=np.int64) for category, metrics in METRICS.items() for metric in metrics}
+    scores['communication_skills.small_talk'][small_talk] = 4
+    scores['communication_skills.building_rapport'][small_talk] = 4
+    scores['product_pitch.explain_benefits'][insurance] = 3
+    scores['communication_skills.content_organization'][insurance] = 3
+    scores['communication_skills.active_listening'][avg_response_length > 10] = 3
+    scores['communication_skills.active_listening'][avg_response_length < 3] = 2
+    scores['communication_skills.building_rapport'][courtesy] = np.maximum(scores['communication_skills.building_rapport'][courtesy], 3)
+
+    category_avg = {}
+    for category, metrics in METRICS.items():
+        total = scores[f"{category}.{metrics[0]}"].astype(np.float64)
+        for metric in metrics[1:]:
+            total = total + scores[f"{category}.{metric}"]
+        category_avg[category] = total / len(metrics)
+    overall = (category_avg['product_pitch'] + category_avg['objection_handling'] + category_avg['communication_skills']) / 3
+
+    scenario_type = np.full(n, "General Practice", dtype=object)
+    scenario_type[has_group('product_pitch_scenario')] = "Product Pitch"
+    scenario_type[has_group('objection_scenario')] = "Objection Handling"
+
+    practice_status = np.select(
+        [overall >= 4.0, overall >= 3.0, overall >= 2.0],
+        ["Completed - Excellent", "Completed - Good", "Needs Review"],
+        default="Requires Attention"
+    ).astype(object)
+
+    # Factorize codes follow first appearance, so code i's first row gives its agent and date
+    first_rows = np.unique(conv_codes, return_index=True)[1]
+    result = pd.DataFrame({
+        'agent_id': df['Agent ID'].to_numpy(dtype=object)[first_rows] if 'Agent ID' in df.columns else 'Unknown',
+        'practice_date': df['Created At'].to_numpy()[first_rows] if 'Created At' in df.columns else None,
+        'total_messages': np.bincount(conv_codes, minlength=n),
+        'agent_messages': np.bincount(conv_codes, weights=roles == 'Agent', minlength=n).astype(np.int64),
+        'customer_messages': np.bincount(conv_codes, weights=roles == 'Customer', minlength=n).astype(np.int64),
+        'scenario_type': scenario_type,
+        'performance_score': np.round(overall, 1),
+        'product_pitch_score': np.round(category_avg['product_pitch'], 1),
+        'objection_handling_score': np.round(category_avg['objection_handling'], 1),
+        'communication_skills_score': np.round(category_avg['communication_skills'], 1),
+        'practice_status': practice_status,
+        'small_talk': small_talk,
+        'insurance_discussion': insurance,
+        'courtesy': courtesy,
+        'avg_response_length': avg_response_length,
+        **scores,
+    }, index=pd.Index(conv_ids, name='session_id'))
+    return result
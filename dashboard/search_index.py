@@ -0,0 +1,165 @@
+"""
+AIA Analytics Dashboard - Session Search Index
+Trigram inverted index over session IDs, agent IDs, scenario labels and message text
+"""
+
+import re
+import threading
+import unicodedata
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from session_store import SCENARIO_LABELS
+
+THAI = '\u0E00-\u0E7F'
+# Thai is written without spaces between words, so Thai runs are kept whole and matched by
+# their character trigrams rather than segmented into words; a run of Thai next to Latin
+# text or digits (e.g. "AIAประกัน") splits at the script boundary.
+TOKEN_PATTERN = re.compile(rf'[{THAI}]+|[^\s{THAI}]+')
+ZERO_WIDTH = dict.fromkeys(map(ord, '\u200b\u200c\u200d\u2060\ufeff'))
+
+# Token boundary padding: every position of a token starts a full trigram, so one- and
+# two-character queries are a prefix range of the sorted trigram vocabulary
+TOKEN_START, TOKEN_END = '\x02', '\x03\x03'
+
+
+def normalize(text: str) -> str:
+    """NFKC-folded, lowercased text without zero-width characters"""
+    return unicodedata.normalize('NFKC', text).translate(ZERO_WIDTH).lower()
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(normalize(text))
+
+
+def document_trigrams(tokens: List[str]) -> set:
+    grams = set()
+    for token in tokens:
+        padded = TOKEN_START + token + TOKEN_END
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class SessionSearchIndex:
+    """Posting lists of summary-table rows per trigram, stored as one sorted vocabulary and a CSR row array
+
+    Queries match sessions containing every whitespace-separated term as a substring of an ID,
+    the scenario label or any message. Trigram postings narrow the candidates and the
+    session's document confirms the match, so results are exact.
+    """
+
+    def __init__(self, table, documents: List[str], trigrams: List[set]):
+        self.table = table
+        self.documents = documents  # normalized search text per table row
+
+        lengths = np.fromiter((len(grams) for grams in trigrams), dtype=np.int64, count=len(trigrams))
+        if lengths.sum():
+            grams = np.fromiter((gram for row_grams in trigrams for gram in row_grams), dtype='<U3', count=int(lengths.sum()))
+            rows = np.repeat(np.arange(len(trigrams), dtype=np.int32), lengths)
+            self.vocabulary, gram_codes = np.unique(grams, return_inverse=True)
+            order = np.lexsort((rows, gram_codes))
+            self.postings = rows[order]
+            self.offsets = np.searchsorted(gram_codes[order], np.arange(len(self.vocabulary) + 1))
+        else:
+            self.vocabulary = np.zeros(0, dtype='<U3')
+            self.postings = np.zeros(0, dtype=np.int32)
+            self.offsets = np.zeros(1, dtype=np.int64)
+
+    def _gram_rows(self, gram: str) -> np.ndarray:
+        i = int(np.searchsorted(self.vocabulary, gram))
+        if i < len(self.vocabulary) and self.vocabulary[i] == gram:
+            return self.postings[self.offsets[i]:self.offsets[i + 1]]
+        return self.postings[:0]
+
+    def _term_candidates(self, term: str) -> np.ndarray:
+        if len(term) < 3:
+            # Every trigram starting with the term, which the token padding guarantees exists
+            low = int(np.searchsorted(self.vocabulary, term))
+            high = int(np.searchsorted(self.vocabulary, term + '\uffff'))
+            return np.unique(self.postings[self.offsets[low]:self.offsets[high]])
+
+        postings = sorted((self._gram_rows(term[i:i + 3]) for i in range(len(term) - 2)), key=len)
+        rows = postings[0]
+        for other in postings[1:]:
+            if not len(rows):
+                break
+            rows = np.intersect1d(rows, other, assume_unique=True)
+        return rows
+
+    def rows(self, query: str) -> np.ndarray:
+        """Sorted table rows whose sessions match every term of the query"""
+        terms = tokenize(query)
+        if not terms:
+            return np.arange(len(self.documents), dtype=np.int32)
+
+        candidates = None
+        for term in sorted(terms, key=len, reverse=True):
+            rows = self._term_candidates(term)
+            candidates = rows if candidates is None else np.intersect1d(candidates, rows, assume_unique=True)
+            if not len(candidates):
+                return candidates
+
+        if any(len(term) > 3 for term in terms):
+            # Trigrams of a longer term can all occur without the term itself
+            candidates = candidates[[all(term in self.documents[row] for term in terms) for row in candidates]]
+        return candidates
+
+    def mask(self, query: str) -> np.ndarray:
+        """Boolean mask over table rows, to AND with the other session filters"""
+        mask = np.zeros(len(self.documents), dtype=bool)
+        mask[self.rows(query)] = True
+        return mask
+
+
+class SearchIndexStore:
+    """SessionSearchIndex for the session store's current table
+
+    Per-session tokens are kept between versions, so an appended transcript only
+    re-tokenizes the conversations that received new messages.
+    """
+
+    def __init__(self, session_store):
+        self.session_store = session_store
+        self.transcript_store = session_store.transcript_store
+        self.lock = threading.Lock()
+        self._index = None
+        self._version = None
+        self._sessions: Dict[str, tuple] = {}  # session_id -> (document, trigrams)
+
+    def current(self, table=None) -> SessionSearchIndex:
+        """Index for table (default: the current summary table)"""
+        table = table if table is not None else self.session_store.table()
+        with self.lock:
+            if self._index is None or self._index.table is not table:
+                snapshot = self.transcript_store.snapshot()
+                if self._index is not None and snapshot.parent_version == self._version:
+                    stale = set(snapshot.touched_ids)
+                else:
+                    stale = None
+                self._index = self._build(table, snapshot, stale)
+                self._version = snapshot.version
+            return self._index
+
+    def _build(self, table, snapshot, stale: Optional[set]) -> SessionSearchIndex:
+        if stale is None:
+            self._sessions, stale = {}, set()
+        session_ids = table.session_id.tolist()
+        missing = [sid for sid in session_ids if sid not in self._sessions or sid in stale]
+        print(f"🔎 Indexing {len(missing)} of {len(session_ids)} sessions for search...")
+
+        texts = snapshot.frame['Message Text'].fillna('').astype(str).to_numpy()
+        scenarios = dict(zip(session_ids, table.scenario_code.tolist()))
+        agents = dict(zip(session_ids, table.agent_id.tolist()))
+        for sid in missing:
+            row_range = snapshot.index.row_range(sid)
+            messages = texts[row_range[0]:row_range[1]] if row_range else []
+            fields = [sid, agents[sid], SCENARIO_LABELS[scenarios[sid]], *messages]
+            tokens = [token for field in fields for token in tokenize(field)]
+            self._sessions[sid] = ('\n'.join(normalize(field) for field in fields), document_trigrams(tokens))
+
+        if len(self._sessions) > len(session_ids):
+            self._sessions = {sid: self._sessions[sid] for sid in session_ids}
+        return SessionSearchIndex(table,
+                                  [self._sessions[sid][0] for sid in session_ids],
+                                  [self._sessions[sid][1] for sid in session_ids])
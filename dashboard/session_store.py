@@ -0,0 +1,306 @@
+"""
+AIA Analytics Dashboard - Session Summary Store
+Materializes one summary row per conversation so /api/sessions pages are array slices
+"""
+
+import os
+import re
+import json
+import base64
+import threading
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from scoring import IMPROVEMENT_THRESHOLD, STRENGTH_THRESHOLD, feedback_for, score_conversations
+
+# Bump when the scoring rules behind get_session_summary change so on-disk tables are rebuilt
+SUMMARY_FORMAT_VERSION = 5
+
+STATUS_LABELS = ['Completed - Excellent', 'Completed - Good', 'Needs Review', 'Requires Attention']
+SCENARIO_LABELS = ['General Practice', 'Product Pitch', 'Objection Handling']
+
+SCORE_COLUMNS = ['performance_score', 'product_pitch_score', 'objection_handling_score', 'communication_skills_score']
+COUNT_COLUMNS = ['total_messages', 'agent_messages', 'customer_messages']
+
+# Performance bands by overall score: < 3.0, 3.0-3.9, >= 4.0
+PERFORMANCE_BANDS = ['needs_improvement', 'good', 'excellent']
+PERFORMANCE_BAND_EDGES = [3.0, 4.0]
+
+# Fields of a get_session_summary dict that the table holds; detailed_performance
+# (the 14 metric objects) is only produced by the full summary
+SUMMARY_FIELDS = ['session_id', 'agent_id', 'practice_date', *COUNT_COLUMNS, 'scenario_type', *SCORE_COLUMNS,
+                  'strengths', 'improvement_areas', 'ai_feedback', 'practice_status']
+DETAIL_FIELDS = ['detailed_performance']
+CATEGORY_COLUMNS = {
+    'Product Pitch': 'product_pitch_score',
+    'Objection Handling': 'objection_handling_score',
+    'Communication Skills': 'communication_skills_score',
+}
+
+FACETS = ('performance', 'status', 'scenario', 'agent')
+FACET_AGENT_LIMIT = 20  # agent facet counts returned, busiest first
+
+
+def date_sort_key(practice_date: np.ndarray) -> np.ndarray:
+    """Ascending int64 key for most-recent-first order, with missing dates last"""
+    date_key = practice_date.astype(np.int64)
+    return -np.where(np.isnat(practice_date), np.iinfo(np.int64).min + 1, date_key)
+
+
+def encode_cursor(direction: str, date_key: int, position: int, session_id: str) -> str:
+    """Opaque /api/sessions cursor for the rows after ('next') or before ('prev') a session"""
+    payload = json.dumps([direction, int(date_key), int(position), session_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str):
+    """(direction, date_key, position, session_id); raises ValueError for a malformed cursor"""
+    try:
+        direction, date_key, position, session_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+    if direction not in ('next', 'prev') or not isinstance(date_key, int) or not isinstance(position, int):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return direction, date_key, position, session_id
+
+
+def facet_slug(label: str) -> str:
+    """URL filter value for a label, e.g. 'Completed - Good' -> 'completed_good'"""
+    return re.sub(r'[^a-z0-9]+', '_', label.lower()).strip('_')
+
+
+STATUS_SLUGS = [facet_slug(label) for label in STATUS_LABELS]
+SCENARIO_SLUGS = [facet_slug(label) for label in SCENARIO_LABELS]
+
+
+class SessionSummaryTable:
+    """Column arrays of session summaries, presorted by practice date (most recent first)"""
+
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        self.columns = columns
+        self.session_id = columns['session_id']
+        self.agent_id = columns['agent_id']
+        self.practice_date = columns['practice_date']
+        self.status_code = columns['status_code']
+        self.scenario_code = columns['scenario_code']
+        self.performance_score = columns['performance_score']
+        # Rows are sorted by (sort_date, transcript_position), so a cursor is found by binary search
+        self.sort_date = date_sort_key(self.practice_date)
+        self.transcript_position = columns['transcript_position']
+
+        # Small-int facet codes, computed once per table; -1 marks a label outside the known set
+        self.performance_band = np.digitize(self.performance_score, PERFORMANCE_BAND_EDGES).astype(np.int8)
+        self.agent_values, agent_code = np.unique(self.agent_id, return_inverse=True)
+        self.agent_code = agent_code.astype(np.int32)
+        self._facets = {
+            'performance': (self.performance_band, PERFORMANCE_BANDS),
+            'status': (self.status_code, STATUS_SLUGS),
+            'scenario': (self.scenario_code, SCENARIO_SLUGS),
+            'agent': (self.agent_code, self.agent_values),
+        }
+
+    def __len__(self) -> int:
+        return len(self.session_id)
+
+    @classmethod
+    def build(cls, snapshot) -> 'SessionSummaryTable':
+        """Batch-score every conversation once and sort the rows by practice date"""
+        return cls.from_scores(score_conversations(snapshot.frame), np.arange(len(snapshot.index)))
+
+    @classmethod
+    def from_scores(cls, scores: pd.DataFrame, positions: np.ndarray) -> 'SessionSummaryTable':
+        """Pack score_conversations output into presorted column arrays
+
+        positions are the conversations' places in transcript order, used to break date ties.
+        """
+        columns = {
+            'transcript_position': np.asarray(positions, dtype=np.int64),
+            'session_id': np.asarray(scores.index, dtype=str),
+            'agent_id': scores['agent_id'].astype(str).to_numpy(dtype=str),
+            'practice_date': pd.to_datetime(scores['practice_date']).to_numpy(dtype='datetime64[ns]'),
+            'status_code': pd.Categorical(scores['practice_status'], categories=STATUS_LABELS).codes.astype(np.int8),
+            'scenario_code': pd.Categorical(scores['scenario_type'], categories=SCENARIO_LABELS).codes.astype(np.int8),
+        }
+        for col in SCORE_COLUMNS:
+            columns[col] = scores[col].to_numpy(dtype=np.float64)
+        for col in COUNT_COLUMNS:
+            columns[col] = scores[col].to_numpy(dtype=np.int32)
+
+        return cls.sorted(columns)
+
+    @classmethod
+    def sorted(cls, columns: Dict[str, np.ndarray]) -> 'SessionSummaryTable':
+        """Order rows most recent first; missing dates last; ties keep transcript order"""
+        order = np.lexsort((columns['transcript_position'], date_sort_key(columns['practice_date'])))
+        return cls({name: values[order] for name, values in columns.items()})
+
+    def merge(self, delta: 'SessionSummaryTable') -> 'SessionSummaryTable':
+        """New table with delta's rows replacing or adding sessions, re-sorted"""
+        keep = ~np.isin(self.session_id, delta.session_id)
+        return self.sorted({name: np.concatenate([values[keep], delta.columns[name]])
+                            for name, values in self.columns.items()})
+
+    def facet_mask(self, name: str, values: List[str]) -> np.ndarray:
+        """Rows whose facet code is any of values (slugs, or agent IDs for 'agent')"""
+        codes, labels = self._facets[name]
+        # One slot past the labels stays False, so code -1 never matches
+        allowed = np.zeros(len(labels) + 1, dtype=bool)
+        for value in values:
+            if name == 'agent':
+                code = int(np.searchsorted(labels, value))
+                if code < len(labels) and labels[code] == value:
+                    allowed[code] = True
+            elif facet_slug(value) in labels:
+                allowed[labels.index(facet_slug(value))] = True
+        return allowed[codes]
+
+    def filter_masks(self, filters: Dict[str, List[str]]) -> Dict[str, np.ndarray]:
+        """One mask per active facet filter"""
+        return {name: self.facet_mask(name, values) for name, values in filters.items() if values}
+
+    def filter_mask(self, filters: Dict[str, List[str]], base: Optional[np.ndarray] = None) -> np.ndarray:
+        """Boolean mask of rows matching every facet filter (and base, e.g. a search mask)"""
+        mask = np.ones(len(self), dtype=bool) if base is None else base.copy()
+        for facet_mask in self.filter_masks(filters).values():
+            mask &= facet_mask
+        return mask
+
+    def facet_counts(self, filters: Dict[str, List[str]], base: Optional[np.ndarray] = None) -> Dict[str, Dict[str, int]]:
+        """Sessions per value of each facet, under every filter except that facet's own
+
+        So a facet's counts show what selecting each of its values would return.
+        """
+        masks = self.filter_masks(filters)
+        counts = {}
+        for name in FACETS:
+            mask = np.ones(len(self), dtype=bool) if base is None else base.copy()
+            for other, facet_mask in masks.items():
+                if other != name:
+                    mask &= facet_mask
+            codes, labels = self._facets[name]
+            selected = codes[mask]
+            totals = np.bincount(selected[selected >= 0], minlength=len(labels))
+            if name == 'agent':
+                # The busiest agents, plus any the filter selected
+                busiest = [i for i in np.argsort(-totals, kind='stable')[:FACET_AGENT_LIMIT] if totals[i]]
+                selected_agents = [value for value in filters.get(name, []) if value in self.agent_values]
+                counts[name] = {str(labels[i]): int(totals[i]) for i in busiest}
+                counts[name].update({value: int(totals[np.searchsorted(labels, value)]) for value in selected_agents})
+            else:
+                counts[name] = dict(zip(labels, totals.tolist()))
+        return counts
+
+    def cursor(self, row: int, direction: str) -> str:
+        return encode_cursor(direction, self.sort_date[row], self.transcript_position[row], str(self.session_id[row]))
+
+    def seek(self, date_key: int, position: int, after: bool) -> int:
+        """Index of the first row after (or at, if not after) the sort key, in O(log n)
+
+        The key need not be in the table, so cursors stay valid while sessions are added.
+        """
+        low = int(np.searchsorted(self.sort_date, date_key, side='left'))
+        high = int(np.searchsorted(self.sort_date, date_key, side='right'))
+        return low + int(np.searchsorted(self.transcript_position[low:high], position, side='right' if after else 'left'))
+
+    def compact_summaries(self, rows: np.ndarray, fields: Optional[List[str]] = None) -> List[Dict]:
+        """get_session_summary dicts without detailed_performance, read from the columns
+
+        Category averages are multiples of 1/4 or 1/6, so strengths and improvement areas
+        from the rounded scores match the full summary's; fields limits the keys returned.
+        """
+        fields = fields or SUMMARY_FIELDS
+        summaries = []
+        for row in rows:
+            category_scores = {label: self.columns[col][row] for label, col in CATEGORY_COLUMNS.items()}
+            improvement_areas = [label for label, score in category_scores.items() if score < IMPROVEMENT_THRESHOLD]
+            status = STATUS_LABELS[self.status_code[row]]
+            values = {
+                'session_id': str(self.session_id[row]),
+                'agent_id': str(self.agent_id[row]),
+                'practice_date': None if np.isnat(self.practice_date[row]) else pd.Timestamp(self.practice_date[row]),
+                'scenario_type': SCENARIO_LABELS[self.scenario_code[row]],
+                'strengths': [label for label, score in category_scores.items() if score >= STRENGTH_THRESHOLD],
+                'improvement_areas': improvement_areas,
+                'ai_feedback': feedback_for(status, improvement_areas),
+                'practice_status': status,
+            }
+            values.update({col: float(self.columns[col][row]) for col in SCORE_COLUMNS})
+            values.update({col: int(self.columns[col][row]) for col in COUNT_COLUMNS})
+            summaries.append({field: values[field] for field in fields})
+        return summaries
+
+    def save(self, path):
+        """Write the table as an uncompressed .npz next to the transcript cache
+
+        Written to a temporary file and renamed, so other worker processes never load a partial table.
+        """
+        path = Path(path)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **self.columns)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path) -> 'SessionSummaryTable':
+        with np.load(path) as data:
+            return cls({name: data[name] for name in data.files})
+
+
+class SessionSummaryStore:
+    """Keeps the session summary table for the current transcript version in memory and on disk"""
+
+    def __init__(self, transcript_store, summarize: Callable):
+        self.transcript_store = transcript_store
+        self.summarize = summarize
+        self.lock = threading.Lock()
+        self._table = None
+        self._version = None
+        # (base table, delta, merged table) of the latest incremental update, for derived aggregates
+        self.last_merge = None
+
+    def table(self) -> SessionSummaryTable:
+        """Summary table for the current transcript, built at most once per version"""
+        snapshot = self.transcript_store.snapshot()
+        with self.lock:
+            if self._table is None or self._version != snapshot.version:
+                self._table = self._load_or_build(snapshot)
+                self._version = snapshot.version
+            return self._table
+
+    def _apply_appended(self, snapshot) -> SessionSummaryTable:
+        """Re-summarize only the conversations that received appended rows"""
+        touched = [conv_id for conv_id in snapshot.touched_ids if conv_id in snapshot.index]
+        positions = np.asarray([snapshot.index.positions[conv_id] for conv_id in touched], dtype=np.int64)
+        print(f"🧮 Updating session summaries for {len(touched)} touched conversations...")
+        frame = pd.concat([snapshot.conversation(conv_id) for conv_id in touched]) if touched else snapshot.frame.iloc[0:0]
+        delta = SessionSummaryTable.from_scores(score_conversations(frame), positions)
+        merged = self._table.merge(delta)
+        self.last_merge = (self._table, delta, merged)
+        return merged
+
+    def summaries(self, session_ids, snapshot=None) -> List[Dict]:
+        """Full get_session_summary dicts for a handful of sessions (e.g. one page)"""
+        snapshot = snapshot or self.transcript_store.snapshot()
+        return [self.summarize(conv_id, conv_data) for conv_id, conv_data in snapshot.conversations(session_ids)]
+
+    def _load_or_build(self, snapshot) -> SessionSummaryTable:
+        path = self.transcript_store.artifact_path(f"sessions.v{SUMMARY_FORMAT_VERSION}.npz", snapshot.version)
+        if path is not None and path.exists():
+            try:
+                return SessionSummaryTable.load(path)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"⚠️ Session summary cache unreadable, rebuilding: {e}")
+
+        if self._table is not None and snapshot.parent_version == self._version:
+            table = self._apply_appended(snapshot)
+        else:
+            print(f"🧮 Building session summary table for {len(snapshot.index)} conversations...")
+            table = SessionSummaryTable.build(snapshot)
+        if path is not None:
+            try:
+                table.save(path)
+            except OSError as e:
+                print(f"⚠️ Could not write session summary cache: {e}")
+        return table
@@ -0,0 +1,17 @@
+"""
+AIA Analytics Dashboard - WSGI Entry Point
+Production servers load `app` from here, e.g. gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+import os
+import sys
+
+# app.py reads ../log/transcript.csv and its templates relative to the dashboard directory
+DASHBOARD_DIR = os.path.dirname(os.path.abspath(__file__))
+os.chdir(DASHBOARD_DIR)
+if DASHBOARD_DIR not in sys.path:
+    sys.path.insert(0, DASHBOARD_DIR)
+
+from app import app  # noqa: E402
+
+application = app
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+AIA Analytics - Pooled HTTP Session
+Keep-alive requests.Session sized for concurrent batch analysis
+"""
+
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from batch_runner import default_concurrency
+
+
+def create_pooled_session(headers: Optional[Dict[str, str]] = None, pool_size: Optional[int] = None) -> requests.Session:
+    """Session whose connection pool holds one keep-alive connection per batch worker
+
+    pool_block makes extra threads wait for a free connection instead of opening (and
+    discarding) new TCP+TLS connections. Sessions are shared across the batch workers.
+    """
+    pool_size = pool_size or default_concurrency()
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, pool_block=True)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    if headers:
+        session.headers.update(headers)
+    return session
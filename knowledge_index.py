@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+AIA Analytics - Knowledge Index
+BM25 retrieval over the PayLifePlus brochure pages so prompts carry the chunks relevant to each conversation
+"""
+
+import re
+import json
+import math
+import hashlib
+import threading
+from collections import Counter
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from prompt_builder import count_tokens
+
+# Bump when chunking or tokenization changes so persisted indexes are rebuilt
+INDEX_FORMAT_VERSION = 1
+INDEX_FILENAME = '.knowledge_index.json'
+
+MAX_CHUNK_CHARS = 1200
+# Page-description sections from the PDF conversion that carry no product knowledge
+SKIP_SECTIONS = {'visual elements', 'images and figures', 'layout and design', 'tables', 'diagrams and flowcharts'}
+EMPTY_BODIES = {'', 'none present.', 'none present'}
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+ENGLISH_STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'has', 'have', 'i', 'in', 'is', 'it',
+    'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was', 'we', 'with', 'you', 'your', 'agent', 'customer',
+}
+
+_HEADING = re.compile(r'^(#{1,6})\s+(.*?)\s*$')
+_LATIN_WORD = re.compile(r'[a-z0-9]+')
+_THAI_RUN = re.compile(r'[฀-๿]+')
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased English words plus Thai character bigrams (Thai is written without spaces)"""
+    text = text.lower().replace('ํา', 'ำ')
+    tokens = [word for word in _LATIN_WORD.findall(text) if word not in ENGLISH_STOPWORDS]
+    for run in _THAI_RUN.findall(text):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+@dataclass
+class KnowledgeChunk:
+    source: str
+    heading: str
+    text: str
+
+    def render(self) -> str:
+        return f"--- {self.source}: {self.heading} ---\n{self.text}"
+
+
+def _strip_front_matter(content: str) -> str:
+    if content.startswith('---'):
+        end = content.find('\n---', 3)
+        if end != -1:
+            return content[end + 4:]
+    return content
+
+
+def chunk_page(source: str, content: str) -> List[KnowledgeChunk]:
+    """Split one brochure page at its headings, then at line breaks to MAX_CHUNK_CHARS"""
+    sections: List[Tuple[str, List[str]]] = [('Page', [])]
+    for line in _strip_front_matter(content).splitlines():
+        match = _HEADING.match(line)
+        if match:
+            sections.append((match.group(2), []))
+        else:
+            sections[-1][1].append(line.rstrip())
+
+    chunks = []
+    for heading, lines in sections:
+        body = '\n'.join(lines).strip()
+        if heading.lower().rstrip(':') in SKIP_SECTIONS or body.lower() in EMPTY_BODIES:
+            continue
+        current = ''
+        for line in body.split('\n'):
+            if current and len(current) + len(line) + 1 > MAX_CHUNK_CHARS:
+                chunks.append(KnowledgeChunk(source, heading, current.strip()))
+                current = ''
+            current += line + '\n'
+        if current.strip():
+            chunks.append(KnowledgeChunk(source, heading, current.strip()))
+    return chunks
+
+
+class KnowledgeIndex:
+    """BM25 index over brochure chunks, persisted next to the brochure pages"""
+
+    def __init__(self, chunks: List[KnowledgeChunk], source_hash: str):
+        self.chunks = chunks
+        self.source_hash = source_hash
+        self.doc_lengths = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        for chunk_id, chunk in enumerate(chunks):
+            counts = Counter(tokenize(f"{chunk.heading}\n{chunk.text}"))
+            self.doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings.setdefault(term, []).append((chunk_id, tf))
+        self.avg_length = (sum(self.doc_lengths) / len(self.doc_lengths)) if self.doc_lengths else 0.0
+        n = len(chunks)
+        self.idf = {term: math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5)) for term, docs in self.postings.items()}
+
+    @staticmethod
+    def source_files(kb_path: Path) -> List[Path]:
+        return sorted(Path(kb_path).glob("*.md"))
+
+    @classmethod
+    def hash_sources(cls, kb_path: Path) -> str:
+        digest = hashlib.sha256(f"v{INDEX_FORMAT_VERSION}".encode())
+        for md_file in cls.source_files(kb_path):
+            digest.update(md_file.name.encode('utf-8'))
+            digest.update(md_file.read_bytes())
+        return digest.hexdigest()
+
+    @classmethod
+    def build(cls, kb_path: Path) -> 'KnowledgeIndex':
+        chunks = []
+        for md_file in cls.source_files(kb_path):
+            try:
+                chunks.extend(chunk_page(md_file.name, md_file.read_text(encoding='utf-8')))
+            except Exception as e:
+                print(f"⚠️ Error indexing {md_file}: {e}")
+        return cls(chunks, cls.hash_sources(kb_path))
+
+    @classmethod
+    def load_or_build(cls, kb_path) -> 'KnowledgeIndex':
+        """Persisted index if the brochure pages are unchanged, else rebuild and persist"""
+        kb_path = Path(kb_path)
+        index_path = kb_path / INDEX_FILENAME
+        source_hash = cls.hash_sources(kb_path)
+        if index_path.exists():
+            try:
+                with open(index_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('source_hash') == source_hash:
+                    return cls([KnowledgeChunk(**chunk) for chunk in data['chunks']], source_hash)
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                print(f"⚠️ Knowledge index unreadable, rebuilding: {e}")
+
+        index = cls.build(kb_path)
+        print(f"📚 Knowledge index built: {len(index.chunks)} chunks from {len(cls.source_files(kb_path))} pages")
+        if index.chunks:
+            try:
+                tmp_path = index_path.with_suffix('.tmp')
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({'source_hash': source_hash, 'chunks': [asdict(c) for c in index.chunks]}, f, ensure_ascii=False)
+                tmp_path.replace(index_path)
+            except OSError as e:
+                print(f"⚠️ Could not persist knowledge index: {e}")
+        return index
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[KnowledgeChunk, float]]:
+        """Top-k chunks for a query by BM25 (each distinct query term counted once)"""
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for chunk_id, tf in self.postings[term]:
+                norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[chunk_id] / self.avg_length)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+        return [(self.chunks[chunk_id], score) for chunk_id, score in ranked]
+
+    def context_for(self, query: str, token_budget: int, k: int = 8) -> str:
+        """Best-matching chunks that fit within token_budget, rendered for a prompt
+
+        Falls back to the first pages when nothing in the query matches the brochure.
+        """
+        candidates = [chunk for chunk, _ in self.search(query, k)] or self.chunks[:k]
+        selected, used = [], 0
+        for chunk in candidates:
+            cost = count_tokens(chunk.render() + "\n\n")
+            if used + cost > token_budget:
+                continue
+            selected.append(chunk)
+            used += cost
+        return "\n\n".join(chunk.render() for chunk in selected)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_knowledge_index(kb_path) -> Optional[KnowledgeIndex]:
+    """Shared index for a brochure directory, built once per process (None if the directory is missing)"""
+    key = str(Path(kb_path).resolve())
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = KnowledgeIndex.load_or_build(kb_path) if Path(kb_path).is_dir() else None
+        return _indexes[key]
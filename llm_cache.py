@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+AIA Analytics - LLM Response Cache
+Content-addressed SQLite cache of chat completions shared by all analyzers
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent / 'log' / '.llm_cache'
+DEFAULT_MAX_MB = 256
+
+# Bump when the key recipe changes so old entries stop matching
+KEY_VERSION = 1
+
+
+def completion_key(model: str, system_prompt: str, user_prompt: str, temperature: float, max_tokens: int) -> str:
+    """SHA-256 of everything that determines a completion"""
+    material = json.dumps([KEY_VERSION, model, system_prompt, user_prompt, float(temperature), int(max_tokens)],
+                          ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class LLMResponseCache:
+    """Completion texts keyed by completion_key, evicted least-recently-used past max_bytes
+
+    Set AIA_LLM_CACHE=off to disable lookups and writes entirely.
+    """
+
+    def __init__(self, path=None, max_bytes: Optional[int] = None, enabled: Optional[bool] = None):
+        cache_dir = Path(os.getenv('AIA_LLM_CACHE_DIR', DEFAULT_CACHE_DIR))
+        self.path = Path(path) if path else cache_dir / 'completions.sqlite3'
+        self.max_bytes = max_bytes if max_bytes is not None else int(float(os.getenv('AIA_LLM_CACHE_MAX_MB', DEFAULT_MAX_MB)) * 1024 * 1024)
+        self.enabled = enabled if enabled is not None else os.getenv('AIA_LLM_CACHE', 'on').lower() not in ('0', 'off', 'false', 'no')
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self._local = threading.local()
+        self._schema_ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread; batch workers share the file through WAL"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            with self.lock:
+                if not self._schema_ready:
+                    conn.execute("""
+                        CREATE TABLE IF NOT EXISTS completions (
+                            key TEXT PRIMARY KEY,
+                            model TEXT NOT NULL,
+                            content TEXT NOT NULL,
+                            size INTEGER NOT NULL,
+                            created_at REAL NOT NULL,
+                            last_used REAL NOT NULL
+                        )""")
+                    conn.execute('CREATE INDEX IF NOT EXISTS completions_last_used ON completions(last_used)')
+                    self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        """Cached completion text, or None on a miss"""
+        if not self.enabled:
+            return None
+        try:
+            conn = self._connect()
+            row = conn.execute('SELECT content FROM completions WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                conn.execute('UPDATE completions SET last_used = ? WHERE key = ?', (time.time(), key))
+        except sqlite3.Error as e:
+            print(f"⚠️ LLM cache read failed: {e}")
+            row = None
+
+        with self.lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return row[0] if row is not None else None
+
+    def put(self, key: str, model: str, content: str):
+        """Store a completion, then evict least-recently-used entries over the size limit"""
+        if not self.enabled:
+            return
+        now = time.time()
+        size = len(content.encode('utf-8'))
+        try:
+            conn = self._connect()
+            conn.execute('INSERT OR REPLACE INTO completions (key, model, content, size, created_at, last_used) '
+                         'VALUES (?, ?, ?, ?, ?, ?)', (key, model, content, size, now, now))
+            evicted = self._evict(conn)
+        except sqlite3.Error as e:
+            print(f"⚠️ LLM cache write failed: {e}")
+            return
+
+        with self.lock:
+            self.writes += 1
+            self.evictions += evicted
+
+    def _evict(self, conn: sqlite3.Connection) -> int:
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM completions').fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+
+        evicted = 0
+        for key, size in conn.execute('SELECT key, size FROM completions ORDER BY last_used ASC').fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute('DELETE FROM completions WHERE key = ?', (key,))
+            total -= size
+            evicted += 1
+        return evicted
+
+    def get_or_create(self, model: str, system_prompt: str, user_prompt: str, temperature: float, max_tokens: int,
+                      create: Callable[[], Optional[str]], bypass: bool = False) -> Optional[str]:
+        """Cached completion, else create() -- whose result is stored unless it is None
+
+        bypass skips the lookup but still stores the fresh completion.
+        """
+        key = completion_key(model, system_prompt, user_prompt, temperature, max_tokens)
+        if not bypass:
+            cached = self.get(key)
+            if cached is not None:
+                return cached
+
+        content = create()
+        if content is not None:
+            self.put(key, model, content)
+        return content
+
+    def stats(self) -> Dict:
+        """Hit/miss counters plus entry count and size on disk"""
+        with self.lock:
+            stats = {
+                'enabled': self.enabled,
+                'hits': self.hits,
+                'misses': self.misses,
+                'writes': self.writes,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / (self.hits + self.misses), 3) if self.hits + self.misses else 0.0,
+            }
+        if self.enabled:
+            try:
+                entries, total = self._connect().execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions').fetchone()
+                stats.update({'entries': entries, 'bytes': total, 'max_bytes': self.max_bytes})
+            except sqlite3.Error as e:
+                print(f"⚠️ LLM cache stats unavailable: {e}")
+        return stats
+
+    def clear(self):
+        """Drop every cached completion"""
+        if self.enabled:
+            self._connect().execute('DELETE FROM completions')
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """Process-wide response cache configured from the environment"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMResponseCache()
+        return _cache
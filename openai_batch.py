@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+AIA Analytics - OpenAI Batch Files
+Writes chat completion requests as Batch API JSONL and streams result files back
+"""
+
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+BATCH_ENDPOINT = '/v1/chat/completions'
+
+
+@dataclass
+class BatchResultLine:
+    custom_id: str
+    content: Optional[str]  # assistant message text when the request succeeded
+    error: Optional[str] = None
+    model: Optional[str] = None
+    total_tokens: Optional[int] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def request_line(custom_id: str, body: Dict) -> str:
+    """One Batch API input line for a chat completions request body"""
+    return json.dumps({"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body},
+                      ensure_ascii=False)
+
+
+def write_requests(path, requests: Iterable[Tuple[str, Dict]]) -> int:
+    """Write (custom_id, body) pairs as a Batch API input file; returns the number of lines
+
+    Written to a temporary file first so a failed export never leaves a partial upload.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + '.tmp')
+    count = 0
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for custom_id, body in requests:
+            f.write(request_line(custom_id, body) + '\n')
+            count += 1
+    tmp_path.replace(path)
+    return count
+
+
+def _parse_result(record: Dict) -> BatchResultLine:
+    custom_id = record.get('custom_id', '')
+    if record.get('error'):
+        error = record['error']
+        return BatchResultLine(custom_id, None, error.get('message', str(error)) if isinstance(error, dict) else str(error))
+
+    response = record.get('response') or {}
+    body = response.get('body') or {}
+    status = response.get('status_code', 200)
+    if status != 200:
+        message = (body.get('error') or {}).get('message', '') if isinstance(body, dict) else ''
+        return BatchResultLine(custom_id, None, f"HTTP {status}: {message}".rstrip(': '))
+    try:
+        content = body['choices'][0]['message']['content']
+    except (KeyError, IndexError, TypeError):
+        return BatchResultLine(custom_id, None, "Response has no message content")
+    return BatchResultLine(custom_id, content, model=body.get('model'),
+                           total_tokens=(body.get('usage') or {}).get('total_tokens'))
+
+
+def iter_results(path) -> Iterator[BatchResultLine]:
+    """Stream a Batch API output (or error) file one line at a time
+
+    Lines that are not valid JSON are reported as failed results rather than aborting
+    the whole file.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield BatchResultLine(f"line-{line_number}", None, f"Invalid JSON: {e}")
+                continue
+            yield _parse_result(record)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+AIA Analytics - Prompt Builder
+Packs conversation turns and knowledge chunks into prompt templates to an explicit token budget
+"""
+
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+from rate_limiter import estimate_tokens
+
+OMITTED_MARKER = "[... {count} more turns omitted to fit the token budget]"
+
+
+@lru_cache(maxsize=None)
+def _encoding():
+    """gpt-4o tokenizer, loaded once per process; None (with a one-time warning) without tiktoken"""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding('o200k_base')
+    except Exception as e:
+        print(f"⚠️ tiktoken unavailable ({e}); prompt token counts are estimated at ~4 bytes/token")
+        return None
+
+
+def tokens_are_estimated() -> bool:
+    return _encoding() is None
+
+
+def count_tokens(text: str) -> int:
+    """gpt-4o token count with tiktoken, else ~4 UTF-8 bytes per token"""
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return estimate_tokens(text)
+
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """Longest prefix of text that fits in budget tokens"""
+    if budget <= 0:
+        return ''
+    encoding = _encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= budget else encoding.decode(tokens[:budget])
+    if count_tokens(text) <= budget:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if count_tokens(text[:mid]) <= budget:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low]
+
+
+def pack_turns(turns: List[str], budget: int) -> Tuple[str, int]:
+    """Join as many leading whole turns as fit in budget; returns (text, turns dropped)
+
+    Turns are kept in order and never split, except that a first turn larger than the
+    whole budget is truncated so the section is not empty. Dropped turns are noted in
+    a trailing marker line.
+    """
+    costs = [count_tokens(turn + '\n') for turn in turns]
+    if sum(costs) <= budget:
+        return ''.join(turn + '\n' for turn in turns), 0
+
+    room = budget - count_tokens(OMITTED_MARKER.format(count=len(turns)) + '\n')
+    if room <= 0:
+        return '', len(turns)
+
+    kept, used = [], 0
+    for turn, cost in zip(turns, costs):
+        if used + cost > room:
+            break
+        kept.append(turn)
+        used += cost
+    if not kept:
+        kept.append(truncate_to_tokens(turns[0], room - 1) + '…')
+
+    dropped = len(turns) - len(kept)
+    if dropped:
+        kept.append(OMITTED_MARKER.format(count=dropped))
+    return ''.join(turn + '\n' for turn in kept), dropped
+
+
+@dataclass
+class PromptPlan:
+    prompt: str
+    prompt_tokens: int
+    completion_tokens: int
+    section_tokens: Dict[str, int] = field(default_factory=dict)
+    dropped_turns: int = 0
+    estimated: bool = False  # counted with the byte heuristic because tiktoken could not load
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def describe(self) -> str:
+        dropped = f", {self.dropped_turns} turns omitted" if self.dropped_turns else ""
+        estimated = " (estimated, tiktoken unavailable)" if self.estimated else ""
+        return f"{self.prompt_tokens} prompt + {self.completion_tokens} completion tokens planned{estimated}{dropped}"
+
+
+class PromptBuilder:
+    """Fills named prompt sections in order, each within its cap and the remaining budget
+
+        plan = (PromptBuilder(max_prompt_tokens=2200, completion_tokens=800)
+                .add_turns('conversation', turns, max_tokens=1200)
+                .add('knowledge', lambda budget, filled: kb_context(filled['conversation'], budget), max_tokens=500)
+                .build(lambda s: f"CONVERSATION:\\n{s['conversation']}\\nKNOWLEDGE:\\n{s['knowledge']}"))
+    """
+
+    def __init__(self, max_prompt_tokens: int, completion_tokens: int):
+        self.max_prompt_tokens = max_prompt_tokens
+        self.completion_tokens = completion_tokens
+        self._sections = []
+        self._dropped = 0
+
+    def add(self, name: str, fill: Callable[[int, Dict[str, str]], str], max_tokens: Optional[int] = None) -> 'PromptBuilder':
+        """Section produced by fill(budget, sections_filled_so_far)"""
+        self._sections.append((name, fill, max_tokens))
+        return self
+
+    def add_turns(self, name: str, turns: List[str], max_tokens: Optional[int] = None) -> 'PromptBuilder':
+        """Section of whole conversation turns (one line each), oldest first"""
+        def fill(budget, filled):
+            text, dropped = pack_turns(turns, budget)
+            self._dropped += dropped
+            return text
+        return self.add(name, fill, max_tokens)
+
+    def add_text(self, name: str, text: str, max_tokens: Optional[int] = None) -> 'PromptBuilder':
+        """Free-text section, truncated at a token boundary if it does not fit"""
+        return self.add(name, lambda budget, filled: truncate_to_tokens(text, budget), max_tokens)
+
+    def build(self, render: Callable[[Dict[str, str]], str]) -> PromptPlan:
+        """Render the template with each section packed into what the budget leaves"""
+        self._dropped = 0
+        filled = {name: '' for name, _, _ in self._sections}
+        remaining = self.max_prompt_tokens - count_tokens(render(filled))
+
+        section_tokens = {}
+        for name, fill, max_tokens in self._sections:
+            budget = max(0, remaining if max_tokens is None else min(max_tokens, remaining))
+            filled[name] = fill(budget, dict(filled)) if budget > 0 else ''
+            section_tokens[name] = count_tokens(filled[name])
+            remaining -= section_tokens[name]
+
+        prompt = render(filled)
+        return PromptPlan(
+            prompt=prompt,
+            prompt_tokens=count_tokens(prompt),
+            completion_tokens=self.completion_tokens,
+            section_tokens=section_tokens,
+            dropped_turns=self._dropped,
+            estimated=tokens_are_estimated(),
+        )
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+AIA Analytics - Rate Limiter
+Client-side request and token budgets with Retry-After aware retries, shared by all analyzer threads
+"""
+
+import os
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional
+
+import requests
+
+# OpenAI's published gpt-4o tier-1 limits; override with AIA_OPENAI_RPM / AIA_OPENAI_TPM (0 = unlimited)
+DEFAULT_REQUESTS_PER_MINUTE = 500
+DEFAULT_TOKENS_PER_MINUTE = 30000
+
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = {'APIConnectionError', 'APITimeoutError'}
+
+
+class OpenAIRequestError(Exception):
+    """A completion request that failed for good: retries ran out or the error was not retryable
+
+    Raised instead of returning placeholder results, so callers and batch runs see the failure.
+    """
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _retryable_error(error: Exception) -> bool:
+    """Connection failures and timeouts; bad URLs, headers and certificates fail the same way every time"""
+    if isinstance(error, requests.exceptions.SSLError):
+        return False
+    return (isinstance(error, (requests.ConnectionError, requests.Timeout))
+            or type(error).__name__ in RETRYABLE_ERRORS)
+
+
+def estimate_tokens(*texts: str) -> int:
+    """Rough prompt token count: ~4 UTF-8 bytes per token (about 0.75 tokens per Thai character)"""
+    return sum(len(text.encode('utf-8')) for text in texts if text) // 4 + 1
+
+
+def _retry_after_seconds(headers) -> Optional[float]:
+    """Delay requested by a Retry-After header (seconds or HTTP date), if any"""
+    if not headers:
+        return None
+    value = headers.get('retry-after-ms')
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get('Retry-After') or headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+class TokenBucket:
+    """Refills at rate_per_minute, holding at most one minute's budget"""
+
+    def __init__(self, rate_per_minute: float):
+        self.capacity = float(rate_per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay_for(self, amount: float, now: float) -> float:
+        """Seconds until amount is available (0 if it is now)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+    def give(self, amount: float):
+        self.level = min(self.capacity, self.level + amount)
+
+
+class RateLimiter:
+    """Requests/min and tokens/min budgets plus retry policy for one API key
+
+    Threads block in acquire() until both budgets allow the call. A Retry-After from the
+    server pauses every thread, not just the one that was throttled.
+    """
+
+    def __init__(self, requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = DEFAULT_TOKENS_PER_MINUTE,
+                 max_retries: int = 5, base_backoff: float = 1.0, max_backoff: float = 60.0):
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.lock = threading.Lock()
+        self._paused_until = 0.0
+        self._stats = {
+            'requests': 0,
+            'retries': 0,
+            'throttled': 0,
+            'failures': 0,
+            'wait_seconds': 0.0,
+            'backoff_seconds': 0.0,
+            'in_flight_seconds': 0.0,
+            'max_in_flight': 0,
+        }
+        self._in_flight = 0
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Block until one request of `tokens` fits both budgets; returns seconds waited"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                delay = max(0.0, self._paused_until - now)
+                if self.request_bucket:
+                    delay = max(delay, self.request_bucket.delay_for(1, now))
+                if self.token_bucket:
+                    delay = max(delay, self.token_bucket.delay_for(tokens, now))
+                if delay <= 0:
+                    if self.request_bucket:
+                        self.request_bucket.take(1)
+                    if self.token_bucket:
+                        self.token_bucket.take(tokens)
+                    self._stats['wait_seconds'] += waited
+                    return waited
+            time.sleep(delay)
+            waited += delay
+
+    def settle(self, reserved: int, used: Optional[int]):
+        """Correct the token budget once the response reports actual usage"""
+        if self.token_bucket and used is not None:
+            with self.lock:
+                if used < reserved:
+                    self.token_bucket.give(reserved - used)
+                else:
+                    self.token_bucket.take(used - reserved)
+
+    def pause(self, seconds: float):
+        """Hold every caller back for `seconds` (server asked us to slow down)"""
+        with self.lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Full-jitter exponential backoff, never shorter than the server's Retry-After"""
+        delay = random.uniform(0, min(self.max_backoff, self.base_backoff * (2 ** attempt)))
+        if retry_after is not None:
+            delay = retry_after + random.uniform(0, min(1.0, retry_after * 0.1 + 0.1))
+        return delay
+
+    def call(self, send: Callable[[], Any], tokens: int = 0) -> Any:
+        """Run send() under the budgets, retrying throttling and transient failures
+
+        send may return a response object (anything with status_code/headers, e.g.
+        requests.Response) or raise; retryable statuses and connection errors are retried
+        with backoff. The last response is returned, or the last exception re-raised, once
+        retries run out.
+        """
+        for attempt in range(self.max_retries + 1):
+            self.acquire(tokens)
+            with self.lock:
+                self._stats['requests'] += 1
+                self._in_flight += 1
+                self._stats['max_in_flight'] = max(self._stats['max_in_flight'], self._in_flight)
+            start = time.monotonic()
+            error = None
+            try:
+                result = send()
+            except Exception as e:
+                error, result = e, None
+            finally:
+                with self.lock:
+                    self._in_flight -= 1
+                    self._stats['in_flight_seconds'] += time.monotonic() - start
+
+            if error is not None:
+                status = getattr(error, 'status_code', None)
+                headers = getattr(getattr(error, 'response', None), 'headers', None)
+                retryable = status in RETRY_STATUSES or (status is None and _retryable_error(error))
+            else:
+                status = getattr(result, 'status_code', 200)
+                headers = getattr(result, 'headers', None)
+                retryable = status in RETRY_STATUSES
+
+            if not retryable or attempt == self.max_retries:
+                if error is not None or status >= 400:
+                    with self.lock:
+                        self._stats['failures'] += 1
+                if error is not None:
+                    raise error
+                return result
+
+            retry_after = _retry_after_seconds(headers)
+            delay = self.backoff_delay(attempt, retry_after)
+            with self.lock:
+                self._stats['retries'] += 1
+                self._stats['backoff_seconds'] += delay
+                if status == 429:
+                    self._stats['throttled'] += 1
+            if status == 429:
+                self.pause(delay)
+            print(f"⏳ Retrying after {status or type(error).__name__} in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries})")
+            time.sleep(delay)
+
+    def stats(self) -> Dict:
+        """Time spent waiting on budgets/backoff versus with requests in flight"""
+        with self.lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = self._in_flight
+        for key in ('wait_seconds', 'backoff_seconds', 'in_flight_seconds'):
+            stats[key] = round(stats[key], 3)
+        return stats
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Process-wide limiter for the OpenAI key, configured from the environment"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(
+                requests_per_minute=float(os.getenv('AIA_OPENAI_RPM', DEFAULT_REQUESTS_PER_MINUTE)),
+                tokens_per_minute=float(os.getenv('AIA_OPENAI_TPM', DEFAULT_TOKENS_PER_MINUTE)),
+                max_retries=int(os.getenv('AIA_OPENAI_MAX_RETRIES', 5)),
+            )
+        return _limiter
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+AIA Analytics - Analysis Result Store
+Durable SQLite store of per-conversation analysis results, so restarts and interrupted bulk runs resume
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from dataclasses import asdict, is_dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+import pandas as pd
+
+DEFAULT_RESULTS_PATH = Path(__file__).resolve().parent / 'log' / '.results' / 'results.sqlite3'
+
+KIND_CONVERSATION_INSIGHT = 'conversation_insight'
+KIND_AGENT_PERFORMANCE = 'agent_performance'
+KIND_SESSION_SUMMARY = 'session_summary'
+
+# Columns whose contents determine every analysis of a conversation
+HASH_COLUMNS = ['Created At', 'Agent ID', 'Message Role', 'Message Text']
+
+
+def conversation_hash(conv_data: pd.DataFrame) -> str:
+    """SHA-256 of a conversation's messages; changes whenever a message is added or edited"""
+    columns = [col for col in HASH_COLUMNS if col in conv_data.columns]
+    digest = hashlib.sha256(json.dumps(columns).encode('utf-8'))
+    if len(conv_data):
+        digest.update(pd.util.hash_pandas_object(conv_data[columns].astype(str), index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def _to_json(value: Any):
+    # numpy scalars and timestamps in rule-based summaries
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+class ResultStore:
+    """Results keyed by (kind, conversation_id, content hash, analyzer version)
+
+    A conversation whose messages change, or an analyzer whose prompt or rules change
+    (bump its version), simply stops matching its old rows. Set AIA_RESULT_STORE_PATH
+    to move the database.
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path or os.getenv('AIA_RESULT_STORE_PATH', DEFAULT_RESULTS_PATH))
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.lock = threading.Lock()
+        self._local = threading.local()
+        self._schema_ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread; batch workers and dashboard requests share the file through WAL"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            with self.lock:
+                if not self._schema_ready:
+                    conn.execute("""
+                        CREATE TABLE IF NOT EXISTS results (
+                            kind TEXT NOT NULL,
+                            conversation_id TEXT NOT NULL,
+                            content_hash TEXT NOT NULL,
+                            analyzer_version TEXT NOT NULL,
+                            payload TEXT NOT NULL,
+                            created_at REAL NOT NULL,
+                            PRIMARY KEY (kind, conversation_id, content_hash, analyzer_version)
+                        )""")
+                    self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    def get(self, kind: str, conversation_id: str, content_hash: str, analyzer_version: str) -> Optional[Dict]:
+        """Stored payload, or None if this version never analyzed this exact conversation"""
+        try:
+            row = self._connect().execute(
+                'SELECT payload FROM results WHERE kind = ? AND conversation_id = ? AND content_hash = ? AND analyzer_version = ?',
+                (kind, conversation_id, content_hash, analyzer_version)).fetchone()
+        except sqlite3.Error as e:
+            print(f"⚠️ Result store read failed: {e}")
+            row = None
+
+        with self.lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return json.loads(row[0]) if row is not None else None
+
+    def put(self, kind: str, conversation_id: str, content_hash: str, analyzer_version: str, payload):
+        """Store one result (a dict or dataclass); each write is its own committed checkpoint"""
+        if is_dataclass(payload):
+            payload = asdict(payload)
+        try:
+            self._connect().execute(
+                'INSERT OR REPLACE INTO results (kind, conversation_id, content_hash, analyzer_version, payload, created_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (kind, conversation_id, content_hash, analyzer_version,
+                 json.dumps(payload, ensure_ascii=False, default=_to_json), time.time()))
+        except sqlite3.Error as e:
+            print(f"⚠️ Result store write failed: {e}")
+            return
+
+        with self.lock:
+            self.writes += 1
+
+    def resumable(self, kind: str, analyzer_version: str, snapshot, analyze: Callable[[str], Any],
+                  record_type: Optional[Callable] = None, succeeded: Optional[Callable[[Any], bool]] = None) -> Callable[[str], Any]:
+        """Per-conversation function for bulk runs: stored result if unchanged, else analyze and checkpoint
+
+        record_type rebuilds stored payloads (e.g. a dataclass); results that fail succeeded()
+        are returned but not stored, so a resumed run retries them.
+        """
+        def run(conversation_id: str):
+            content_hash = conversation_hash(snapshot.conversation(conversation_id))
+            stored = self.get(kind, conversation_id, content_hash, analyzer_version)
+            if stored is not None:
+                return record_type(**stored) if record_type else stored
+
+            result = analyze(conversation_id)
+            if succeeded is None or succeeded(result):
+                self.put(kind, conversation_id, content_hash, analyzer_version, result)
+            return result
+        return run
+
+    def last_updated(self, kind: str, analyzer_version: str) -> Optional[float]:
+        """Unix time of the newest result of a kind and version"""
+        try:
+            return self._connect().execute('SELECT MAX(created_at) FROM results WHERE kind = ? AND analyzer_version = ?',
+                                           (kind, analyzer_version)).fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"⚠️ Result store read failed: {e}")
+            return None
+
+    def stats(self) -> Dict:
+        """Hit/miss counters plus stored results per kind"""
+        with self.lock:
+            stats = {'hits': self.hits, 'misses': self.misses, 'writes': self.writes}
+        try:
+            rows = self._connect().execute('SELECT kind, COUNT(*) FROM results GROUP BY kind').fetchall()
+            stats['results'] = dict(rows)
+        except sqlite3.Error as e:
+            print(f"⚠️ Result store stats unavailable: {e}")
+        return stats
+
+    def clear(self, kind: Optional[str] = None):
+        """Drop stored results (of one kind, or all)"""
+        if kind:
+            self._connect().execute('DELETE FROM results WHERE kind = ?', (kind,))
+        else:
+            self._connect().execute('DELETE FROM results')
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_result_store() -> ResultStore:
+    """Process-wide result store configured from the environment"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ResultStore()
+        return _store
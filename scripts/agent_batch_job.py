@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+AIA Analytics - Agent Performance Batch Job
+Nightly scoring through the OpenAI Batch API: emit request JSONL, then ingest the results file
+
+Usage:
+    python scripts/agent_batch_job.py emit log/batch/requests.jsonl
+    (upload with purpose "batch", create a batch for /v1/chat/completions, download the output file)
+    python scripts/agent_batch_job.py ingest log/batch/results.jsonl
+
+    # Offline: answer a requests file with mock completions to exercise ingest
+    python scripts/agent_batch_job.py simulate log/batch/requests.jsonl log/batch/results.jsonl
+"""
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(REPO_ROOT))
+sys.path.append(str(REPO_ROOT / 'src'))
+sys.path.append(str(Path(__file__).resolve().parent))
+
+
+def simulate(requests_path: str, results_path: str, fail_every: int = 0) -> int:
+    """Write a Batch API output file answering every request with the mock scoring template"""
+    from mock_openai_server import performance_analysis
+
+    count = 0
+    with open(requests_path, 'r', encoding='utf-8') as requests_file, \
+            open(results_path, 'w', encoding='utf-8') as results_file:
+        for line_number, line in enumerate(requests_file, 1):
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            if fail_every and line_number % fail_every == 0:
+                response = {"status_code": 500, "request_id": f"req_mock_{line_number}",
+                            "body": {"error": {"message": "Internal error (mock)"}}}
+            else:
+                response = {"status_code": 200, "request_id": f"req_mock_{line_number}", "body": {
+                    "id": f"chatcmpl-mock-{line_number}",
+                    "object": "chat.completion",
+                    "model": request["body"]["model"],
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": json.dumps(performance_analysis())}}],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+                }}
+            results_file.write(json.dumps({"id": f"batch_req_mock_{line_number}", "custom_id": request["custom_id"],
+                                           "response": response, "error": None}) + '\n')
+            count += 1
+    print(f"🧪 Wrote {count} mock results to {results_path}")
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Emit or ingest OpenAI Batch API files for agent performance scoring")
+    parser.add_argument('--base-path', default=str(REPO_ROOT), help="Repository root with log/ and templates/")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    emit_parser = commands.add_parser('emit', help="Write one request line per conversation")
+    emit_parser.add_argument('output')
+    emit_parser.add_argument('--conversation', action='append', dest='conversations',
+                             help="Only this conversation ID (repeatable); default is every conversation")
+
+    ingest_parser = commands.add_parser('ingest', help="Stream a results file into the result store")
+    ingest_parser.add_argument('results')
+
+    simulate_parser = commands.add_parser('simulate', help="Answer a requests file with mock completions")
+    simulate_parser.add_argument('requests')
+    simulate_parser.add_argument('results')
+    simulate_parser.add_argument('--fail-every', type=int, default=0, help="Make every Nth request fail")
+
+    args = parser.parse_args()
+    if args.command == 'simulate':
+        simulate(args.requests, args.results, args.fail_every)
+        return
+
+    # Batch files never call the API directly; the key is only needed by the analyzer constructor
+    os.environ.setdefault('OPENAI_API_KEY', 'batch-job')
+    from agent_performance_analyzer import AgentPerformanceAnalyzer
+    analyzer = AgentPerformanceAnalyzer(base_path=args.base_path)
+    if args.command == 'emit':
+        analyzer.export_batch_requests(args.output, args.conversations)
+    else:
+        analyzer.ingest_batch_results(args.results)
+
+
+if __name__ == "__main__":
+    main()
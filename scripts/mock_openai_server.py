@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+AIA Analytics - Mock OpenAI Server
+Local stand-in for the chat completions endpoint, for exercising batch analysis without API costs
+
+Usage:
+    python scripts/mock_openai_server.py --port 8765 --delay 0.5
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=mock python simple_ai_analyzer.py
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONVERSATION_ANALYSIS = {
+    "customer_intent": "Learn about life insurance coverage (mock)",
+    "sentiment": "neutral",
+    "product_interest": ["AIA Pay Life Plus"],
+    "issues_identified": [],
+    "resolution_status": "ongoing",
+    "recommendations": ["Follow up with a benefits illustration"]
+}
+
+CATEGORY_METRICS = {
+    "product_pitch": ["explain_benefits_of_insurance", "explain_product_details"],
+    "objection_handling": ["listening_to_objections", "acknowledging_objections"],
+    "communication_skills": ["small_talk", "active_listening"],
+}
+
+
+def performance_analysis() -> dict:
+    """Minimal filled-in agent performance template"""
+    return {
+        "performance_scores": {
+            category: {
+                "category_average": "3.0",
+                "metrics": {metric: {"score": "3", "explanation": "Mock score", "evidence": "Mock evidence"}
+                            for metric in metrics}
+            }
+            for category, metrics in CATEGORY_METRICS.items()
+        },
+        "overall_performance": {
+            "total_average_score": "3.0",
+            "performance_level": "GOOD",
+            "key_strengths": ["Mock strength"],
+            "improvement_areas": ["Mock improvement area"],
+            "training_recommendations": ["Mock training recommendation"]
+        }
+    }
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real endpoint
+    disable_nagle_algorithm = True  # headers and body go out in separate writes
+    delay = 0.0
+    throttle_every = 0  # every Nth request gets a 429 with Retry-After (0 = never)
+    fail_every = 0  # every Nth request gets a 500 (0 = never)
+    stats = {"requests": 0, "in_flight": 0, "max_in_flight": 0, "throttled": 0, "failed": 0}
+    stats_lock = threading.Lock()
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self.send_error(404)
+            return
+
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        with self.stats_lock:
+            self.stats["requests"] += 1
+            throttle = self.throttle_every and self.stats["requests"] % self.throttle_every == 0
+            fail = not throttle and self.fail_every and self.stats["requests"] % self.fail_every == 0
+            if throttle:
+                self.stats["throttled"] += 1
+            if fail:
+                self.stats["failed"] += 1
+        if throttle:
+            self._send_json({"error": {"message": "Rate limit reached (mock)", "type": "requests"}},
+                            status=429, headers={"Retry-After": "1"})
+            return
+        if fail:
+            self._send_json({"error": {"message": "Internal error (mock)", "type": "server_error"}}, status=500)
+            return
+        with self.stats_lock:
+            self.stats["in_flight"] += 1
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+        try:
+            time.sleep(self.delay)
+            system_prompt = next((m.get('content', '') for m in body.get('messages', []) if m.get('role') == 'system'), '')
+            analysis = performance_analysis() if 'performance' in system_prompt else CONVERSATION_ANALYSIS
+            self._send_json({
+                "id": f"chatcmpl-mock-{self.stats['requests']}",
+                "object": "chat.completion",
+                "model": body.get('model', 'gpt-4o'),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": json.dumps(analysis)}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+            })
+        finally:
+            with self.stats_lock:
+                self.stats["in_flight"] -= 1
+
+    def do_GET(self):
+        # GET /stats reports request counts and peak concurrency
+        if self.path.rstrip('/') == '/stats':
+            with self.stats_lock:
+                self._send_json(dict(self.stats))
+        else:
+            self.send_error(404)
+
+    def _send_json(self, payload: dict, status: int = 200, headers: dict = None):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port: int = 8765, delay: float = 0.0, throttle_every: int = 0, fail_every: int = 0) -> ThreadingHTTPServer:
+    """Start the mock server on a background thread and return it (port 0 picks a free port)"""
+    MockOpenAIHandler.delay = delay
+    MockOpenAIHandler.throttle_every = throttle_every
+    MockOpenAIHandler.fail_every = fail_every
+    server = ThreadingHTTPServer(('127.0.0.1', port), MockOpenAIHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI chat completions server")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--delay', type=float, default=0.5, help="Seconds to wait before each response")
+    parser.add_argument('--throttle-every', type=int, default=0, help="Answer every Nth request with 429 + Retry-After")
+    parser.add_argument('--fail-every', type=int, default=0, help="Answer every Nth request with 500")
+    args = parser.parse_args()
+
+    MockOpenAIHandler.delay = args.delay
+    MockOpenAIHandler.throttle_every = args.throttle_every
+    MockOpenAIHandler.fail_every = args.fail_every
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), MockOpenAIHandler)
+    print(f"🧪 Mock OpenAI server on http://127.0.0.1:{args.port}/v1 (delay {args.delay}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("👋 Stopped")
+
+
+if __name__ == "__main__":
+    main()
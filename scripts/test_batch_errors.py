@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+AIA Analytics - Batch Error Reporting Test
+Runs both analyzers' batch paths against the mock server with --fail-every and checks that
+failed API calls come back as per-item errors, not as placeholder results
+
+Usage:
+    python scripts/test_batch_errors.py
+    python -m pytest scripts/test_batch_errors.py
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(REPO_ROOT))
+sys.path.append(str(REPO_ROOT / 'src'))
+sys.path.append(str(Path(__file__).resolve().parent))
+
+# No retries and no response cache, so every failed request fails its item and every item is
+# sent; a fresh result store for resume checks. Set before the analyzers load.
+SCRATCH = tempfile.mkdtemp(prefix='aia-batch-errors-')
+os.environ.update({
+    'OPENAI_API_KEY': 'mock',
+    'AIA_OPENAI_MAX_RETRIES': '0',
+    'AIA_LLM_CACHE': 'off',
+    'AIA_RESULT_STORE_PATH': os.path.join(SCRATCH, 'results.sqlite3'),
+})
+
+from mock_openai_server import MockOpenAIHandler, serve  # noqa: E402
+
+FAIL_EVERY = 3
+ITEMS = 9
+
+
+def start_mock_server():
+    server = serve(port=0, fail_every=FAIL_EVERY)
+    os.environ['OPENAI_BASE_URL'] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    MockOpenAIHandler.stats.update(requests=0, failed=0)
+    return server
+
+
+def check_results(results, label):
+    failed = [result for result in results if not result.ok]
+    print(f"🧪 {label}: {len(results) - len(failed)} ok, {len(failed)} failed")
+    assert len(results) == ITEMS
+    assert len(failed) == MockOpenAIHandler.stats['failed'] == ITEMS // FAIL_EVERY
+    for result in failed:
+        assert result.value is None
+        assert 'OpenAI request failed' in result.error and '500' in result.error
+    return [result.item for result in failed]
+
+
+def test_simple_analyzer_reports_failed_items():
+    server = start_mock_server()
+    try:
+        from simple_ai_analyzer import SimpleAIAAnalyzer
+        analyzer = SimpleAIAAnalyzer()
+        conversation_ids = analyzer.dataset.snapshot.index.ids[:ITEMS].tolist()
+        failed = check_results(analyzer.analyze_conversations(conversation_ids, max_workers=3), "SimpleAIAAnalyzer")
+
+        # Failed items were not checkpointed, so a resumed run sends exactly those again
+        MockOpenAIHandler.stats.update(requests=0, failed=0)
+        MockOpenAIHandler.fail_every = 0
+        rerun = analyzer.analyze_conversations(conversation_ids, max_workers=3)
+        assert all(result.ok for result in rerun)
+        assert MockOpenAIHandler.stats['requests'] == len(failed)
+    finally:
+        server.shutdown()
+        MockOpenAIHandler.fail_every = 0
+
+
+def test_agent_performance_analyzer_reports_failed_items():
+    server = start_mock_server()
+    try:
+        from agent_performance_analyzer import AgentPerformanceAnalyzer
+        analyzer = AgentPerformanceAnalyzer(base_path=str(REPO_ROOT))
+        conversation_ids = analyzer.dataset.snapshot.index.ids[ITEMS:2 * ITEMS].tolist()
+        check_results(analyzer.analyze_agent_performances(conversation_ids, max_workers=3), "AgentPerformanceAnalyzer")
+    finally:
+        server.shutdown()
+        MockOpenAIHandler.fail_every = 0
+
+
+if __name__ == "__main__":
+    test_simple_analyzer_reports_failed_items()
+    test_agent_performance_analyzer_reports_failed_items()
+    print("✅ Failed API calls are reported per item")
@@ -0,0 +1,129 @@
+"""
+AIA Analytics - Shared State
+Small JSON documents shared by every dashboard worker and analyzer process through one SQLite file
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+DEFAULT_STATE_PATH = Path(__file__).resolve().parent / 'log' / '.dashboard' / 'shared_state.sqlite3'
+
+
+class SharedState:
+    """Key -> JSON document table that all workers read and write through WAL
+
+    Workers publish the latest AI insights refresh and background job progress here, so
+    whichever worker serves a request sees them, and claim cross-process chores such as
+    transcript cache cleanup. Set AIA_SHARED_STATE_PATH to move the file.
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path or os.getenv('AIA_SHARED_STATE_PATH', DEFAULT_STATE_PATH))
+        self.lock = threading.Lock()
+        self._local = threading.local()
+        self._schema_ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread (and so per worker process)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            with self.lock:
+                if not self._schema_ready:
+                    conn.execute("""
+                        CREATE TABLE IF NOT EXISTS state (
+                            key TEXT PRIMARY KEY,
+                            value TEXT NOT NULL,
+                            updated_at REAL NOT NULL
+                        )""")
+                    self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Dict]:
+        try:
+            row = self._connect().execute('SELECT value FROM state WHERE key = ?', (key,)).fetchone()
+        except sqlite3.Error as e:
+            print(f"⚠️ Shared state read failed: {e}")
+            return None
+        return json.loads(row[0]) if row is not None else None
+
+    def put(self, key: str, value: Dict):
+        self.put_many({key: value})
+
+    def put_many(self, documents: Dict[str, Dict]):
+        """Write several documents in one transaction"""
+        now = time.time()
+        rows = [(key, json.dumps(value, default=str), now) for key, value in documents.items()]
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany('INSERT OR REPLACE INTO state (key, value, updated_at) VALUES (?, ?, ?)', rows)
+            conn.execute('COMMIT')
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            print(f"⚠️ Shared state write failed: {e}")
+
+    def claim(self, key: str, value: Dict, stale_after: float,
+              documents: Optional[Dict[str, Dict]] = None, orphan: Optional[Dict] = None) -> Optional[Dict]:
+        """Atomically write value unless another worker wrote key within stale_after seconds
+
+        documents are written in the same transaction when the claim succeeds. A holder equal
+        to orphan is taken over even if it is fresh. Returns None if this worker now holds the
+        key, else the holder's document.
+        """
+        now = time.time()
+        rows = [(name, json.dumps(doc, default=str), now) for name, doc in {**(documents or {}), key: value}.items()]
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT value, updated_at FROM state WHERE key = ?', (key,)).fetchone()
+            holder = json.loads(row[0]) if row is not None and now - row[1] < stale_after else None
+            if holder is not None and orphan is not None and holder == orphan:
+                holder = None
+            if holder is None:
+                conn.executemany('INSERT OR REPLACE INTO state (key, value, updated_at) VALUES (?, ?, ?)', rows)
+            conn.execute('COMMIT')
+            return holder
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            print(f"⚠️ Shared state claim failed, continuing unshared: {e}")
+            return None
+
+    def release(self, key: str, value: Dict):
+        """Delete key if it still holds value (a claim this worker made)"""
+        try:
+            self._connect().execute('DELETE FROM state WHERE key = ? AND value = ?', (key, json.dumps(value, default=str)))
+        except sqlite3.Error as e:
+            print(f"⚠️ Shared state write failed: {e}")
+
+    def prune(self, prefix: str, older_than: float):
+        """Drop documents under a key prefix not written for older_than seconds"""
+        try:
+            self._connect().execute('DELETE FROM state WHERE key LIKE ? AND updated_at < ?',
+                                    (prefix + '%', time.time() - older_than))
+        except sqlite3.Error as e:
+            print(f"⚠️ Shared state write failed: {e}")
+
+
+_state = None
+_state_lock = threading.Lock()
+
+
+def get_shared_state() -> SharedState:
+    """Process-wide shared state configured from the environment"""
+    global _state
+    with _state_lock:
+        if _state is None:
+            _state = SharedState()
+        return _state
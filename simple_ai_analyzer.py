@@ -5,18 +5,36 @@ Alternative implementation using requests for OpenAI API
 """
 
 import os
+import numpy as np
 import pandas as pd
 import json
 import requests
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 from dataclasses import dataclass
 from pathlib import Path
 
+from transcript_store import TranscriptDataset
+from batch_runner import BatchResult, default_concurrency, run_batch
+from llm_cache import get_llm_cache
+from rate_limiter import OpenAIRequestError, get_rate_limiter
+from prompt_builder import PromptBuilder, count_tokens, truncate_to_tokens
+from http_pool import create_pooled_session
+from knowledge_index import get_knowledge_index
+from result_store import KIND_CONVERSATION_INSIGHT, get_result_store
+
 # Load environment variables
 from dotenv import load_dotenv
 load_dotenv()
 
+# Data paths resolve from this file so the analyzer also works when run from dashboard/
+BASE_DIR = Path(__file__).resolve().parent
+
+# Bump when the prompt or parsing changes so stored insights are recomputed
+ANALYZER_VERSION = 'simple-gpt-4o-v1'
+# customer_intent of the fallback insights returned when a completion cannot be parsed
+FAILED_INTENTS = {'JSON parsing failed', 'Analysis failed'}
+
 @dataclass
 class ConversationInsight:
     conversation_id: str
@@ -34,20 +52,30 @@ class SimpleAIAAnalyzer:
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY not found in environment variables")
         
-        self.api_url = "https://api.openai.com/v1/chat/completions"
+        # OPENAI_BASE_URL (same variable the openai SDK reads) can point at a proxy or mock server
+        self.api_url = f"{os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1').rstrip('/')}/chat/completions"
         self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
+        # Keep-alive connections reused by every request, including concurrent batch workers
+        self.session = create_pooled_session(self.headers)
         
         self.knowledge_base = self._load_knowledge_base()
-        self.transcript_path = 'log/transcript.csv'
+        # BM25 index over the brochure, built once and persisted next to the pages
+        self.knowledge_index = get_knowledge_index(BASE_DIR / "AIA_PayLifePlus_Brochure")
+        self.transcript_path = BASE_DIR / 'log' / 'transcript.csv'
+        self.dataset = TranscriptDataset(self.transcript_path)
+        self.response_cache = get_llm_cache()
+        self.rate_limiter = get_rate_limiter()
+        self.bypass_cache = False  # True forces fresh completions (still stored for next time)
+        self.result_store = get_result_store()
         print("✅ Simple AI Analyzer initialized successfully")
         
     def _load_knowledge_base(self) -> str:
         """Load all knowledge base files into a single string"""
         knowledge_content = ""
-        kb_path = Path("AIA_PayLifePlus_Brochure")
+        kb_path = BASE_DIR / "AIA_PayLifePlus_Brochure"
         
         if kb_path.exists():
             for md_file in sorted(kb_path.glob("*.md")):
@@ -61,24 +89,25 @@ class SimpleAIAAnalyzer:
         print(f"📚 Knowledge base loaded: {len(knowledge_content)} characters")
         return knowledge_content
     
+    def _knowledge_context(self, text: str, token_budget: int) -> str:
+        """Brochure chunks most relevant to text, within token_budget"""
+        if self.knowledge_index is None:
+            return truncate_to_tokens(self.knowledge_base, token_budget)
+        return self.knowledge_index.context_for(text, token_budget)
+    
+    def reload(self) -> bool:
+        """Pick up a changed transcript file; returns True if a new version was loaded"""
+        changed = self.dataset.reload()
+        if changed:
+            print(f"🔄 Transcript reloaded: version {self.dataset.version[:12]}")
+        return changed
+    
     def load_transcript_data(self, limit: Optional[int] = None) -> pd.DataFrame:
         """Load and preprocess transcript data"""
         try:
-            df = pd.read_csv(self.transcript_path)
-            print(f"📥 Raw data loaded: {len(df)} rows")
-            
-            # Clean column names
-            df.columns = df.columns.str.strip()
-            
-            # Filter out N/A entries and ensure we have actual conversations
-            df = df[df['Message Role'] != 'N/A']
-            df = df[df['Message Text'].notna()]
-            df = df[df['Message Text'] != 'No transcript available']
-            print(f"📊 After filtering: {len(df)} rows")
-            
-            # Convert date column
-            if 'Created At' in df.columns:
-                df['Created At'] = pd.to_datetime(df['Created At'], format='%Y-%m-%d %H:%M:%S (GMT+7)', errors='coerce')
+            # Cleaned, date-parsed rows of the pinned transcript version (see reload())
+            df = self.dataset.frame.copy(deep=False)
+            print(f"📊 Transcript loaded: {len(df)} rows")
             
             if limit:
                 df = df.head(limit)
@@ -90,74 +119,74 @@ class SimpleAIAAnalyzer:
             return pd.DataFrame()
     
     def _make_openai_request(self, prompt: str, max_tokens: int = 1000) -> str:
-        """Make OpenAI API request using requests library"""
+        """Make OpenAI API request using requests library, answering repeats from the response cache"""
+        system_prompt = "You are an expert insurance industry analyst specializing in customer conversation analysis. Always respond with valid JSON."
         payload = {
             "model": "gpt-4o",
             "messages": [
-                {"role": "system", "content": "You are an expert insurance industry analyst specializing in customer conversation analysis. Always respond with valid JSON."},
+                {"role": "system", "content": system_prompt},
                 {"role": "user", "content": prompt}
             ],
             "max_tokens": max_tokens,
             "temperature": 0.3
         }
         
-        try:
-            response = requests.post(self.api_url, headers=self.headers, json=payload, timeout=30)
-            response.raise_for_status()
-            
-            result = response.json()
-            return result['choices'][0]['message']['content']
+        def request_completion() -> str:
+            # Shared request/token budgets; 429s and 5xx are retried with backoff before giving up
+            reserved = count_tokens(system_prompt) + count_tokens(prompt) + max_tokens
+            try:
+                response = self.rate_limiter.call(
+                    lambda: self.session.post(self.api_url, json=payload, timeout=30), reserved
+                )
+                response.raise_for_status()
+                result = response.json()
+                content = result['choices'][0]['message']['content']
+            except requests.exceptions.RequestException as e:
+                print(f"⚠️ API Request Error: {e}")
+                raise OpenAIRequestError(f"OpenAI request failed: {e}",
+                                         getattr(getattr(e, 'response', None), 'status_code', None)) from e
+            except (ValueError, KeyError, IndexError, TypeError) as e:
+                raise OpenAIRequestError(f"Malformed OpenAI response: {e!r}", response.status_code) from e
             
-        except requests.exceptions.RequestException as e:
-            print(f"⚠️ API Request Error: {e}")
-            return json.dumps({
-                "error": f"API Request Error: {str(e)}",
-                "customer_intent": "Unable to analyze due to API error",
-                "sentiment": "unknown",
-                "product_interest": [],
-                "issues_identified": [f"API Error: {str(e)[:100]}"],
-                "resolution_status": "unknown",
-                "recommendations": ["Check OpenAI API key and network connection"]
-            })
-        except Exception as e:
-            print(f"⚠️ Unexpected Error: {e}")
-            return json.dumps({
-                "error": f"Unexpected Error: {str(e)}",
-                "customer_intent": "Unable to analyze",
-                "sentiment": "unknown",
-                "product_interest": [],
-                "issues_identified": [f"Error: {str(e)[:100]}"],
-                "resolution_status": "unknown",
-                "recommendations": ["Check system configuration"]
-            })
+            self.rate_limiter.settle(reserved, result.get('usage', {}).get('total_tokens'))
+            return content
+        
+        # Only successful completions are cached; a failed request raises OpenAIRequestError
+        return self.response_cache.get_or_create(
+            payload["model"], system_prompt, prompt, payload["temperature"], max_tokens,
+            request_completion, bypass=self.bypass_cache
+        )
     
-    def analyze_conversation(self, conversation_id: str) -> ConversationInsight:
-        """Analyze a single conversation using GPT-4o"""
-        # Get conversation data
-        df = self.load_transcript_data()
-        conv_data = df[df['Conversation ID'] == conversation_id]
+    def analyze_conversation(self, conversation_id: str, snapshot=None) -> ConversationInsight:
+        """Analyze a single conversation using GPT-4o
+
+        Raises OpenAIRequestError if the API request fails; only an unparseable completion
+        comes back as a fallback insight (customer_intent in FAILED_INTENTS).
+        """
+        # Get conversation data as an indexed slice of the pinned transcript
+        snapshot = snapshot if snapshot is not None else self.dataset.snapshot
+        conv_data = snapshot.conversation(conversation_id)
         
         if conv_data.empty:
             raise ValueError(f"Conversation {conversation_id} not found")
         
-        # Prepare conversation text
-        conversation_text = ""
-        for _, row in conv_data.iterrows():
-            role = row['Message Role']
-            text = row['Message Text']
-            conversation_text += f"{role}: {text}\n"
+        # Prepare conversation turns
+        turns = [f"{role}: {text}" for role, text in zip(conv_data['Message Role'], conv_data['Message Text'])]
         
-        print(f"🔍 Analyzing conversation {conversation_id} ({len(conversation_text)} characters)")
+        print(f"🔍 Analyzing conversation {conversation_id} ({sum(len(turn) + 1 for turn in turns)} characters)")
         
-        # Create analysis prompt
-        prompt = f"""
+        # Create analysis prompt: whole turns and the most relevant brochure chunks, packed to a token budget
+        plan = (PromptBuilder(max_prompt_tokens=2200, completion_tokens=800)
+                .add_turns('conversation', turns, max_tokens=1200)
+                .add('knowledge', lambda budget, filled: self._knowledge_context(filled['conversation'], budget), max_tokens=500)
+                .build(lambda s: f"""
         Analyze this customer service conversation from AIA Thailand life insurance.
         
         CONVERSATION:
-        {conversation_text[:2000]}  # Limit conversation length
+        {s['conversation']}
         
         KNOWLEDGE BASE CONTEXT:
-        {self.knowledge_base[:2000]}  # Limit knowledge base length
+        {s['knowledge']}
         
         Please provide a comprehensive analysis in JSON format with these exact fields:
         {{
@@ -171,11 +200,11 @@ class SimpleAIAAnalyzer:
         
         Focus on identifying sales opportunities, customer pain points, and service quality.
         Ensure your response is valid JSON.
-        """
+        """))
+        print(f"🧮 Prompt plan for {conversation_id}: {plan.describe()}")
+        response_content = self._make_openai_request(plan.prompt, max_tokens=plan.completion_tokens)
         
         try:
-            response_content = self._make_openai_request(prompt, max_tokens=800)
-            
             # Parse JSON response
             analysis = json.loads(response_content)
             
@@ -201,7 +230,8 @@ class SimpleAIAAnalyzer:
                 resolution_status="unknown",
                 recommendations=["Fix JSON response format"]
             )
-        except Exception as e:
+        except (AttributeError, TypeError) as e:
+            # Valid JSON, but not the object the prompt asked for
             print(f"❌ Error analyzing conversation {conversation_id}: {e}")
             return ConversationInsight(
                 conversation_id=conversation_id,
@@ -213,6 +243,30 @@ class SimpleAIAAnalyzer:
                 recommendations=[]
             )
     
+    def analyze_conversations(self, conversation_ids: List[str], max_workers: Optional[int] = None,
+                              resume: bool = True, progress: Optional[Callable] = None) -> List[BatchResult]:
+        """Analyze many conversations concurrently; results are in input order with per-item errors
+        
+        Each insight is checkpointed in the result store as it completes; with resume, unchanged
+        conversations analyzed by an earlier (possibly interrupted) run are not sent again.
+        progress(done, total, result) is called as each conversation finishes.
+        """
+        print(f"🚀 Analyzing {len(conversation_ids)} conversations with up to {max_workers or default_concurrency()} workers")
+        # Every item slices the same in-memory frame, even if reload() runs mid-batch
+        snapshot = self.dataset.snapshot
+        
+        def analyze(conv_id: str) -> ConversationInsight:
+            insight = self.analyze_conversation(conv_id, snapshot)
+            if insight.customer_intent in FAILED_INTENTS:
+                # Fallback insights are not a result: fail the item so it is neither reported nor stored
+                raise ValueError(f"{insight.customer_intent}: {'; '.join(insight.issues_identified)}")
+            return insight
+        
+        if resume:
+            analyze = self.result_store.resumable(KIND_CONVERSATION_INSIGHT, ANALYZER_VERSION, snapshot, analyze,
+                                                  ConversationInsight)
+        return run_batch(analyze, conversation_ids, max_workers=max_workers, progress=progress)
+    
     def get_basic_stats(self) -> Dict:
         """Get basic statistics without AI analysis"""
         df = self.load_transcript_data()
@@ -234,13 +288,13 @@ class SimpleAIAAnalyzer:
         
         return stats
     
-    def analyze_sample_conversations(self, num_conversations: int = 3) -> List[ConversationInsight]:
+    def analyze_sample_conversations(self, num_conversations: int = 3, progress: Optional[Callable] = None) -> List[ConversationInsight]:
         """Analyze a few sample conversations to test the system"""
-        df = self.load_transcript_data()
+        index = self.dataset.snapshot.index
         
-        # Get conversations that have actual content
-        conversation_lengths = df.groupby('Conversation ID').size()
-        suitable_conversations = conversation_lengths[conversation_lengths >= 2].index.tolist()
+        # Get conversations that have actual content (row counts straight from the index)
+        conversation_lengths = np.diff(index.offsets)
+        suitable_conversations = sorted(index.ids[conversation_lengths >= 2].tolist())
         
         if not suitable_conversations:
             print("❌ No suitable conversations found for analysis")
@@ -249,36 +303,35 @@ class SimpleAIAAnalyzer:
         sample_convs = suitable_conversations[:num_conversations]
         insights = []
         
-        for conv_id in sample_convs:
-            try:
-                print(f"\n🔍 Analyzing sample conversation: {conv_id}")
-                insight = self.analyze_conversation(conv_id)
-                insights.append(insight)
-                print(f"✅ Completed analysis of {conv_id}")
-                print(f"   Intent: {insight.customer_intent[:100]}...")
-                print(f"   Sentiment: {insight.sentiment}")
-            except Exception as e:
-                print(f"❌ Failed to analyze {conv_id}: {e}")
+        for result in self.analyze_conversations(sample_convs, progress=progress):
+            if not result.ok:
+                print(f"❌ Failed to analyze {result.item}: {result.error}")
+                continue
+            insight = result.value
+            insights.append(insight)
+            print(f"✅ Completed analysis of {result.item} ({result.elapsed:.1f}s)")
+            print(f"   Intent: {insight.customer_intent[:100]}...")
+            print(f"   Sentiment: {insight.sentiment}")
         
         return insights
     
     def generate_conversation_summary(self, limit: int = 10) -> str:
         """Generate AI-powered summary of conversations"""
-        df = self.load_transcript_data()
+        snapshot = self.dataset.snapshot
         
         # Get recent conversations with actual content
-        unique_convs = df['Conversation ID'].unique()[:limit]
-        df_sample = df[df['Conversation ID'].isin(unique_convs)]
-        
-        # Group by conversation and create summary text
-        conversations_text = ""
-        for conv_id in df_sample['Conversation ID'].unique()[:5]:  # Limit to 5 for API efficiency
-            conv_data = df_sample[df_sample['Conversation ID'] == conv_id]
-            conversations_text += f"\n--- Conversation {conv_id} ---\n"
-            for _, row in conv_data.iterrows():
-                conversations_text += f"{row['Message Role']}: {row['Message Text']}\n"
-        
-        prompt = f"""
+        unique_convs = snapshot.index.ids[:limit]
+        
+        # Group by conversation into header and message turns
+        turns = []
+        for conv_id, conv_data in snapshot.conversations(unique_convs[:5]):  # Limit to 5 for API efficiency
+            turns.append(f"\n--- Conversation {conv_id} ---")
+            turns.extend(f"{role}: {text}" for role, text in zip(conv_data['Message Role'], conv_data['Message Text']))
+        
+        plan = (PromptBuilder(max_prompt_tokens=2000, completion_tokens=1500)
+                .add_turns('conversations', turns, max_tokens=1200)
+                .add('knowledge', lambda budget, filled: self._knowledge_context(filled['conversations'], budget), max_tokens=375)
+                .build(lambda s: f"""
         Analyze these customer service conversations from AIA Thailand life insurance and provide:
         
         ## EXECUTIVE SUMMARY
@@ -289,37 +342,38 @@ class SimpleAIAAnalyzer:
         ## SALES OPPORTUNITIES IDENTIFIED
         
         CONVERSATIONS:
-        {conversations_text[:3000]}  # Truncate for token limits
+        {s['conversations']}
         
         KNOWLEDGE BASE CONTEXT:
-        {self.knowledge_base[:1500]}
+        {s['knowledge']}
         
         Provide actionable insights for management in a clear, structured format.
-        """
+        """))
+        print(f"🧮 Prompt plan for summary: {plan.describe()}")
         
-        return self._make_openai_request(prompt, max_tokens=1500)
+        return self._make_openai_request(plan.prompt, max_tokens=plan.completion_tokens)
     
     def identify_product_opportunities(self, limit: int = 15) -> str:
         """Identify sales and product opportunities"""
-        df = self.load_transcript_data()
-        unique_convs = df['Conversation ID'].unique()[:limit]
-        
-        opportunities_text = ""
-        for conv_id in unique_convs[:8]:  # Limit for API costs
-            conv_data = df[df['Conversation ID'] == conv_id]
-            conv_text = ""
-            for _, row in conv_data.iterrows():
-                conv_text += f"{row['Message Role']}: {row['Message Text']}\n"
-            opportunities_text += f"\n--- Conversation {conv_id} ---\n{conv_text}"
-        
-        prompt = f"""
+        snapshot = self.dataset.snapshot
+        unique_convs = snapshot.index.ids[:limit]
+        
+        turns = []
+        for conv_id, conv_data in snapshot.conversations(unique_convs[:8]):  # Limit for API costs
+            turns.append(f"\n--- Conversation {conv_id} ---")
+            turns.extend(f"{role}: {text}" for role, text in zip(conv_data['Message Role'], conv_data['Message Text']))
+        
+        plan = (PromptBuilder(max_prompt_tokens=2100, completion_tokens=1200)
+                .add_turns('conversations', turns, max_tokens=1300)
+                .add('knowledge', lambda budget, filled: self._knowledge_context(filled['conversations'], budget), max_tokens=375)
+                .build(lambda s: f"""
         Analyze these customer conversations for sales and product opportunities:
         
         CONVERSATIONS:
-        {opportunities_text[:3500]}
+        {s['conversations']}
         
         AIA PRODUCTS KNOWLEDGE:
-        {self.knowledge_base[:1500]}
+        {s['knowledge']}
         
         Identify and provide specific recommendations for:
         
@@ -331,23 +385,37 @@ class SimpleAIAAnalyzer:
         ## SPECIFIC ACTION ITEMS FOR SALES TEAM
         
         Provide concrete, actionable recommendations with specific customer segments and products.
-        """
+        """))
+        print(f"🧮 Prompt plan for opportunities: {plan.describe()}")
         
-        return self._make_openai_request(prompt, max_tokens=1200)
+        return self._make_openai_request(plan.prompt, max_tokens=plan.completion_tokens)
     
-    def generate_full_report(self, output_file: str = "ai_analysis_report.md") -> str:
-        """Generate comprehensive AI analysis report"""
+    def generate_full_report(self, output_file: str = "ai_analysis_report.md", num_samples: int = 3,
+                             progress: Optional[Callable] = None) -> str:
+        """Generate comprehensive AI analysis report
+        
+        progress(done, total, step, value) is called after the summary, the opportunities
+        analysis and each sample conversation (value is its ConversationInsight).
+        """
+        total_steps = 2 + num_samples
         stats = self.get_basic_stats()
         
         print("📊 Generating data overview...")
         print("📝 Creating executive summary...")
         summary = self.generate_conversation_summary(limit=15)
+        if progress:
+            progress(1, total_steps, "Executive summary", None)
         
         print("💡 Analyzing product opportunities...")
         opportunities = self.identify_product_opportunities(limit=20)
+        if progress:
+            progress(2, total_steps, "Product opportunities", None)
         
         print("🔍 Analyzing sample conversations...")
-        sample_insights = self.analyze_sample_conversations(num_conversations=3)
+        sample_progress = None
+        if progress:
+            sample_progress = lambda done, total, result: progress(2 + done, total_steps, result.item, result.value)
+        sample_insights = self.analyze_sample_conversations(num_conversations=num_samples, progress=sample_progress)
         
         report_content = f"""# AIA Analytics - AI Analysis Report
 Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
@@ -446,6 +514,8 @@ def main():
                 print(f"💡 Recommendations:")
                 for rec in insight.recommendations:
                     print(f"   • {rec}")
+            except OpenAIRequestError as e:
+                print(f"❌ Analysis failed, nothing was analyzed: {e}")
             except Exception as e:
                 print(f"❌ Error: {e}")
         
@@ -458,8 +528,10 @@ def main():
         elif choice == '3':
             limit = int(input("Number of conversations to include (default 10): ") or "10")
             print("\n📝 Generating summary...")
-            summary = analyzer.generate_conversation_summary(limit=limit)
-            print(summary)
+            try:
+                print(analyzer.generate_conversation_summary(limit=limit))
+            except OpenAIRequestError as e:
+                print(f"❌ Summary failed: {e}")
         
         elif choice == '4':
             stats = analyzer.get_basic_stats()
@@ -469,14 +541,18 @@ def main():
         elif choice == '5':
             limit = int(input("Number of conversations to analyze (default 15): ") or "15")
             print("\n💡 Identifying product opportunities...")
-            opportunities = analyzer.identify_product_opportunities(limit=limit)
-            print(opportunities)
+            try:
+                print(analyzer.identify_product_opportunities(limit=limit))
+            except OpenAIRequestError as e:
+                print(f"❌ Opportunity analysis failed: {e}")
         
         elif choice == '6':
             filename = input("Output filename (default: ai_analysis_report.md): ").strip() or "ai_analysis_report.md"
             print("\n📄 Generating full report...")
-            result = analyzer.generate_full_report(filename)
-            print(result)
+            try:
+                print(analyzer.generate_full_report(filename))
+            except OpenAIRequestError as e:
+                print(f"❌ Report not written: {e}")
         
         elif choice == '7':
             print("👋 Goodbye!")
@@ -5,18 +5,39 @@ Analyzes agent performance during practice conversations using structured JSON s
 """
 
 import os
+import sys
+import numpy as np
 import pandas as pd
 import json
 import requests
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 from dataclasses import dataclass
 from pathlib import Path
 
+# Add parent directory to path to import the shared transcript store
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from transcript_store import TranscriptDataset
+from batch_runner import BatchResult, default_concurrency, run_batch
+from llm_cache import completion_key, get_llm_cache
+from rate_limiter import OpenAIRequestError, get_rate_limiter
+from http_pool import create_pooled_session
+from knowledge_index import get_knowledge_index
+from result_store import KIND_AGENT_PERFORMANCE, conversation_hash, get_result_store
+from prompt_builder import PromptBuilder, PromptPlan, count_tokens, truncate_to_tokens
+import openai_batch
+
 # Load environment variables
 from dotenv import load_dotenv
 load_dotenv()
 
+# Bump when the prompt, template or parsing changes so stored scores are recomputed
+ANALYZER_VERSION = 'agent-performance-gpt-4o-v1'
+# performance_level of the fallback scores returned when a completion cannot be parsed
+FAILED_LEVELS = {'ANALYSIS_FAILED', 'ERROR'}
+
+SYSTEM_PROMPT = "You are an expert insurance sales trainer specializing in agent performance evaluation. You must respond with valid JSON only, filling in the provided template exactly."
+
 @dataclass
 class AgentPerformanceScore:
     conversation_id: str
@@ -39,15 +60,27 @@ class AgentPerformanceAnalyzer:
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY not found in environment variables")
         
-        self.api_url = "https://api.openai.com/v1/chat/completions"
+        # OPENAI_BASE_URL (same variable the openai SDK reads) can point at a proxy or mock server
+        self.api_url = f"{os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1').rstrip('/')}/chat/completions"
         self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
+        # Keep-alive connections reused by every request, including concurrent batch workers
+        self.session = create_pooled_session(self.headers)
         
         self.knowledge_base = self._load_knowledge_base()
+        # BM25 index over the brochure, built once and persisted next to the pages
+        self.knowledge_index = get_knowledge_index(self.base_path / "AIA_PayLifePlus_Brochure")
         self.transcript_path = self.base_path / 'log' / 'transcript.csv'
-        self.template_path = self.base_path / 'agent_performance_template.json'
+        self.dataset = TranscriptDataset(self.transcript_path)
+        self.response_cache = get_llm_cache()
+        self.rate_limiter = get_rate_limiter()
+        self.bypass_cache = False  # True forces fresh completions (still stored for next time)
+        self.result_store = get_result_store()
+        self.template_path = self.base_path / 'templates' / 'agent_performance_template.json'
+        if not self.template_path.exists():
+            self.template_path = self.base_path / 'agent_performance_template.json'
         
         # Load the JSON template
         with open(self.template_path, 'r') as f:
@@ -77,6 +110,19 @@ class AgentPerformanceAnalyzer:
         print(f"📚 Knowledge base loaded: {len(knowledge_content)} characters")
         return knowledge_content
     
+    def _knowledge_context(self, text: str, token_budget: int) -> str:
+        """Brochure chunks most relevant to text, within token_budget"""
+        if self.knowledge_index is None:
+            return truncate_to_tokens(self.knowledge_base, token_budget)
+        return self.knowledge_index.context_for(text, token_budget)
+    
+    def reload(self) -> bool:
+        """Pick up a changed transcript file; returns True if a new version was loaded"""
+        changed = self.dataset.reload()
+        if changed:
+            print(f"🔄 Transcript reloaded: version {self.dataset.version[:12]}")
+        return changed
+    
     def load_transcript_data(self, limit: Optional[int] = None) -> pd.DataFrame:
         """Load and preprocess transcript data"""
         try:
@@ -84,21 +130,9 @@ class AgentPerformanceAnalyzer:
                 print(f"❌ Transcript file not found: {self.transcript_path}")
                 return pd.DataFrame()
                 
-            df = pd.read_csv(self.transcript_path)
-            print(f"📥 Raw data loaded: {len(df)} rows from {self.transcript_path}")
-            
-            # Clean column names
-            df.columns = df.columns.str.strip()
-            
-            # Filter out N/A entries and ensure we have actual conversations
-            df = df[df['Message Role'] != 'N/A']
-            df = df[df['Message Text'].notna()]
-            df = df[df['Message Text'] != 'No transcript available']
-            print(f"📊 After filtering: {len(df)} rows")
-            
-            # Convert date column
-            if 'Created At' in df.columns:
-                df['Created At'] = pd.to_datetime(df['Created At'], format='%Y-%m-%d %H:%M:%S (GMT+7)', errors='coerce')
+            # Cleaned, date-parsed rows of the pinned transcript version (see reload())
+            df = self.dataset.frame.copy(deep=False)
+            print(f"📊 Transcript loaded: {len(df)} rows from {self.transcript_path}")
             
             if limit:
                 df = df.head(limit)
@@ -109,60 +143,54 @@ class AgentPerformanceAnalyzer:
             print(f"❌ Error loading transcript data: {e}")
             return pd.DataFrame()
     
-    def _make_openai_request(self, prompt: str, max_tokens: int = 2000) -> str:
-        """Make OpenAI API request using requests library"""
-        payload = {
+    def _request_payload(self, prompt: str, max_tokens: int) -> Dict:
+        """Chat completions request body, shared by live requests and batch export"""
+        return {
             "model": "gpt-4o",
             "messages": [
-                {"role": "system", "content": "You are an expert insurance sales trainer specializing in agent performance evaluation. You must respond with valid JSON only, filling in the provided template exactly."},
+                {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
             "max_tokens": max_tokens,
             "temperature": 0.2
         }
+    
+    def _make_openai_request(self, prompt: str, max_tokens: int = 2000) -> str:
+        """Make OpenAI API request using requests library, answering repeats from the response cache"""
+        system_prompt = SYSTEM_PROMPT
+        payload = self._request_payload(prompt, max_tokens)
         
-        try:
-            response = requests.post(self.api_url, headers=self.headers, json=payload, timeout=45)
-            response.raise_for_status()
-            
-            result = response.json()
-            return result['choices'][0]['message']['content']
+        def request_completion() -> str:
+            # Shared request/token budgets; 429s and 5xx are retried with backoff before giving up
+            reserved = count_tokens(system_prompt) + count_tokens(prompt) + max_tokens
+            try:
+                response = self.rate_limiter.call(
+                    lambda: self.session.post(self.api_url, json=payload, timeout=45), reserved
+                )
+                response.raise_for_status()
+                result = response.json()
+                content = result['choices'][0]['message']['content']
+            except requests.exceptions.RequestException as e:
+                print(f"⚠️ API Request Error: {e}")
+                raise OpenAIRequestError(f"OpenAI request failed: {e}",
+                                         getattr(getattr(e, 'response', None), 'status_code', None)) from e
+            except (ValueError, KeyError, IndexError, TypeError) as e:
+                raise OpenAIRequestError(f"Malformed OpenAI response: {e!r}", response.status_code) from e
             
-        except requests.exceptions.RequestException as e:
-            print(f"⚠️ API Request Error: {e}")
-            return self._get_fallback_response()
-        except Exception as e:
-            print(f"⚠️ Unexpected Error: {e}")
-            return self._get_fallback_response()
-    
-    def _get_fallback_response(self) -> str:
-        """Return a fallback JSON response when API fails"""
-        fallback = self.performance_template.copy()
-        fallback["conversation_id"] = "ANALYSIS_FAILED"
-        fallback["agent_id"] = "UNKNOWN"
-        fallback["analysis_timestamp"] = datetime.now().isoformat()
-        
-        # Set default scores
-        for category in ["product_pitch", "objection_handling", "communication_skills"]:
-            fallback["performance_scores"][category]["category_average"] = "2.5"
-            for metric in fallback["performance_scores"][category]["metrics"]:
-                fallback["performance_scores"][category]["metrics"][metric]["score"] = "2.5"
-                fallback["performance_scores"][category]["metrics"][metric]["explanation"] = "Analysis failed - API error"
-                fallback["performance_scores"][category]["metrics"][metric]["evidence"] = "Unable to analyze"
-        
-        fallback["overall_performance"]["total_average_score"] = "2.5"
-        fallback["overall_performance"]["performance_level"] = "ANALYSIS_FAILED"
-        fallback["overall_performance"]["key_strengths"] = ["Analysis failed - please retry"]
-        fallback["overall_performance"]["improvement_areas"] = ["Unable to determine"]
-        fallback["overall_performance"]["training_recommendations"] = ["Re-run analysis"]
-        
-        return json.dumps(fallback, indent=2)
+            self.rate_limiter.settle(reserved, result.get('usage', {}).get('total_tokens'))
+            return content
+        
+        # Only successful completions are cached; a failed request raises OpenAIRequestError
+        return self.response_cache.get_or_create(
+            payload["model"], system_prompt, prompt, payload["temperature"], max_tokens,
+            request_completion, bypass=self.bypass_cache
+        )
     
-    def analyze_agent_performance(self, conversation_id: str) -> AgentPerformanceScore:
-        """Analyze agent performance using JSON template"""
-        # Get conversation data
-        df = self.load_transcript_data()
-        conv_data = df[df['Conversation ID'] == conversation_id]
+    def _build_performance_prompt(self, conversation_id: str, snapshot=None) -> Tuple[str, PromptPlan]:
+        """Agent ID and packed scoring prompt for one conversation"""
+        # Get conversation data as an indexed slice of the pinned transcript
+        snapshot = snapshot if snapshot is not None else self.dataset.snapshot
+        conv_data = snapshot.conversation(conversation_id)
         
         if conv_data.empty:
             raise ValueError(f"Conversation {conversation_id} not found")
@@ -170,29 +198,29 @@ class AgentPerformanceAnalyzer:
         # Get agent ID
         agent_id = conv_data['Agent ID'].iloc[0] if 'Agent ID' in conv_data.columns else "UNKNOWN"
         
-        # Prepare conversation text
-        conversation_text = ""
-        for _, row in conv_data.iterrows():
-            role = row['Message Role']
-            text = row['Message Text']
-            timestamp = row.get('Created At', 'Unknown time')
-            conversation_text += f"[{timestamp}] {role}: {text}\n"
+        # Prepare conversation turns
+        timestamps = conv_data['Created At'] if 'Created At' in conv_data.columns else ['Unknown time'] * len(conv_data)
+        turns = [f"[{timestamp}] {role}: {text}"
+                 for timestamp, role, text in zip(timestamps, conv_data['Message Role'], conv_data['Message Text'])]
         
         print(f"🔍 Analyzing agent performance for conversation {conversation_id}")
         print(f"👤 Agent ID: {agent_id}")
-        print(f"📝 Conversation length: {len(conversation_text)} characters")
+        print(f"📝 Conversation length: {sum(len(turn) + 1 for turn in turns)} characters")
         
-        # Create the analysis prompt with JSON template
+        # Create the analysis prompt with JSON template; the template itself takes ~1.5k tokens
         template_str = json.dumps(self.performance_template, indent=2)
         
-        prompt = f"""
+        plan = (PromptBuilder(max_prompt_tokens=4500, completion_tokens=2500)
+                .add_turns('conversation', turns, max_tokens=1500)
+                .add('knowledge', lambda budget, filled: self._knowledge_context(filled['conversation'], budget), max_tokens=500)
+                .build(lambda s: f"""
         TASK: Analyze this insurance agent's performance during a practice conversation with an AI customer.
         
         CONVERSATION TO ANALYZE:
-        {conversation_text[:3000]}  # Limit conversation length
+        {s['conversation']}
         
         AIA PRODUCT KNOWLEDGE REFERENCE:
-        {self.knowledge_base[:2000]}  # Limit knowledge base length
+        {s['knowledge']}
         
         SCORING INSTRUCTIONS:
         - Score each metric from 1-5 (1=Poor, 2=Below Average, 3=Average, 4=Good, 5=Excellent)
@@ -206,18 +234,30 @@ class AgentPerformanceAnalyzer:
         FILL IN THE TEMPLATE ABOVE EXACTLY. Replace all bracketed placeholders with actual values:
         - [CONVERSATION_ID] = "{conversation_id}"
         - [AGENT_ID] = "{agent_id}"  
-        - [TIMESTAMP] = "{datetime.now().isoformat()}"
+        - [TIMESTAMP] = leave as "[TIMESTAMP]" (filled in after analysis)
         - All score fields with actual numbers 1-5
         - All explanation fields with detailed reasoning
         - All evidence fields with specific quotes or behaviors
         - Calculate all averages accurately
         
         RESPOND WITH VALID JSON ONLY. NO OTHER TEXT.
+        """))
+        print(f"🧮 Prompt plan: {plan.describe()}")
+        return agent_id, plan
+    
+    def analyze_agent_performance(self, conversation_id: str, snapshot=None) -> AgentPerformanceScore:
+        """Analyze agent performance using JSON template
+
+        Raises OpenAIRequestError if the API request fails; only an unparseable completion
+        comes back as fallback scores (performance_level in FAILED_LEVELS).
         """
-        
+        agent_id, plan = self._build_performance_prompt(conversation_id, snapshot)
+        response_content = self._make_openai_request(plan.prompt, max_tokens=plan.completion_tokens)
+        return self._parse_performance_response(conversation_id, agent_id, response_content)
+    
+    def _parse_performance_response(self, conversation_id: str, agent_id: str, response_content: str) -> AgentPerformanceScore:
+        """AgentPerformanceScore from a filled-in template (fallback scores if it cannot be parsed)"""
         try:
-            response_content = self._make_openai_request(prompt, max_tokens=2500)
-            
             # Clean the response (remove any non-JSON content)
             response_content = response_content.strip()
             if response_content.startswith('```json'):
@@ -228,6 +268,8 @@ class AgentPerformanceAnalyzer:
             
             # Parse JSON response
             analysis = json.loads(response_content)
+            # Stamped here rather than in the prompt so identical conversations reuse cached completions
+            analysis["analysis_timestamp"] = datetime.now().isoformat()
             
             # Extract scores and create AgentPerformanceScore object
             scores = analysis["performance_scores"]
@@ -280,6 +322,96 @@ class AgentPerformanceAnalyzer:
                 detailed_scores={}
             )
     
+    def analyze_agent_performances(self, conversation_ids: List[str], max_workers: Optional[int] = None,
+                                   resume: bool = True) -> List[BatchResult]:
+        """Score many conversations concurrently; results are in input order with per-item errors
+        
+        Scores are checkpointed in the result store; with resume, unchanged conversations
+        already scored (live or through batch ingest) are read back instead of re-sent.
+        """
+        print(f"🚀 Analyzing {len(conversation_ids)} conversations with up to {max_workers or default_concurrency()} workers")
+        # Every item slices the same in-memory frame, even if reload() runs mid-batch
+        snapshot = self.dataset.snapshot
+        
+        def analyze(conv_id: str) -> AgentPerformanceScore:
+            score = self.analyze_agent_performance(conv_id, snapshot)
+            if score.performance_level in FAILED_LEVELS:
+                # Fallback scores are not a result: fail the item so it is neither reported nor stored
+                raise ValueError(f"Analysis failed ({score.performance_level}): {'; '.join(score.key_strengths + score.improvement_areas)}")
+            return score
+        
+        if resume:
+            analyze = self.result_store.resumable(KIND_AGENT_PERFORMANCE, ANALYZER_VERSION, snapshot, analyze,
+                                                  AgentPerformanceScore)
+        return run_batch(analyze, conversation_ids, max_workers=max_workers)
+    
+    def export_batch_requests(self, output_path, conversation_ids: Optional[List[str]] = None) -> int:
+        """Write one Batch API request line per conversation (default: all), same prompt as analyze_agent_performance
+        
+        custom_id is "<conversation_id>|<agent_id>|<content hash>|<cache key>" so results can be
+        ingested without the transcript, into the result store and the response cache.
+        """
+        snapshot = self.dataset.snapshot
+        conversation_ids = snapshot.index.ids.tolist() if conversation_ids is None else conversation_ids
+        
+        def requests_for_batch():
+            for conversation_id in conversation_ids:
+                try:
+                    agent_id, plan = self._build_performance_prompt(conversation_id, snapshot)
+                except ValueError as e:
+                    print(f"⚠️ Skipping {conversation_id}: {e}")
+                    continue
+                body = self._request_payload(plan.prompt, plan.completion_tokens)
+                key = completion_key(body["model"], SYSTEM_PROMPT, plan.prompt, body["temperature"], body["max_tokens"])
+                content_hash = conversation_hash(snapshot.conversation(conversation_id))
+                yield f"{conversation_id}|{agent_id}|{content_hash}|{key}", body
+        
+        count = openai_batch.write_requests(output_path, requests_for_batch())
+        print(f"📦 Wrote {count} batch requests to {output_path}")
+        return count
+    
+    @staticmethod
+    def _split_custom_id(custom_id: str) -> Tuple[str, str, Optional[str], Optional[str]]:
+        """(conversation_id, agent_id, content hash, cache key) from an exported custom_id"""
+        parts = custom_id.split('|')
+        if len(parts) != 4:
+            return custom_id, "UNKNOWN", None, None
+        return parts[0], parts[1] or "UNKNOWN", parts[2] or None, parts[3] or None
+    
+    def iter_batch_scores(self, results_path) -> Iterator[Tuple[openai_batch.BatchResultLine, Optional[AgentPerformanceScore]]]:
+        """Stream a Batch API results file as (result line, score); score is None for failed requests"""
+        for result in openai_batch.iter_results(results_path):
+            conversation_id, agent_id, _, _ = self._split_custom_id(result.custom_id)
+            if not result.ok:
+                yield result, None
+                continue
+            yield result, self._parse_performance_response(conversation_id, agent_id, result.content)
+    
+    def ingest_batch_results(self, results_path) -> Dict:
+        """Load a Batch API results file into the result store; returns counts by outcome
+        
+        Scores are stored against the conversation content they were computed from, and the
+        completions under the key of the request that produced them, so later bulk runs and
+        analyze_agent_performance calls for unchanged conversations are answered locally.
+        """
+        counts = {"ingested": 0, "unparseable": 0, "failed": 0}
+        for result, score in self.iter_batch_scores(results_path):
+            if score is None:
+                counts["failed"] += 1
+                print(f"❌ Batch request {result.custom_id} failed: {result.error}")
+                continue
+            if score.performance_level in FAILED_LEVELS:
+                counts["unparseable"] += 1
+                continue
+            conversation_id, _, content_hash, key = self._split_custom_id(result.custom_id)
+            if content_hash:
+                self.result_store.put(KIND_AGENT_PERFORMANCE, conversation_id, content_hash, ANALYZER_VERSION, score)
+            if key:
+                self.response_cache.put(key, result.model or "gpt-4o", result.content)
+            counts["ingested"] += 1
+        print(f"📥 Batch results ingested from {results_path}: {counts}")
+        return counts
+    
     def get_agent_performance_overview(self) -> Dict:
         """Get overall performance statistics"""
         df = self.load_transcript_data()
@@ -311,11 +443,11 @@ class AgentPerformanceAnalyzer:
     
     def analyze_multiple_agents(self, num_conversations: int = 5) -> List[AgentPerformanceScore]:
         """Analyze multiple agent conversations"""
-        df = self.load_transcript_data()
+        index = self.dataset.snapshot.index
         
-        # Get conversations that have actual content
-        conversation_lengths = df.groupby('Conversation ID').size()
-        suitable_conversations = conversation_lengths[conversation_lengths >= 3].index.tolist()
+        # Get conversations that have actual content (row counts straight from the index)
+        conversation_lengths = np.diff(index.offsets)
+        suitable_conversations = sorted(index.ids[conversation_lengths >= 3].tolist())
         
         if not suitable_conversations:
             print("❌ No suitable conversations found for analysis")
@@ -324,16 +456,15 @@ class AgentPerformanceAnalyzer:
         sample_convs = suitable_conversations[:num_conversations]
         performance_scores = []
         
-        for conv_id in sample_convs:
-            try:
-                print(f"\n🔍 Analyzing conversation: {conv_id}")
-                score = self.analyze_agent_performance(conv_id)
-                performance_scores.append(score)
-                print(f"✅ Completed analysis of {conv_id}")
-                print(f"   Overall Score: {score.overall_score}/5")
-                print(f"   Performance Level: {score.performance_level}")
-            except Exception as e:
-                print(f"❌ Failed to analyze {conv_id}: {e}")
+        for result in self.analyze_agent_performances(sample_convs):
+            if not result.ok:
+                print(f"❌ Failed to analyze {result.item}: {result.error}")
+                continue
+            score = result.value
+            performance_scores.append(score)
+            print(f"✅ Completed analysis of {result.item} ({result.elapsed:.1f}s)")
+            print(f"   Overall Score: {score.overall_score}/5")
+            print(f"   Performance Level: {score.performance_level}")
         
         return performance_scores
     
@@ -487,6 +618,8 @@ def main():
                 print(f"\n🎓 Training Recommendations:")
                 for rec in score.training_recommendations:
                     print(f"   • {rec}")
+            except OpenAIRequestError as e:
+                print(f"❌ Analysis failed, nothing was scored: {e}")
             except Exception as e:
                 print(f"❌ Error: {e}")
         
@@ -5,6 +5,7 @@ Analyzes customer conversations and provides insights using OpenAI GPT-4o
 """
 
 import os
+import sys
 import pandas as pd
 import openai
 from datetime import datetime, timedelta
@@ -15,10 +16,23 @@ from dataclasses import dataclass
 import glob
 from pathlib import Path
 
+# Add parent directory to path to import the shared transcript store
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from transcript_store import TranscriptDataset
+from batch_runner import BatchResult, run_batch
+from llm_cache import get_llm_cache
+from rate_limiter import get_rate_limiter
+from knowledge_index import get_knowledge_index
+from result_store import KIND_CONVERSATION_INSIGHT, get_result_store
+from prompt_builder import PromptBuilder, count_tokens, truncate_to_tokens
+
 # Load environment variables
 from dotenv import load_dotenv
 load_dotenv()
 
+# Bump when the prompt or parsing changes so stored insights are recomputed
+ANALYZER_VERSION = 'aia-gpt-4o-v1'
+
 @dataclass
 class ConversationInsight:
     conversation_id: str
@@ -32,9 +46,17 @@ class ConversationInsight:
 class AIAAnalyzer:
     def __init__(self):
         """Initialize the AIA Analytics AI Analyzer"""
-        self.client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        # Retries are handled by the shared rate limiter so throttling is coordinated across threads
+        self.client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'), max_retries=0)
         self.knowledge_base = self._load_knowledge_base()
+        # BM25 index over the brochure, built once and persisted next to the pages
+        self.knowledge_index = get_knowledge_index("AIA_PayLifePlus_Brochure")
         self.transcript_path = 'log/transcript.csv'
+        self.dataset = TranscriptDataset(self.transcript_path)
+        self.response_cache = get_llm_cache()
+        self.rate_limiter = get_rate_limiter()
+        self.bypass_cache = False  # True forces fresh completions (still stored for next time)
+        self.result_store = get_result_store()
         
     def _load_knowledge_base(self) -> str:
         """Load all knowledge base files into a single string"""
@@ -49,16 +71,44 @@ class AIAAnalyzer:
         
         return knowledge_content
     
+    def _chat_completion(self, system_prompt: str, prompt: str, max_tokens: int, temperature: float = 0.3) -> str:
+        """Chat completion text from GPT-4o, answering repeats from the response cache"""
+        def request_completion() -> str:
+            reserved = count_tokens(system_prompt) + count_tokens(prompt) + max_tokens
+            response = self.rate_limiter.call(lambda: self.client.chat.completions.create(
+                model="gpt-4o",
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=max_tokens,
+                temperature=temperature
+            ), reserved)
+            self.rate_limiter.settle(reserved, response.usage.total_tokens if response.usage else None)
+            return response.choices[0].message.content
+        
+        # Exceptions propagate uncached so callers' error fallbacks are never stored
+        return self.response_cache.get_or_create("gpt-4o", system_prompt, prompt, temperature, max_tokens,
+                                                 request_completion, bypass=self.bypass_cache)
+    
+    def _knowledge_context(self, text: str, token_budget: int) -> str:
+        """Brochure chunks most relevant to text, within token_budget"""
+        if self.knowledge_index is None:
+            return truncate_to_tokens(self.knowledge_base, token_budget)
+        return self.knowledge_index.context_for(text, token_budget)
+    
+    def reload(self) -> bool:
+        """Pick up a changed transcript file; returns True if a new version was loaded"""
+        changed = self.dataset.reload()
+        if changed:
+            print(f"🔄 Transcript reloaded: version {self.dataset.version[:12]}")
+        return changed
+    
     def load_transcript_data(self, limit: Optional[int] = None) -> pd.DataFrame:
         """Load and preprocess transcript data"""
         try:
-            df = pd.read_csv(self.transcript_path)
-            
-            # Clean column names
-            df.columns = df.columns.str.strip()
-            
-            # Filter out N/A entries
-            df = df[df['Message Role'] != 'N/A']
+            # Cleaned, date-parsed rows of the pinned transcript version (see reload())
+            df = self.dataset.frame.copy(deep=False)
             
             if limit:
                 df = df.head(limit)
@@ -68,31 +118,30 @@ class AIAAnalyzer:
             print(f"Error loading transcript data: {e}")
             return pd.DataFrame()
     
-    def analyze_conversation(self, conversation_id: str) -> ConversationInsight:
+    def analyze_conversation(self, conversation_id: str, snapshot=None) -> ConversationInsight:
         """Analyze a single conversation using GPT-4o"""
-        # Get conversation data
-        df = self.load_transcript_data()
-        conv_data = df[df['Conversation ID'] == conversation_id]
+        # Get conversation data as an indexed slice of the pinned transcript
+        snapshot = snapshot if snapshot is not None else self.dataset.snapshot
+        conv_data = snapshot.conversation(conversation_id)
         
         if conv_data.empty:
             raise ValueError(f"Conversation {conversation_id} not found")
         
-        # Prepare conversation text
-        conversation_text = ""
-        for _, row in conv_data.iterrows():
-            role = row['Message Role']
-            text = row['Message Text']
-            conversation_text += f"{role}: {text}\n"
+        # Prepare conversation turns
+        turns = [f"{role}: {text}" for role, text in zip(conv_data['Message Role'], conv_data['Message Text'])]
         
-        # Create analysis prompt
-        prompt = f"""
+        # Create analysis prompt, packed to a token budget
+        plan = (PromptBuilder(max_prompt_tokens=3500, completion_tokens=1000)
+                .add_turns('conversation', turns, max_tokens=2500)
+                .add('knowledge', lambda budget, filled: self._knowledge_context(filled['conversation'], budget), max_tokens=750)
+                .build(lambda s: f"""
         Analyze this customer service conversation from AIA Thailand life insurance.
         
         CONVERSATION:
-        {conversation_text}
+        {s['conversation']}
         
         KNOWLEDGE BASE CONTEXT:
-        {self.knowledge_base[:3000]}  # Truncate for token limits
+        {s['knowledge']}
         
         Please provide a comprehensive analysis in JSON format with these fields:
         - customer_intent: What is the customer trying to achieve?
@@ -103,21 +152,17 @@ class AIAAnalyzer:
         - recommendations: List of actionable recommendations for improvement
         
         Focus on identifying sales opportunities, customer pain points, and service quality.
-        """
+        """))
+        print(f"🧮 Prompt plan for {conversation_id}: {plan.describe()}")
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are an expert insurance industry analyst specializing in customer conversation analysis."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=1000,
-                temperature=0.3
+            response_content = self._chat_completion(
+                "You are an expert insurance industry analyst specializing in customer conversation analysis.",
+                plan.prompt, max_tokens=plan.completion_tokens
             )
             
             # Parse JSON response
-            analysis = json.loads(response.choices[0].message.content)
+            analysis = json.loads(response_content)
             
             return ConversationInsight(
                 conversation_id=conversation_id,
@@ -141,26 +186,41 @@ class AIAAnalyzer:
                 recommendations=[]
             )
     
+    def analyze_conversations(self, conversation_ids: List[str], max_workers: Optional[int] = None,
+                              resume: bool = True) -> List[BatchResult]:
+        """Analyze many conversations concurrently; results are in input order with per-item errors
+        
+        Insights are checkpointed in the result store; with resume, unchanged conversations
+        already analyzed are read back instead of re-sent.
+        """
+        # Every item slices the same in-memory frame, even if reload() runs mid-batch
+        snapshot = self.dataset.snapshot
+        analyze = lambda conv_id: self.analyze_conversation(conv_id, snapshot)
+        if resume:
+            analyze = self.result_store.resumable(KIND_CONVERSATION_INSIGHT, ANALYZER_VERSION, snapshot, analyze,
+                                                  ConversationInsight, lambda insight: insight.customer_intent != "Analysis failed")
+        return run_batch(analyze, conversation_ids, max_workers=max_workers)
+    
     def generate_conversation_summary(self, conversation_ids: List[str] = None, limit: int = 10) -> str:
         """Generate AI-powered summary of conversations"""
-        df = self.load_transcript_data()
+        snapshot = self.dataset.snapshot
         
         if conversation_ids:
-            df = df[df['Conversation ID'].isin(conversation_ids)]
+            unique_convs = [conv_id for conv_id in conversation_ids if conv_id in snapshot.index]
         else:
             # Get recent conversations
-            unique_convs = df['Conversation ID'].unique()[:limit]
-            df = df[df['Conversation ID'].isin(unique_convs)]
-        
-        # Group by conversation
-        conversations_text = ""
-        for conv_id in df['Conversation ID'].unique():
-            conv_data = df[df['Conversation ID'] == conv_id]
-            conversations_text += f"\n--- Conversation {conv_id} ---\n"
-            for _, row in conv_data.iterrows():
-                conversations_text += f"{row['Message Role']}: {row['Message Text']}\n"
-        
-        prompt = f"""
+            unique_convs = snapshot.index.ids[:limit]
+        
+        # Group by conversation into header and message turns
+        turns = []
+        for conv_id, conv_data in snapshot.conversations(unique_convs):
+            turns.append(f"\n--- Conversation {conv_id} ---")
+            turns.extend(f"{role}: {text}" for role, text in zip(conv_data['Message Role'], conv_data['Message Text']))
+        
+        plan = (PromptBuilder(max_prompt_tokens=2500, completion_tokens=2000)
+                .add_turns('conversations', turns, max_tokens=1500)
+                .add('knowledge', lambda budget, filled: self._knowledge_context(filled['conversations'], budget), max_tokens=500)
+                .build(lambda s: f"""
         Analyze these customer service conversations from AIA Thailand life insurance and provide:
         
         1. EXECUTIVE SUMMARY
@@ -171,27 +231,21 @@ class AIAAnalyzer:
         6. SALES OPPORTUNITIES IDENTIFIED
         
         CONVERSATIONS:
-        {conversations_text[:4000]}  # Truncate for token limits
+        {s['conversations']}
         
         KNOWLEDGE BASE CONTEXT:
-        {self.knowledge_base[:2000]}
+        {s['knowledge']}
         
         Provide actionable insights for management.
-        """
+        """))
+        print(f"🧮 Prompt plan for summary: {plan.describe()}")
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are a senior business analyst specializing in insurance industry analytics and customer experience optimization."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=2000,
-                temperature=0.3
+            return self._chat_completion(
+                "You are a senior business analyst specializing in insurance industry analytics and customer experience optimization.",
+                plan.prompt, max_tokens=plan.completion_tokens
             )
             
-            return response.choices[0].message.content
-            
         except Exception as e:
             return f"Error generating summary: {e}"
     
@@ -211,19 +265,18 @@ class AIAAnalyzer:
         
         # Get unique conversations for analysis
         unique_convs = recent_df['Conversation ID'].unique()[:20]  # Limit for API costs
+        first_dates = recent_df.groupby('Conversation ID', sort=False)['Created At'].first()
         
         sentiments = []
-        for conv_id in unique_convs:
-            try:
-                insight = self.analyze_conversation(conv_id)
-                sentiments.append({
-                    'conversation_id': conv_id,
-                    'sentiment': insight.sentiment,
-                    'date': recent_df[recent_df['Conversation ID'] == conv_id]['Created At'].iloc[0]
-                })
-            except Exception as e:
-                print(f"Error analyzing {conv_id}: {e}")
+        for result in self.analyze_conversations(list(unique_convs)):
+            if not result.ok:
+                print(f"Error analyzing {result.item}: {result.error}")
                 continue
+            sentiments.append({
+                'conversation_id': result.item,
+                'sentiment': result.value.sentiment,
+                'date': first_dates[result.item]
+            })
         
         return {
             'sentiment_distribution': pd.Series([s['sentiment'] for s in sentiments]).value_counts().to_dict(),
@@ -233,25 +286,25 @@ class AIAAnalyzer:
     
     def identify_product_opportunities(self, limit: int = 20) -> str:
         """Identify sales and product opportunities"""
-        df = self.load_transcript_data()
-        unique_convs = df['Conversation ID'].unique()[:limit]
-        
-        opportunities_text = ""
-        for conv_id in unique_convs[:10]:  # Limit for API costs
-            conv_data = df[df['Conversation ID'] == conv_id]
-            conv_text = ""
-            for _, row in conv_data.iterrows():
-                conv_text += f"{row['Message Role']}: {row['Message Text']}\n"
-            opportunities_text += f"\n--- Conversation {conv_id} ---\n{conv_text}"
-        
-        prompt = f"""
+        snapshot = self.dataset.snapshot
+        unique_convs = snapshot.index.ids[:limit]
+        
+        turns = []
+        for conv_id, conv_data in snapshot.conversations(unique_convs[:10]):  # Limit for API costs
+            turns.append(f"\n--- Conversation {conv_id} ---")
+            turns.extend(f"{role}: {text}" for role, text in zip(conv_data['Message Role'], conv_data['Message Text']))
+        
+        plan = (PromptBuilder(max_prompt_tokens=2500, completion_tokens=1500)
+                .add_turns('conversations', turns, max_tokens=1500)
+                .add('knowledge', lambda budget, filled: self._knowledge_context(filled['conversations'], budget), max_tokens=500)
+                .build(lambda s: f"""
         Analyze these customer conversations for sales and product opportunities:
         
         CONVERSATIONS:
-        {opportunities_text[:4000]}
+        {s['conversations']}
         
         AIA PRODUCTS KNOWLEDGE:
-        {self.knowledge_base[:2000]}
+        {s['knowledge']}
         
         Identify:
         1. Upselling opportunities
@@ -262,21 +315,15 @@ class AIAAnalyzer:
         6. Specific action items for sales team
         
         Provide concrete, actionable recommendations.
-        """
+        """))
+        print(f"🧮 Prompt plan for opportunities: {plan.describe()}")
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are a senior sales analyst for the insurance industry with expertise in customer lifecycle management and product positioning."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=1500,
-                temperature=0.3
+            return self._chat_completion(
+                "You are a senior sales analyst for the insurance industry with expertise in customer lifecycle management and product positioning.",
+                plan.prompt, max_tokens=plan.completion_tokens
             )
             
-            return response.choices[0].message.content
-            
         except Exception as e:
             return f"Error identifying opportunities: {e}"
     
@@ -0,0 +1,486 @@
+#!/usr/bin/env python3
+"""
+AIA Analytics - Transcript Store
+Parses log/transcript.csv once into a typed columnar on-disk cache shared by the dashboard and analyzers
+"""
+
+import io
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from shared_state import get_shared_state
+
+# Bump whenever the on-disk column layout changes so stale caches are rebuilt
+CACHE_FORMAT_VERSION = 3
+
+ID_COLUMN = 'Conversation ID'
+DATE_COLUMN = 'Created At'
+TEXT_COLUMN = 'Message Text'
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S (GMT+7)'
+
+# Superseded version directories are kept this long, so a process still reading one finishes first
+PRUNE_GRACE_SECONDS = 300
+PRUNE_CLAIM_SECONDS = 60
+
+
+def clean_transcript(df: pd.DataFrame) -> pd.DataFrame:
+    """Apply the standard transcript filters and date parsing"""
+    df.columns = df.columns.str.strip()
+
+    # Filter out N/A entries and ensure we have actual conversations
+    df = df[df['Message Role'] != 'N/A']
+    df = df[df['Message Text'].notna()]
+    df = df[df['Message Text'] != 'No transcript available']
+
+    # Convert date column
+    if DATE_COLUMN in df.columns:
+        df[DATE_COLUMN] = pd.to_datetime(df[DATE_COLUMN], format=DATE_FORMAT, errors='coerce')
+
+    return df.reset_index(drop=True)
+
+
+def group_conversations(df: pd.DataFrame) -> pd.DataFrame:
+    """Make each conversation's rows contiguous, keeping first-appearance and message order"""
+    codes, _ = pd.factorize(df[ID_COLUMN])
+    order = np.argsort(codes, kind='stable')
+    return df.iloc[order].reset_index(drop=True)
+
+
+class ConversationIndex:
+    """Maps each Conversation ID to its contiguous row range in a grouped frame"""
+
+    def __init__(self, ids: np.ndarray, offsets: np.ndarray):
+        self.ids = ids
+        self.offsets = offsets
+        self.positions = {conv_id: i for i, conv_id in enumerate(ids)}
+
+    @classmethod
+    def build(cls, frame: pd.DataFrame) -> 'ConversationIndex':
+        """Find run boundaries of a frame produced by group_conversations"""
+        ids = frame[ID_COLUMN].to_numpy()
+        if len(ids) == 0:
+            return cls(ids, np.zeros(1, dtype=np.int64))
+        starts = np.flatnonzero(ids[1:] != ids[:-1]) + 1
+        offsets = np.concatenate(([0], starts, [len(ids)])).astype(np.int64)
+        return cls(ids[offsets[:-1]], offsets)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, conv_id) -> bool:
+        return conv_id in self.positions
+
+    def row_range(self, conv_id) -> Optional[Tuple[int, int]]:
+        """Row range [start, end) of a conversation, or None if unknown"""
+        position = self.positions.get(conv_id)
+        if position is None:
+            return None
+        return int(self.offsets[position]), int(self.offsets[position + 1])
+
+
+@dataclass(frozen=True)
+class TranscriptSnapshot:
+    """A loaded transcript version: the grouped frame plus its conversation index
+
+    When the version was produced by appending rows to parent_version, touched_ids
+    lists the conversations that received new rows so derived tables can update in place.
+    """
+    frame: pd.DataFrame
+    index: ConversationIndex
+    version: str
+    parent_version: Optional[str] = None
+    touched_ids: frozenset = frozenset()
+
+    def conversation(self, conv_id) -> pd.DataFrame:
+        """All rows of one conversation as a constant-time slice (empty if not found)"""
+        row_range = self.index.row_range(conv_id)
+        if row_range is None:
+            return self.frame.iloc[0:0]
+        return self.frame.iloc[row_range[0]:row_range[1]]
+
+    def conversations(self, conv_ids: Optional[Iterable] = None) -> Iterator[Tuple[str, pd.DataFrame]]:
+        """Yield (conversation_id, rows) for the given ids, or every conversation in file order"""
+        for conv_id in (self.index.ids if conv_ids is None else conv_ids):
+            yield conv_id, self.conversation(conv_id)
+
+
+def _hash_prefix(f, size: int):
+    """SHA-256 of the first size bytes of an open file, read in 1 MB chunks"""
+    digest = hashlib.sha256()
+    remaining = size
+    while remaining > 0:
+        chunk = f.read(min(1 << 20, remaining))
+        if not chunk:
+            break
+        digest.update(chunk)
+        remaining -= len(chunk)
+    return digest
+
+
+def _complete_records_end(data: bytes) -> int:
+    """Length of the leading run of complete CSV records (ending in a newline outside quotes)"""
+    quotes = data.count(b'"')
+    end = data.rfind(b'\n')
+    while end >= 0:
+        # A newline ends a record only when the quotes before it are balanced
+        if (quotes - data.count(b'"', end)) % 2 == 0:
+            return end + 1
+        end = data.rfind(b'\n', 0, end)
+    return 0
+
+
+class TranscriptStore:
+    """Cleaned, conversation-grouped transcript backed by NumPy .npy columns, invalidated by file size/mtime/hash"""
+
+    def __init__(self, transcript_path, cache_dir=None, incremental: bool = True):
+        self.transcript_path = Path(transcript_path)
+        # Append-only exports are ingested from the last parsed byte offset instead of re-parsed
+        self.incremental = incremental
+        self.cache_dir = Path(cache_dir) if cache_dir else self.transcript_path.parent / '.transcript_cache' / self.transcript_path.stem
+        self.manifest_path = self.cache_dir / 'manifest.json'
+        self.lock = threading.RLock()
+        self._snapshot = None
+        self._manifest = None
+        self._stat = None
+
+    @property
+    def version(self) -> str:
+        """Content hash of the transcript currently loaded"""
+        return self.snapshot().version
+
+    def snapshot(self) -> TranscriptSnapshot:
+        """Current frame and conversation index, parsing the CSV only when it has changed"""
+        self._refresh()
+        return self._snapshot
+
+    def load(self) -> pd.DataFrame:
+        """Return the cleaned transcript with each conversation's rows contiguous"""
+        # Shallow copy so callers can add or replace columns without touching the shared frame
+        return self.snapshot().frame.copy(deep=False)
+
+    def conversation(self, conv_id) -> pd.DataFrame:
+        """Rows of a single conversation without scanning the frame"""
+        return self.snapshot().conversation(conv_id)
+
+    def artifact_path(self, name: str, version: str) -> Optional[Path]:
+        """Path for a derived artifact cached alongside a transcript version (None if that version has no cache dir)"""
+        data_dir = self.cache_dir / version[:16]
+        return data_dir / name if data_dir.is_dir() else None
+
+    def invalidate(self):
+        """Drop the in-memory copy; the next load revalidates against the file"""
+        with self.lock:
+            self._snapshot = None
+            self._manifest = None
+            self._stat = None
+
+    def _refresh(self):
+        stat = os.stat(self.transcript_path)
+        stat_key = (stat.st_size, stat.st_mtime_ns)
+        with self.lock:
+            if self._snapshot is not None and self._stat == stat_key:
+                return
+
+            manifest = self._read_manifest() or self._manifest
+            snapshot = None
+            if manifest and (manifest['size'], manifest['mtime_ns']) == stat_key:
+                snapshot = self._base_snapshot(manifest)
+            elif manifest and stat_key[0] >= manifest['size']:
+                snapshot = self._refresh_from(manifest, stat_key)
+            if snapshot is None:
+                snapshot = self._parse_full(stat_key)
+
+            self._snapshot = snapshot
+            self._stat = stat_key
+
+    def _base_snapshot(self, manifest: Dict) -> Optional[TranscriptSnapshot]:
+        """Snapshot for the version a manifest describes, from memory or the on-disk columns"""
+        if self._snapshot is not None and self._snapshot.version == manifest['sha256']:
+            return self._snapshot
+        loaded = self._read_columns(manifest)
+        if loaded is None:
+            return None
+        self._manifest = manifest
+        return TranscriptSnapshot(frame=loaded[0], index=loaded[1], version=manifest['sha256'])
+
+    def _refresh_from(self, manifest: Dict, stat_key) -> Optional[TranscriptSnapshot]:
+        """Reuse the parsed prefix of a grown or touched file; None means a full re-parse is needed"""
+        with open(self.transcript_path, 'rb') as f:
+            digest = _hash_prefix(f, manifest['size'])
+            if digest.hexdigest() != manifest['sha256']:
+                return None
+            tail = f.read(stat_key[0] - manifest['size'])
+
+        base = self._base_snapshot(manifest)
+        if base is None:
+            return None
+        if not tail:
+            # File was touched but not changed; remember the new stat
+            self._manifest = dict(manifest, mtime_ns=stat_key[1])
+            try:
+                self._write_manifest(self._manifest)
+            except OSError as e:
+                print(f"⚠️ Could not update transcript cache manifest: {e}")
+            return base
+        if not self.incremental or not manifest['ends_with_newline']:
+            # New bytes may continue the unterminated last record
+            return None
+
+        # Only ingest complete records; a half-written final row waits for the next refresh
+        consumed = _complete_records_end(tail)
+        if consumed == 0:
+            return base
+        digest.update(tail[:consumed])
+        version = digest.hexdigest()
+
+        new_rows = pd.read_csv(io.BytesIO(tail[:consumed]), header=None, names=manifest['csv_columns'], dtype=str)
+        new_rows = clean_transcript(new_rows)
+        touched_ids = frozenset(new_rows[ID_COLUMN].dropna().unique())
+        print(f"📥 Ingested {consumed} appended bytes: {len(new_rows)} rows across {len(touched_ids)} conversations")
+
+        # Appended rows sort after the existing rows of their conversation, as a full parse would
+        frame = group_conversations(pd.concat([base.frame, new_rows], ignore_index=True))
+        index = ConversationIndex.build(frame)
+        self._write_columns(frame, index, version, {
+            'size': manifest['size'] + consumed,
+            'mtime_ns': stat_key[1],
+            'ends_with_newline': True,
+            'csv_columns': manifest['csv_columns'],
+        })
+        return TranscriptSnapshot(frame=frame, index=index, version=version,
+                                  parent_version=base.version, touched_ids=touched_ids)
+
+    def _parse_full(self, stat_key) -> TranscriptSnapshot:
+        print(f"📥 Parsing transcript: {self.transcript_path}")
+        with open(self.transcript_path, 'rb') as f:
+            data = f.read()
+        raw = pd.read_csv(io.BytesIO(data))
+        csv_columns = list(raw.columns)
+        frame = group_conversations(clean_transcript(raw))
+        index = ConversationIndex.build(frame)
+        version = hashlib.sha256(data).hexdigest()
+        self._write_columns(frame, index, version, {
+            'size': len(data),
+            'mtime_ns': stat_key[1],
+            'ends_with_newline': data.endswith(b'\n'),
+            'csv_columns': csv_columns,
+        })
+        return TranscriptSnapshot(frame=frame, index=index, version=version)
+
+    def _read_manifest(self) -> Optional[Dict]:
+        try:
+            with open(self.manifest_path, 'r') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get('format') != CACHE_FORMAT_VERSION:
+            return None
+        return manifest
+
+    def _tmp_path(self, name: str) -> Path:
+        """Unique scratch path in the cache dir, so concurrent writers never share one"""
+        return self.cache_dir / f".{name}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp"
+
+    def _write_manifest(self, manifest: Dict):
+        tmp_path = self._tmp_path(self.manifest_path.name)
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _write_columns(self, frame: pd.DataFrame, index: ConversationIndex, version: str, source: Dict):
+        """Persist each column as typed arrays under a version-named directory
+
+        source describes the parsed byte range of the CSV (size, mtime_ns, ends_with_newline,
+        csv_columns) so later refreshes can resume from it. The arrays are written to a scratch
+        directory and renamed into place, so other processes only ever see complete versions.
+        """
+        data_dir = self.cache_dir / version[:16]
+        self._manifest = dict(source, format=CACHE_FORMAT_VERSION, sha256=version, rows=len(frame),
+                              data_dir=data_dir.name, columns=[])
+        tmp_dir = self._tmp_path(data_dir.name)
+        try:
+            tmp_dir.mkdir(parents=True)
+            columns = []
+            for i, col in enumerate(frame.columns):
+                prefix = tmp_dir / f"col{i}"
+                if col == DATE_COLUMN:
+                    kind = 'datetime'
+                    np.save(f"{prefix}.values.npy", frame[col].to_numpy(dtype='datetime64[ns]'))
+                elif col == TEXT_COLUMN:
+                    # Variable-length text as one UTF-8 blob plus row offsets
+                    kind = 'text'
+                    encoded = [str(v).encode('utf-8') for v in frame[col]]
+                    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+                    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+                    np.save(f"{prefix}.blob.npy", np.frombuffer(b''.join(encoded), dtype=np.uint8))
+                    np.save(f"{prefix}.offsets.npy", offsets)
+                else:
+                    # Low-cardinality strings (IDs, roles) as int32 codes into a category table
+                    kind = 'category'
+                    codes, uniques = pd.factorize(frame[col])
+                    np.save(f"{prefix}.codes.npy", codes.astype(np.int32))
+                    np.save(f"{prefix}.categories.npy", np.asarray(uniques, dtype=str))
+                columns.append({'name': col, 'kind': kind, 'prefix': prefix.name})
+            np.save(tmp_dir / 'conversations.offsets.npy', index.offsets)
+
+            try:
+                os.rename(tmp_dir, data_dir)
+            except OSError:
+                if not data_dir.is_dir():
+                    raise
+                # Another process published this version first; same content hash, same arrays
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+            self._manifest['columns'] = columns
+            previous = self._read_manifest()
+            self._write_manifest(self._manifest)
+            if previous and previous['data_dir'] != data_dir.name:
+                # Start the superseded version's grace period now, for processes still reading it
+                try:
+                    os.utime(self.cache_dir / previous['data_dir'])
+                except FileNotFoundError:
+                    pass
+            self._prune_versions()
+            print(f"💾 Transcript cache written: {len(frame)} rows -> {data_dir}")
+        except OSError as e:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            # A read-only deployment still works, it just re-parses after restarts
+            print(f"⚠️ Could not write transcript cache: {e}")
+
+    def _prune_versions(self):
+        """Drop version directories the manifest no longer references, one process at a time"""
+        shared = get_shared_state()
+        claim_key, holder = f"prune:{self.cache_dir}", {'pid': os.getpid(), 'token': uuid.uuid4().hex}
+        if shared.claim(claim_key, holder, PRUNE_CLAIM_SECONDS) is not None:
+            return  # Another process is pruning
+        try:
+            manifest = self._read_manifest()
+            if manifest is None:
+                return
+            cutoff = time.time() - PRUNE_GRACE_SECONDS
+            for child in self.cache_dir.iterdir():
+                try:
+                    if child.name == manifest['data_dir'] or child == self.manifest_path or child.stat().st_mtime >= cutoff:
+                        continue
+                except FileNotFoundError:
+                    continue  # A writer renamed its scratch directory into place meanwhile
+                # Directories of superseded versions, and scratch files left by crashed writers
+                if child.is_dir():
+                    shutil.rmtree(child, ignore_errors=True)
+                elif child.name.endswith('.tmp'):
+                    child.unlink(missing_ok=True)
+        finally:
+            shared.release(claim_key, holder)
+
+    def _discard_columns(self, data_dir: Path):
+        """Move an unreadable version directory aside so the next write can publish a fresh one"""
+        aside = self._tmp_path(data_dir.name)
+        try:
+            os.rename(data_dir, aside)
+        except OSError:
+            return  # Already gone
+        shutil.rmtree(aside, ignore_errors=True)
+
+    def _read_columns(self, manifest: Dict) -> Optional[Tuple[pd.DataFrame, ConversationIndex]]:
+        data_dir = self.cache_dir / manifest['data_dir']
+        try:
+            data = {}
+            for column in manifest['columns']:
+                prefix = data_dir / column['prefix']
+                if column['kind'] == 'datetime':
+                    data[column['name']] = pd.to_datetime(np.load(f"{prefix}.values.npy"))
+                elif column['kind'] == 'text':
+                    raw = np.load(f"{prefix}.blob.npy").tobytes()
+                    offsets = np.load(f"{prefix}.offsets.npy").tolist()
+                    data[column['name']] = [raw[start:end].decode('utf-8') for start, end in zip(offsets[:-1], offsets[1:])]
+                else:
+                    codes = np.load(f"{prefix}.codes.npy")
+                    categories = np.load(f"{prefix}.categories.npy").astype(object)
+                    values = categories[np.maximum(codes, 0)] if len(categories) else np.full(len(codes), np.nan, dtype=object)
+                    values[codes < 0] = np.nan
+                    data[column['name']] = values
+            frame = pd.DataFrame(data, columns=[c['name'] for c in manifest['columns']])
+            offsets = np.load(data_dir / 'conversations.offsets.npy')
+        except FileNotFoundError as e:
+            print(f"⚠️ Transcript cache missing, re-parsing: {e}")
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Transcript cache unreadable, re-parsing: {e}")
+            self._discard_columns(data_dir)
+            return None
+        if len(frame) != manifest['rows'] or offsets[-1] != len(frame):
+            self._discard_columns(data_dir)
+            return None
+        ids = frame[ID_COLUMN].to_numpy()[offsets[:-1]]
+        return frame, ConversationIndex(ids, offsets)
+
+
+# One store per transcript file, shared by every analyzer and route in the process
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_transcript_store(transcript_path) -> TranscriptStore:
+    """Get the shared store for a transcript file"""
+    key = os.path.abspath(transcript_path)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = TranscriptStore(key)
+        return _stores[key]
+
+
+class TranscriptDataset:
+    """An analyzer's handle on one transcript version
+
+    The snapshot is loaded on first use and then pinned, so a batch of analyses all slice
+    the same in-memory frame. Call reload() to pick up a changed file explicitly.
+    """
+
+    def __init__(self, transcript_path):
+        self.store = get_transcript_store(transcript_path)
+        self.lock = threading.Lock()
+        self._snapshot = None
+
+    @property
+    def snapshot(self) -> TranscriptSnapshot:
+        with self.lock:
+            if self._snapshot is None:
+                self._snapshot = self.store.snapshot()
+            return self._snapshot
+
+    @property
+    def version(self) -> str:
+        """Content hash of the pinned transcript version"""
+        return self.snapshot.version
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        return self.snapshot.frame
+
+    def is_stale(self) -> bool:
+        """True if the transcript file has changed since the snapshot was pinned"""
+        return self.store.version != self.version
+
+    def reload(self) -> bool:
+        """Pin the transcript's current version; returns True if it changed"""
+        snapshot = self.store.snapshot()
+        with self.lock:
+            changed = self._snapshot is None or self._snapshot.version != snapshot.version
+            self._snapshot = snapshot
+        return changed
+
+    def conversation(self, conv_id) -> pd.DataFrame:
+        return self.snapshot.conversation(conv_id)
+
+    def conversations(self, conv_ids: Optional[Iterable] = None) -> Iterator[Tuple[str, pd.DataFrame]]:
+        return self.snapshot.conversations(conv_ids)